@@ -2,29 +2,20 @@
 
 # Importation de Streamlit, le framework utilisé pour créer l'application web interactive
 import streamlit as st
+# Lecture des opérations d'édition saisies au format JSON
+import json
+# Événement d'annulation des requêtes d'une exécution précédente du script
+import threading
 
 # Importation des paramètres de configuration (URI des bases de données, utilisateur et mot de passe pour Neo4j)
-from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, SERVICE_URL
 
 # --- IMPORTS POUR MONGODB ---
 
 # Import des fonctions définies dans le module mongo.py pour interagir avec la base de données MongoDB
 from database.mongo import (
     connect_mongo,                                # Fonction pour établir la connexion à MongoDB
-    get_most_common_year,                         # Renvoie l'année ayant le plus de films dans la base
-    count_movies_after_1999,                      # Compte les films sortis après 1999
-    average_votes_2007,                           # Calcule la moyenne des votes des films sortis en 2007
-    get_films_per_year,                           # Donne un histogramme du nombre de films par année
-    get_genres,                                   # Liste les genres de films présents dans la collection
-    get_top_revenue_film,                         # Récupère le film ayant généré le plus de revenus
-    get_directors_with_more_than_5_films,         # Renvoie les réalisateurs ayant réalisé plus de 5 films
-    get_best_avg_revenue_by_genre,                # Calcule le revenu moyen par genre et retourne celui qui rapporte le plus
-    get_top_rated_per_decade,                     # Récupère le top 3 des films les mieux notés pour chaque décennie
-    get_longest_film_per_genre,                   # Récupère le film le plus long pour chaque genre
     create_high_score_view,                       # Crée une vue MongoDB filtrée (films avec metascore > 80 et revenus > 50M)
-    compute_runtime_revenue_correlation,          # Calcule la corrélation entre la durée et le revenu
-    get_avg_runtime_by_decade,                    # Calcule la durée moyenne des films par décennie
-    recommend_film_mongo                          # Recommande un film basé sur les genres favoris d’un acteur
 )
 
 # --- IMPORTS POUR NEO4J ---
@@ -33,30 +24,146 @@ from database.mongo import (
 from database.neo4j import (
     connect_neo4j,                                # Fonction pour établir la connexion à Neo4j
     test_connection,                              # Fonction pour tester la connexion avec la base Neo4j
-    get_all_films,                                # Liste tous les films dans la base Neo4j
-    get_all_directors,                            # Liste tous les réalisateurs
-    get_films_by_director,                        # Récupère les films réalisés par un réalisateur donné
-    get_most_active_actor,                        # Renvoie l’acteur ayant joué dans le plus de films
-    get_actors_who_played_with,                   # Liste les acteurs ayant joué avec un acteur donné
-    get_top_grossing_actor,                       # Renvoie l’acteur ayant généré le plus de revenus
-    get_average_votes,                            # Calcule la moyenne des votes de tous les films
-    get_most_common_genre,                        # Renvoie le genre le plus représenté dans la base
-    get_films_played_by_coactors,                 # Donne les films dans lesquels les co-acteurs d’un acteur ont joué
-    get_all_actors,                               # Liste tous les acteurs dans la base
-    get_director_with_most_actors,                # Renvoie le réalisateur ayant collaboré avec le plus d’acteurs différents
-    get_most_connected_films,                     # Renvoie les films avec le plus d’acteurs (fortement connectés)
-    get_actors_with_most_directors,               # Renvoie les acteurs ayant travaillé avec le plus de réalisateurs différents
-    recommend_film_by_genre,                      # Recommande un film à un acteur selon ses genres préférés
     create_influence_relationships,               # Crée des relations d’influence entre réalisateurs (si genres similaires)
-    get_shortest_path_between_actors,             # Trouve le chemin le plus court entre deux acteurs dans le graphe
     create_actor_collaboration_edges,             # Crée des relations d’acteurs ayant collaboré dans un film
     detect_actor_communities,                     # Détecte des communautés d’acteurs (clustering, algorithme Louvain)
-    get_films_with_common_genres_diff_directors,  # Renvoie les films de même genre mais réalisés par des personnes différentes
-    get_preferred_genres_for_actor,               # Identifie les genres préférés d’un acteur selon ses films
     create_director_concurrence_relationships,    # Crée des relations de concurrence entre réalisateurs ayant produit des films similaires en même temps
-    get_frequent_collaborations_with_success      # Renvoie les collaborations fréquentes (acteur-réalisateur) avec des bons résultats (revenus, votes)
 )
 
+# --- IMPORTS POUR LES CLASSEMENTS (compteurs maintenus à l'import) ---
+from database.leaderboards import (
+    ACTOR_METRICS,                                # Métriques disponibles pour le classement des acteurs
+    get_actor_leaderboard,                        # Classement des acteurs lu directement sur les compteurs
+    check_leaderboard_consistency                 # Compare les compteurs stockés à un recalcul complet
+)
+
+# --- IMPORTS POUR LE MODE APPROXIMATIF ---
+from database.sketches import SketchStore         # Sketches HyperLogLog par réalisateur, acteur et genre
+
+# --- IMPORTS POUR L'ÉDITION EN MASSE (MongoDB + propagation Neo4j) ---
+from database.bulk_edit import (
+    bulk_edit_films,                              # Applique ajouts / mises à jour / suppressions dans les deux bases
+    resync_films                                  # Repropage au graphe des films dont la synchronisation a échoué
+)
+
+# --- IMPORTS POUR L'ALGÈBRE D'ENSEMBLES SUR LES CASTINGS ---
+from database.bitsets import (
+    build_cast_index,                             # Construit les bitsets acteur -> films et film -> casting
+    cast_index_from_snapshot,                     # Index sur les tableaux mappés de l'instantané du graphe
+    query_cast_sets                               # Évalue une expression ET / OU / NON sur ces bitsets
+)
+
+# --- IMPORTS POUR LES BUDGETS DE REQUÊTE ---
+from database.budget import (
+    BREAKERS,                                     # Disjoncteurs par base (MongoDB, Neo4j)
+    set_session_budget,                           # Budget de temps et annulation par défaut de la session
+    served_stale,                                 # Indique si un résultat périmé a été servi
+    reset_stale
+)
+
+# --- IMPORTS POUR L'INSTANTANÉ DU GRAPHE (fichiers .npy mappés en mémoire) ---
+from database.snapshot import (
+    current_version,                              # Version active de l'instantané (fichier CURRENT)
+    current_snapshot,                             # Ouvre (ou rouvre après bascule) l'instantané actif
+    export_snapshot                               # Écrit un nouvel instantané depuis Neo4j
+)
+
+# --- IMPORTS POUR LA RECOMMANDATION PAR LE CONTENU (TF-IDF) ---
+from database.tfidf import (
+    DEFAULT_MODEL_PATH,                           # Fichier du modèle enregistré
+    build_tfidf,                                  # Construit la matrice TF-IDF depuis la collection films
+    save_tfidf,                                   # Enregistre vocabulaire, matrice et voisins précalculés
+    load_tfidf,                                   # Recharge le modèle enregistré
+    tfidf_version                                 # Version (date du fichier) du modèle enregistré
+)
+
+# --- IMPORTS POUR LA RECOMMANDATION PAR MARCHE ALÉATOIRE (PageRank personnalisé) ---
+from database.pagerank import (
+    build_recommendation_graph,                   # Charge le graphe acteurs – films – réalisateurs
+    recommend_films_pagerank_batch                # Films non vus les plus proches de plusieurs acteurs
+)
+
+# --- IMPORTS POUR LA COUCHE TEMPORELLE (tranches annuelles du graphe) ---
+from database.dictionary import Dictionary       # Noms des identifiants entiers des tranches
+from database.temporal import (
+    MAX_COMPETITORS,                              # Réalisateurs par genre et par année gardés dans une tranche
+    TemporalStore,                                # Tranches annuelles stockées dans MongoDB
+    load_temporal_graph,                          # Charge les tranches et calcule les agrégats cumulés
+    rebuild_temporal                              # Recalcule toutes les tranches depuis le graphe
+)
+
+# --- IMPORTS POUR LA SIMILARITÉ ENTRE FILMS (MinHash / LSH) ---
+from database.similarity import (
+    build_similarity_index,                       # Construit l'index LSH des signatures MinHash
+    get_similar_films_diff_directors              # Paires de films proches aux réalisateurs différents
+)
+
+
+# --- SERVICE JSON PARTAGÉ (facultatif) ---
+from database.service import (
+    ReadFunctions,                                # Fonctions de lecture, locales ou distantes
+    ServiceClient                                 # Client du service JSON en lecture seule
+)
+
+# Les fonctions de lecture (database/service.py, READ_FUNCTIONS) sont appelées par `reads` :
+# avec SERVICE_URL, ce sont leurs équivalents distants et toutes les sessions partagent les
+# connexions et le cache du service (client créé une seule fois par processus, avec son cache
+# d'ETags, et non à chaque réexécution)
+@st.cache_resource(show_spinner=False)
+def get_service_client(url):
+    return ServiceClient(url)
+
+service = get_service_client(SERVICE_URL) if SERVICE_URL else None
+reads = ReadFunctions(service)
+
+
+# Client MongoDB et driver Neo4j partagés par toutes les sessions et toutes les réexécutions
+# du script (chacun gère son propre pool de connexions)
+@st.cache_resource(show_spinner=False)
+def get_mongo_client():
+    return connect_mongo(MONGO_URI)
+
+@st.cache_resource(show_spinner=False)
+def get_neo4j_driver():
+    return connect_neo4j()
+
+# Paramètres TF-IDF des recommandations : avec le service, use_tfidf (il fournit son modèle) ;
+# sinon le modèle enregistré, ou None (recommandations par genre, pas de construction ici)
+def recommendation_tfidf():
+    version = tfidf_version()
+    return reads.tfidf_params(lambda: load_tfidf_model(version) if version is not None else None)
+
+
+# Index des castings construit une seule fois par version d'instantané : lu dans l'instantané
+# mappé en mémoire s'il existe (sans requête Neo4j), sinon construit depuis le graphe
+@st.cache_resource
+def load_cast_index(_driver, snapshot_version=None):
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return cast_index_from_snapshot(snapshot)
+    return build_cast_index(_driver)
+
+# Modèle TF-IDF (titre + description) relu depuis models/tfidf.npz, une fois par version du fichier ;
+# il n'est construit que sur demande (bouton de la section MongoDB)
+@st.cache_resource(max_entries=1)
+def load_tfidf_model(model_version):
+    return load_tfidf(DEFAULT_MODEL_PATH)
+
+# Graphe acteurs – films – réalisateurs du PageRank personnalisé, chargé une fois par processus
+@st.cache_resource
+def load_recommendation_graph(_driver):
+    return build_recommendation_graph(_driver)
+
+# Évolution du graphe année par année, rechargée seulement quand les tranches changent
+@st.cache_resource
+def load_temporal(_db, temporal_version=None):
+    return load_temporal_graph(TemporalStore(_db), Dictionary(_db))
+
+# Index de similarité MinHash / LSH, construit une fois puis mis à jour par l'édition en masse
+@st.cache_resource
+def load_similarity_index(_driver):
+    return build_similarity_index(_driver)
+
 
 # Configuration de la page Streamlit : définit le titre de l'onglet du navigateur et le mode d'affichage en pleine largeur
 st.set_page_config(page_title="NoSQL Explorer", layout="wide")
@@ -68,57 +175,88 @@ st.title("Projet NoSQL – MongoDB & Neo4j Explorer")
 # Trois options sont proposées : MongoDB, Neo4j et une analyse croisée entre les deux
 section = st.sidebar.radio("📂 Choisir une base", ["MongoDB", "Neo4j", "Analyse croisée"])
 
+# Mode approximatif : sketches HyperLogLog et échantillons au lieu des calculs exacts
+approximate = st.sidebar.checkbox("⚡ Mode approximatif (sketches, échantillons)")
+
+# Budget de temps de chaque requête (maxTimeMS / délai de transaction). Les requêtes encore
+# en cours d'une exécution précédente du script sont annulées à chaque nouvelle exécution.
+query_budget = st.sidebar.number_input("⏱️ Budget par requête (secondes)", min_value=1, max_value=600, value=30)
+if "cancel_event" in st.session_state:
+    st.session_state["cancel_event"].set()
+st.session_state["cancel_event"] = threading.Event()
+set_session_budget(query_budget, st.session_state["cancel_event"])
+reset_stale()
+
+
+# Texte des bornes de l'intervalle de confiance d'une estimation (vide pour une valeur exacte)
+def bounds(value, fmt=".2f"):
+    if not hasattr(value, "low"):
+        return ""
+    return f" (IC 95 % : {value.low:{fmt}} – {value.high:{fmt}})"
+
 
 # --- MongoDB Section ---
 if section == "MongoDB":
     st.header("📦 Exploration de la base MongoDB")
     
-    mongo_client = connect_mongo(MONGO_URI)
+    mongo_client = get_mongo_client()
     db = mongo_client["entertainment"]
     collection = db["films"]
     
+    st.subheader("📊 Vue d'ensemble")
+    if st.button("Charger la vue d'ensemble MongoDB"):
+        overview = reads.get_collection_overview(collection)
+        col1, col2, col3 = st.columns(3)
+        if overview["most_common_year"]:
+            col1.metric("Année la plus fréquente", overview["most_common_year"]["_id"],
+                        f"{overview['most_common_year']['count']} films")
+        col2.metric("Films après 1999", overview["movies_after_1999"])
+        col3.metric("Moyenne des votes (2007)", f"{overview['average_votes_2007']:.2f}")
+        if overview["top_revenue_film"]:
+            st.write(f"Film le plus rentable : **{overview['top_revenue_film']['title']}**")
+
     st.subheader("🎯 Requêtes MongoDB")
 
     if st.button("📅 Année avec le plus de films"):
-        result = get_most_common_year(collection)
+        result = reads.get_most_common_year(collection)
         st.success(f"Année : {result['_id']} avec {result['count']} films.")
 
     if st.button("🎬 Nombre de films après 1999"):
-        count = count_movies_after_1999(collection)
+        count = reads.count_movies_after_1999(collection)
         st.info(f"Nombre de films sortis après 1999 : {count}")
 
     if st.button("⭐ Moyenne des votes en 2007"):
-        avg = average_votes_2007(collection)
-        st.info(f"Moyenne des votes (2007) : {avg:.2f}")
+        avg = reads.average_votes_2007(collection, approximate=approximate)
+        st.info(f"Moyenne des votes (2007) : {avg:.2f}{bounds(avg)}")
 
     if st.button("📈 Histogramme des films par année"):
-        data = get_films_per_year(collection)
+        data = reads.get_films_per_year(collection)
         st.bar_chart({d['_id']: d['count'] for d in data})
 
     if st.button("🎭 Genres de films disponibles"):
-        genres = get_genres(collection)
+        genres = reads.get_genres(collection, approximate=approximate)
         st.write(genres)
 
     if st.button("💰 Film ayant généré le plus de revenus"):
-        film = get_top_revenue_film(collection)
+        film = reads.get_top_revenue_film(collection)
         if film:
             st.write(film)
         else:
             st.warning("Aucun film avec revenu renseigné.")
 
     if st.button("🎬 Réalisateurs avec plus de 5 films"):
-        directors = get_directors_with_more_than_5_films(collection)
+        directors = reads.get_directors_with_more_than_5_films(collection)
         st.write(directors)
 
     if st.button("🏆 Genre rapportant le plus en moyenne"):
-        genre = get_best_avg_revenue_by_genre(collection)
+        genre = reads.get_best_avg_revenue_by_genre(collection)
         if genre:
             st.success(f"Genre : {genre['_id'].strip()} – Revenu moyen : {genre['avgRevenue']:.2f} M$")
         else:
             st.warning("Aucun genre trouvé avec revenus valides.")
 
     if st.button("🎖️ Top 3 films par décennie (rating)"):
-        data = get_top_rated_per_decade(collection)
+        data = reads.get_top_rated_per_decade(collection)
         for d in data:
             st.markdown(f"**{d['_id']}** :")
             for film in d['top3']:
@@ -127,27 +265,97 @@ if section == "MongoDB":
                 st.markdown(f"- {title} ({rating})")
 
     if st.button("⏱️ Film le plus long par genre"):
-        data = get_longest_film_per_genre(collection)
+        data = reads.get_longest_film_per_genre(collection)
         for d in data:
             st.markdown(f"**{d['_id'].strip()}** : {d['title']} ({d['runtime']} min)")
 
+    top_k = st.slider("Nombre de films par groupe", 1, 10, 3, key="top_k")
+
+    if st.button("💵 Films les plus rentables par année"):
+        for d in reads.get_top_revenue_per_year(collection, top_k):
+            st.markdown(f"**{d['_id']}** : " + ", ".join(f"{f['title']} ({f['value']} M$)" for f in d['top']))
+
+    if st.button("🗳️ Films les plus votés par réalisateur"):
+        for d in reads.get_top_votes_per_director(collection, top_k):
+            st.markdown(f"**{d['_id']}** : " + ", ".join(f"{f['title']} ({f['value']} votes)" for f in d['top']))
+
     if st.button("🔍 Créer la vue MongoDB (score > 80, revenu > 50M)"):
         msg = create_high_score_view(collection)
         st.success(msg)
 
     if st.button("📊 Corrélation durée / revenu"):
-        corr = compute_runtime_revenue_correlation(collection)
+        corr = reads.compute_runtime_revenue_correlation(collection, approximate=approximate)
         if corr is not None:
-            st.info(f"Corrélation (runtime vs revenue) : {corr:.3f}")
+            st.info(f"Corrélation (runtime vs revenue) : {corr:.3f}{bounds(corr, '.3f')}")
         else:
             st.warning("Pas assez de données pour calculer la corrélation.")
 
     if st.button("📉 Durée moyenne des films par décennie"):
-        data = get_avg_runtime_by_decade(collection)
+        data = reads.get_avg_runtime_by_decade(collection)
         decades = [d['_id'] for d in data]
         avg_runtime = [d['avgRuntime'] for d in data]
         st.line_chart(dict(zip(decades, avg_runtime)))
 
+    st.subheader("📝 Films au contenu similaire (TF-IDF sur le titre et la description)")
+    if st.button("🔄 Construire le modèle TF-IDF"):
+        model = build_tfidf(collection)
+        model.compute_neighbours()
+        save_tfidf(model, DEFAULT_MODEL_PATH)
+        st.success(f"Modèle construit : {len(model)} films, {len(model.vocabulary)} termes.")
+    version = tfidf_version()
+    if version is None:
+        st.info("Aucun modèle TF-IDF enregistré (ou modèle invalidé par une édition) : construisez-le.")
+    else:
+        tfidf = load_tfidf_model(version)
+        mlt_title = st.selectbox("Choisir un film", sorted(t for t in tfidf.title_rows if t is not None),
+                                 key="mlt_film")
+        if st.button("Plus de films comme celui-ci") and mlt_title:
+            for r in tfidf.more_like_this(mlt_title):
+                st.markdown(f"- **{r['title']}** – cosinus : {r['score']:.3f}")
+        mlt_text = st.text_input("Ou rechercher par description", key="mlt_text")
+        if mlt_text:
+            results = tfidf.search(mlt_text)
+            if results:
+                for r in results:
+                    st.markdown(f"- **{r['title']}** – cosinus : {r['score']:.3f}")
+            else:
+                st.warning("Aucun film ne correspond à ces mots.")
+
+    # Édition en masse : un bulk_write MongoDB et une transaction Neo4j pour tout le lot
+    st.subheader("✏️ Ajouter, mettre à jour et supprimer des documents")
+    operations_text = st.text_area(
+        "Opérations (liste JSON)",
+        value='[{"op": "update", "filter": {"title": "Gold"}, "update": {"$set": {"rating": "R"}}}]',
+        height=150
+    )
+    dry_run = st.checkbox("Simulation (aucune écriture)", value=True)
+    if st.button("Appliquer les opérations"):
+        try:
+            operations = json.loads(operations_text)
+        except json.JSONDecodeError as e:
+            st.error(f"JSON invalide : {e}")
+        else:
+            driver = get_neo4j_driver()
+            report = bulk_edit_films(collection, driver, operations, dry_run=dry_run,
+                                     similarity=load_similarity_index(driver))
+            if service is not None and not dry_run:
+                service.invalidate()  # Les réponses en cache du service sont périmées
+            if report["errors"]:
+                st.warning(f"{len(report['errors'])} opération(s) en erreur.")
+            if report["graph"].get("failed_ids"):
+                st.session_state["resync_ids"] = report["graph"]["failed_ids"]
+            st.write(report)
+    # MongoDB écrit mais graphe non synchronisé : les films touchés sont repropagés sur demande
+    if st.session_state.get("resync_ids"):
+        st.error(f"Graphe Neo4j non synchronisé pour {len(st.session_state['resync_ids'])} film(s).")
+        if st.button("Resynchroniser le graphe"):
+            driver = get_neo4j_driver()
+            st.write(resync_films(collection, driver, st.session_state["resync_ids"],
+                                  similarity=load_similarity_index(driver)))
+            del st.session_state["resync_ids"]
+            if service is not None:
+                service.invalidate()
+
 
 
 # --- Neo4j Section ---
@@ -155,8 +363,11 @@ elif section == "Neo4j":
     # Titre principal pour cette section dédiée à Neo4j
     st.header("🔗 Exploration de la base Neo4j")
 
-    # Connexion au serveur Neo4j via la fonction connect_neo4j
-    driver = connect_neo4j()
+    # Connexion au serveur Neo4j (driver partagé, voir get_neo4j_driver)
+    driver = get_neo4j_driver()
+
+    # Sketches du mode approximatif (stockés dans MongoDB)
+    sketches = SketchStore(get_mongo_client()["entertainment"]) if approximate else None
 
     # Bouton pour tester si la connexion à Neo4j fonctionne bien
     if st.button("✅ Tester la connexion à Neo4j"):
@@ -166,25 +377,42 @@ elif section == "Neo4j":
         except Exception as e:
             st.error(f"Erreur de connexion : {e}")  # Affiche l’erreur si échec
 
+    # Statistiques générales lues en un seul aller-retour
+    st.subheader("📊 Vue d'ensemble")
+    if st.button("Charger la vue d'ensemble Neo4j"):
+        overview = reads.get_graph_overview(driver)
+        col1, col2 = st.columns(2)
+        if overview["average_votes"] and overview["average_votes"]["avg_votes"] is not None:
+            col1.metric("Moyenne des votes", f"{overview['average_votes']['avg_votes']:.2f}")
+        if overview["most_common_genre"]:
+            col2.metric("Genre le plus représenté", overview["most_common_genre"]["genre"],
+                        f"{overview['most_common_genre']['nb_films']} films")
+        if overview["most_active_actor"]:
+            col1.metric("Acteur le plus actif", overview["most_active_actor"]["actor"],
+                        f"{overview['most_active_actor']['nb_films']} films")
+        if overview["top_grossing_actor"]:
+            col2.metric("Acteur le plus rentable", overview["top_grossing_actor"]["actor"],
+                        f"{overview['top_grossing_actor']['total_revenue']:.2f} M$")
+
     # Affiche la liste des films présents dans la base Neo4j
     st.subheader("🎬 Lister les films présents dans Neo4j")
-    films = get_all_films(driver)
+    films = reads.get_all_films(driver)
     st.write(films)
 
     # Permet de sélectionner un réalisateur et d'afficher ses films
     st.subheader("🎥 Lister les réalisateurs")
-    directors = get_all_directors(driver)
+    directors = reads.get_all_directors(driver)
     selected_director = st.selectbox("Choisir un réalisateur", directors)
 
     if selected_director:
-        films_by_director = get_films_by_director(driver, selected_director)
+        films_by_director = reads.get_films_by_director(driver, selected_director)
         st.write(f"Films réalisés par **{selected_director}** :")
         st.write(films_by_director)
 
     # Affiche l’acteur ayant joué dans le plus de films
     st.subheader("🎭 Acteur ayant joué dans le plus de films")
     if st.button("Afficher l'acteur le plus actif"):
-        actor_info = get_most_active_actor(driver)
+        actor_info = reads.get_most_active_actor(driver)
         if actor_info:
             st.success(f"{actor_info['actor']} a joué dans {actor_info['nb_films']} films.")
         else:
@@ -193,7 +421,7 @@ elif section == "Neo4j":
     # Affiche les acteurs ayant partagé un film avec Anne Hathaway
     st.subheader("🤝 Acteurs ayant joué avec Anne Hathaway")
     if st.button("Afficher les acteurs ayant partagé un film avec Anne Hathaway"):
-        co_actors = get_actors_who_played_with(driver, "Anne Hathaway")
+        co_actors = reads.get_actors_who_played_with(driver, "Anne Hathaway")
         if co_actors:
             st.write(f"{len(co_actors)} acteur(s) trouvé(s) :")
             st.write(co_actors)
@@ -203,7 +431,7 @@ elif section == "Neo4j":
     # Affiche l’acteur ayant généré le plus de revenus
     st.subheader("💰 Acteur ayant généré le plus de revenus")
     if st.button("Afficher l'acteur le plus rentable"):
-        actor = get_top_grossing_actor(driver)
+        actor = reads.get_top_grossing_actor(driver)
         if actor:
             st.success(f"{actor['actor']} – {actor['total_revenue']:.2f} M$")
         else:
@@ -212,7 +440,7 @@ elif section == "Neo4j":
     # Affiche la moyenne des votes des films
     st.subheader("⭐ Moyenne des votes des films")
     if st.button("Afficher la moyenne des votes"):
-        avg = get_average_votes(driver)
+        avg = reads.get_average_votes(driver)
         if avg:
             st.success(f"Moyenne des votes : {avg['avg_votes']:.2f}")
         else:
@@ -221,37 +449,61 @@ elif section == "Neo4j":
     # Genre le plus fréquent dans la base
     st.subheader("🎬 Genre le plus représenté")
     if st.button("Afficher le genre le plus fréquent"):
-        genre = get_most_common_genre(driver)
+        genre = reads.get_most_common_genre(driver, approximate, sketches)
         if genre:
-            st.success(f"Genre : {genre['genre']} – Nombre de films : {genre['nb_films']}")
+            st.success(f"Genre : {genre['genre']} – Nombre de films : {genre['nb_films']}{bounds(genre['nb_films'], '.0f')}")
         else:
             st.warning("Aucun genre trouvé dans la base.")
 
     # Films dans lesquels les co-acteurs du comédien sélectionné ont joué
     st.subheader("🎞️ Films dans lesquels les co-acteurs ont joué")
-    actors = get_all_actors(driver)
+    actors = reads.get_all_actors(driver)
     selected_actor = st.selectbox("Choisir un acteur", actors)
     if st.button("Afficher les films joués par ses co-acteurs"):
-        films = get_films_played_by_coactors(driver, selected_actor)
+        films = reads.get_films_played_by_coactors(driver, selected_actor)
         if films:
             st.info(f"{len(films)} film(s) trouvés :")
             st.write(films)
         else:
             st.warning("Aucun film trouvé ou acteur inconnu.")
 
+    # Requêtes ensemblistes sur les castings (ex. partenaires de X et de Y mais jamais de Z)
+    st.subheader("🧮 Requêtes ensemblistes sur les castings")
+    snapshot_version = current_version()
+    st.caption(f"Instantané du graphe : {snapshot_version or 'aucun (lecture directe de Neo4j)'}")
+    if st.button("📸 Exporter un nouvel instantané du graphe"):
+        st.success(f"Instantané actif : {export_snapshot(driver)}")
+    domain_labels = {
+        "Films communs (noms d'acteurs)": "films",
+        "Partenaires (noms d'acteurs)": "costars",
+        "Acteurs des films (titres de films)": "cast",
+    }
+    domain_label = st.radio("Type de requête", list(domain_labels))
+    expression = st.text_input(
+        "Expression (& = ET, | = OU, - = SAUF, ~ = NON)",
+        value='"Anne Hathaway" & "Christian Bale"'
+    )
+    if st.button("Évaluer l'expression"):
+        try:
+            names = query_cast_sets(load_cast_index(driver, current_version()), expression, domain_labels[domain_label])
+            st.info(f"{len(names)} résultat(s) :")
+            st.write(names)
+        except ValueError as e:
+            st.warning(str(e))
+
     # Réalisateur ayant travaillé avec le plus d’acteurs différents
     st.subheader("🎬 Réalisateur ayant travaillé avec le plus d'acteurs distincts")
     if st.button("Afficher le réalisateur le plus collaboratif"):
-        director = get_director_with_most_actors(driver)
+        director = reads.get_director_with_most_actors(driver, approximate, sketches)
         if director:
-            st.success(f"{director['director']} – {director['nb_actors']} acteur(s) différents")
+            st.success(f"{director['director']} – {director['nb_actors']} acteur(s) différents{bounds(director['nb_actors'], '.0f')}")
         else:
             st.warning("Aucun réalisateur ou acteur trouvé dans la base.")
 
     # Films avec le plus d’acteurs
     st.subheader("🎞️ Films avec le plus d'acteurs")
     if st.button("Afficher les films les plus connectés"):
-        top_films = get_most_connected_films(driver)
+        top_films = reads.get_most_connected_films(driver)
         if top_films:
             for film in top_films:
                 st.markdown(f"- **{film['title']}** : {film['actors']} acteurs")
@@ -261,24 +513,56 @@ elif section == "Neo4j":
     # Acteurs ayant travaillé avec le plus de réalisateurs
     st.subheader("🎭 Top 5 des acteurs ayant travaillé avec le plus de réalisateurs différents")
     if st.button("Afficher les 5 acteurs les plus connectés aux réalisateurs"):
-        top_actors = get_actors_with_most_directors(driver)
+        top_actors = reads.get_actors_with_most_directors(driver, approximate=approximate, sketches=sketches)
         if top_actors:
             for a in top_actors:
-                st.markdown(f"- **{a['actor']}** : {a['directors']} réalisateurs")
+                st.markdown(f"- **{a['actor']}** : {a['directors']} réalisateurs{bounds(a['directors'], '.0f')}")
         else:
             st.warning("Aucun résultat.")
 
+    # Classements lus directement sur les compteurs maintenus pendant l'import
+    st.subheader("🏅 Classement des acteurs (compteurs incrémentaux)")
+    metric = st.selectbox("Métrique du classement", list(ACTOR_METRICS))
+    if st.button("Afficher le classement"):
+        for row in get_actor_leaderboard(driver, metric, limit=10):
+            st.markdown(f"- **{row['actor']}** : {row[metric]:.2f}")
+    if st.button("Vérifier la cohérence des compteurs"):
+        mismatches = check_leaderboard_consistency(driver)
+        if mismatches:
+            st.error(f"{len(mismatches)} écart(s) détecté(s) :")
+            st.write(mismatches[:50])
+        else:
+            st.success("Compteurs cohérents avec un recalcul complet.")
+
     # Recommandation personnalisée d’un film pour un acteur selon ses genres préférés
     st.subheader("🎯 Recommander un film à un acteur selon ses genres préférés")
     actor_for_reco = st.selectbox("Choisir un acteur pour la recommandation", actors)
 
     if st.button("Recommander un film"):
-        reco = recommend_film_by_genre(driver, actor_for_reco)
+        reco = reads.recommend_film_by_genre(driver, actor_for_reco,
+                                             **recommendation_tfidf())
         if reco:
             st.success(f"Film recommandé pour **{actor_for_reco}** : *{reco['title']}* (Genre : {reco['genre']})")
         else:
             st.warning("Aucune recommandation trouvée (acteur trop spécialisé ou tous les films déjà vus).")
 
+    # Recommandation par PageRank personnalisé : films proches via partenaires et réalisateurs
+    st.subheader("🧭 Recommandations par le graphe (PageRank personnalisé)")
+    pagerank_actors = st.multiselect("Choisir un ou plusieurs acteurs", actors, key="pagerank_actors")
+    if st.button("Recommander par le graphe") and pagerank_actors:
+        try:
+            recommendations = recommend_films_pagerank_batch(load_recommendation_graph(driver), pagerank_actors)
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            for actor_name, films_for_actor in recommendations.items():
+                st.markdown(f"**{actor_name}**")
+                if not films_for_actor:
+                    st.write("Aucun film non vu atteignable dans le graphe.")
+                for r in films_for_actor:
+                    path = " → ".join(r["path"]) if r["path"] else "lien indirect"
+                    st.markdown(f"- *{r['title']}* (score {r['score']:.4f}) — {path}")
+
     # Création des relations d’influence entre réalisateurs (selon genres similaires)
     st.subheader("🔁 Relations d'influence entre réalisateurs")
     if st.button("Créer les relations :INFLUENCE_PAR"):
@@ -294,7 +578,7 @@ elif section == "Neo4j":
         if actor_a == actor_b:
             st.warning("Sélectionne deux acteurs différents.")
         else:
-            path = get_shortest_path_between_actors(driver, actor_a, actor_b)
+            path = reads.get_shortest_path_between_actors(driver, actor_a, actor_b)
             if path:
                 st.info(f"Chemin le plus court entre **{actor_a}** et **{actor_b}** :")
                 st.write(" ➡️ ".join(path))
@@ -333,36 +617,43 @@ elif section == "Analyse croisée":
     st.header("🔄 Analyse croisée MongoDB & Neo4j")
 
     # Connexion à la base Neo4j (pour exploiter les données graphiques)
-    driver = connect_neo4j()
-
-    # Importation de la fonction spécifique pour récupérer des films ayant des genres communs
-    # mais réalisés par des personnes différentes (analyse de similarité croisée)
-    from database.neo4j import get_films_with_common_genres_diff_directors
+    driver = get_neo4j_driver()
 
     # Sous-section : recherche de films similaires (même genre) mais avec des réalisateurs différents
     st.subheader("🎬 Films avec genres en commun mais réalisateurs différents (27)")
 
     # Bouton pour lancer cette analyse
+    # (paires les plus proches d'abord, trouvées via l'index MinHash / LSH)
     if st.button("Afficher les correspondances"):
-        results = get_films_with_common_genres_diff_directors(driver)
+        results = get_similar_films_diff_directors(load_similarity_index(driver))
         if results:
             # Affichage de chaque correspondance sous forme lisible
             for r in results:
                 st.markdown(
-                    f"- **{r['film1']}** (*{r['director1']}*) & **{r['film2']}** (*{r['director2']}*) – Genre commun : _{r['genre']}_"
+                    f"- **{r['film1']}** (*{r['director1']}*) & **{r['film2']}** (*{r['director2']}*) – Genre commun : _{r['genre']}_ – Jaccard : {r['jaccard']:.2f}"
                 )
         else:
             # Message si aucun résultat n’est trouvé
             st.warning("Aucune correspondance trouvée.")
 
-    # Importation des fonctions nécessaires à la recommandation croisée
-    # - depuis MongoDB : fonction de recommandation de films
-    # - depuis Neo4j : récupération des genres préférés d’un acteur
-    from database.mongo import recommend_film_mongo
-    from database.neo4j import get_preferred_genres_for_actor
+    # Sous-section : films les plus proches d'un film donné (genres, casting, réalisateurs)
+    st.subheader("🧬 Films les plus similaires à un film")
+    similarity_index = load_similarity_index(driver)
+    similar_title = st.selectbox("Choisir un film", sorted(similarity_index.film_ids), key="similar_film")
+    if st.button("Trouver les films similaires") and similar_title:
+        similar = similarity_index.similar(similar_title)
+        if similar:
+            for r in similar:
+                st.markdown(f"- **{r['title']}** – Jaccard : {r['jaccard']:.2f}")
+        else:
+            st.warning("Aucun film suffisamment proche.")
+
+    # Fonctions de lecture de la recommandation croisée (reads) :
+    # - depuis MongoDB : recommend_film_mongo, recommandation de films
+    # - depuis Neo4j : get_preferred_genres_for_actor, genres préférés d’un acteur
 
     # Connexion à MongoDB pour pouvoir faire la recommandation finale
-    mongo_client = connect_mongo(MONGO_URI)
+    mongo_client = get_mongo_client()
     collection = mongo_client["entertainment"]["films"]
 
     # Sous-section : Recommandation croisée (Neo4j pour les préférences, MongoDB pour les films)
@@ -371,17 +662,17 @@ elif section == "Analyse croisée":
 
 
     # Sélection d’un acteur pour générer une recommandation personnalisée
-    selected_actor = st.selectbox("Choisir un acteur", get_all_actors(driver))
+    selected_actor = st.selectbox("Choisir un acteur", reads.get_all_actors(driver))
 
     # Lorsqu’on clique sur le bouton, on lance une recommandation croisée
     if st.button("Recommander un film à cet acteur"):
         # Étape 1 : On récupère les genres préférés de l’acteur depuis Neo4j (analyse de ses rôles précédents)
-        genres = get_preferred_genres_for_actor(driver, selected_actor)
+        genres = reads.get_preferred_genres_for_actor(driver, selected_actor)
         if genres:
             # Affichage des genres préférés détectés
             st.markdown(f"Génération d'une recommandation basée sur les genres préférés : {', '.join(genres)}")
             # Étape 2 : On cherche dans MongoDB un film de ces genres que l’acteur n’a pas encore vu
-            film = recommend_film_mongo(collection, genres, selected_actor)
+            film = reads.recommend_film_mongo(collection, genres, selected_actor, **recommendation_tfidf())
             if film:
                 # Si un film est trouvé, on l’affiche avec ses caractéristiques
                 st.success(f"🎬 Titre : **{film['title']}**")
@@ -389,6 +680,8 @@ elif section == "Analyse croisée":
                 st.markdown(f"- ⭐ Note : {film['rating']}")
                 st.markdown(f"- 👥 Votes : {film['Votes']}")
                 st.markdown(f"Critères utilisés : {film['criteria']}")
+                if "similarity" in film:
+                    st.markdown(f"- 📝 Proximité de contenu (TF-IDF) : {film['similarity']:.3f}")
             else:
                 st.warning("Aucune recommandation trouvée avec ces critères.")
         else:
@@ -403,24 +696,104 @@ elif section == "Analyse croisée":
     # Si on clique sur le bouton, on crée les relations :CONCURRENCE entre réalisateurs
     # Cela permet d'identifier des réalisateurs qui font des films similaires la même année
     if st.button("Créer les relations :CONCURRENCE entre réalisateurs"):
-        msg = create_director_concurrence_relationships(driver)
+        temporal_store = TemporalStore(get_mongo_client()["entertainment"])
+        msg = create_director_concurrence_relationships(driver, temporal_store)
         st.success(msg)
 
+    # --- Évolution dans le temps (tranches annuelles, sans requête sur le graphe) ---
+    st.subheader("🕰️ Évolution du graphe année par année")
+    # Les tranches ne sont chargées (MongoDB puis dictionnaire) que si la vue est ouverte
+    if st.checkbox("Afficher l'évolution année par année", key="show_timeline"):
+        temporal_db = get_mongo_client()["entertainment"]
+        temporal_store = TemporalStore(temporal_db)
+        if st.button("🔄 Reconstruire les tranches annuelles"):
+            st.success(rebuild_temporal(driver, temporal_store))
+        timeline = load_temporal(temporal_db, temporal_store.version())
+        if not timeline.years:
+            st.info("Aucune tranche annuelle : reconstruire la couche temporelle.")
+        else:
+            if len(timeline.years) > 1:
+                year = st.select_slider("Année", options=timeline.years, value=timeline.years[-1], key="timeline_year")
+            else:
+                year = timeline.years[0]
+
+            st.markdown(f"**Acteurs ayant le plus de collaborateurs distincts jusqu'en {year}**")
+            counts = timeline.collaborator_counts(year)
+            st.bar_chart({c["actor"]: c["collaborators"] for c in counts})
+
+            growth_actor = st.selectbox("Croissance du réseau d'un acteur", sorted(timeline.actor_ids), key="growth_actor")
+            if growth_actor:
+                growth = timeline.collaborator_growth(growth_actor)
+                st.line_chart({g["year"]: g["total"] for g in growth})
+
+            cumulative = st.checkbox("Genres cumulés depuis la première année", value=True, key="genre_cumulative")
+            st.markdown(f"**Répartition des genres ({'jusqu’en' if cumulative else 'en'} {year})**")
+            st.bar_chart(timeline.genre_mix(year, cumulative))
+
+            st.markdown(f"**Réalisateurs en concurrence en {year} (films du même genre)**")
+            if timeline.slices.get(year, {}).get("competition_truncated"):
+                st.caption(f"Limité aux {MAX_COMPETITORS} réalisateurs les plus actifs de chaque genre cette année-là "
+                           "(les relations :CONCURRENCE, elles, couvrent tous les réalisateurs).")
+            rivals = timeline.competition(year)
+            if rivals:
+                st.dataframe([{**r, "genres": ", ".join(r["genres"])} for r in rivals])
+            else:
+                st.info("Aucune concurrence cette année-là.")
+
     # --- Collaborations fréquentes entre acteurs et réalisateurs ---
-    # On importe la fonction qui récupère les collaborations réussies (fréquentes et efficaces)
-    from database.neo4j import get_frequent_collaborations_with_success
+    # Lecture paginée (reads.get_frequent_collaborations_page) et en flux des collaborations
+    from database.neo4j import stream_frequent_collaborations
+    from database.export import export_rows, EXPORT_FORMATS
 
     st.subheader("🎬 Collaborations fréquentes entre acteurs et réalisateurs avec succès (30)")
 
+    # Les binômes sont affichés page par page : la pile des curseurs permet de revenir en arrière
+    page_size = st.selectbox("Collaborations par page", [25, 50, 100], key="collab_page_size")
+    if "collab_cursors" not in st.session_state or st.session_state.get("collab_size") != page_size:
+        st.session_state["collab_cursors"] = [None]
+        st.session_state["collab_size"] = page_size
+
     # Lorsqu'on clique, on affiche les binômes acteur/réalisateur ayant eu plusieurs collaborations fructueuses
     if st.button("Afficher les collaborations fréquentes avec succès"):
-        collaborations = get_frequent_collaborations_with_success(driver)
+        st.session_state["collab_visible"] = True
+        st.session_state["collab_cursors"] = [None]
+
+    if st.session_state.get("collab_visible"):
+        cursors = st.session_state["collab_cursors"]
+        collaborations, next_cursor = reads.get_frequent_collaborations_page(
+            driver, after=cursors[-1], page_size=page_size
+        )
         if collaborations:
+            st.caption(f"Page {len(cursors)}")
             for collab in collaborations:
                 st.markdown(
                     f"- **{collab['actor']}** & **{collab['director']}** : {collab['collaborations']} collaborations – "
                     f"Revenu moyen : {collab['avg_revenue'] if collab['avg_revenue'] is not None else 'N/A'}M$ – "
                     f"Votes moyens : {collab['avg_votes'] if collab['avg_votes'] is not None else 'N/A'}"
                 )
+            previous_col, next_col = st.columns(2)
+            if len(cursors) > 1 and previous_col.button("⬅️ Page précédente"):
+                cursors.pop()
+                st.rerun()
+            if next_cursor is not None and next_col.button("Page suivante ➡️"):
+                cursors.append(next_cursor)
+                st.rerun()
         else:
             st.warning("Aucune collaboration fréquente trouvée.")
+
+    # Export complet en flux : les lignes sont écrites sur disque au fur et à mesure de leur lecture
+    export_format = st.selectbox("Format d'export", EXPORT_FORMATS, key="collab_export_format")
+    if st.button("Exporter toutes les collaborations"):
+        path = f"exports/collaborations.{export_format}"
+        count = export_rows(stream_frequent_collaborations(driver), path, export_format)
+        st.success(f"{count} collaboration(s) exportée(s) dans {path}")
+        with open(path, "rb") as f:
+            st.download_button("Télécharger l'export", f, file_name=f"collaborations.{export_format}")
+
+
+# --- État des bases (disjoncteurs) ---
+for name, breaker in BREAKERS.items():
+    if breaker.state != "closed":
+        st.sidebar.error(f"{name} surchargé : requêtes suspendues ({breaker.state}).")
+if served_stale():
+    st.sidebar.warning("Base surchargée : certains résultats affichés sont les derniers résultats connus.")
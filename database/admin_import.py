@@ -0,0 +1,280 @@
+# ================================
+# database/admin_import.py
+# Génération des fichiers CSV de `neo4j-admin database import` depuis la collection films
+# ================================
+#
+# Pour un premier chargement d'un gros catalogue, on écrit hors ligne des fichiers CSV de
+# nœuds et de relations (en-têtes au format neo4j-admin) au lieu d'exécuter des MERGE :
+#   - films.*.csv         (Film)    id, title, year, rating, votes, revenue
+#   - actors.csv          (Actor)   id, name
+#   - directors.csv       (Director) id, name
+#   - genres.csv          (Genre)   id, name
+#   - a_joue.*.csv        (:Actor)-[:A_JOUE]->(:Film)
+#   - realise.*.csv       (:Director)-[:REALISE]->(:Film)
+#   - appartient_a.*.csv  (:Film)-[:APPARTIENT_A]->(:Genre)
+# Les identifiants sont ceux du dictionnaire partagé (database/dictionary.py), comme pour
+# l'import transactionnel : le graphe obtenu est ensuite maintenu par les mêmes fonctions.
+#
+# La collection est découpée en partitions de _id ($bucketAuto) traitées par des processus
+# distincts. Chaque partition écrit directement ses films et relations (un film n'apparaît
+# que dans une partition) ; les acteurs, réalisateurs et genres, eux, se répètent : ils sont
+# écrits en séquences triées de taille bornée sur disque puis fusionnés (heapq.merge) en
+# éliminant les doublons. La mémoire utilisée ne dépend donc pas de la taille du catalogue.
+#
+# Après l'import : create_leaderboard_indexes, rebuild_leaderboards, rebuild_sketches et
+# rebuild_temporal recalculent index, compteurs, sketches et tranches annuelles
+# (scripts/generate_neo4j_import.py --finalize).
+
+import csv
+import glob
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pymongo import MongoClient
+
+from database.dictionary import Dictionary
+from database.neo4j import encode_film_rows
+
+# Nombre de documents encodés par lot (une requête au dictionnaire par type et par lot)
+BATCH_SIZE = 500
+
+# Nombre de lignes (identifiant, nom) gardées en mémoire avant écriture d'une séquence triée
+RUN_SIZE = 100000
+
+# Nombre maximal de séquences fusionnées à la fois (fichiers ouverts simultanément)
+MERGE_FAN_IN = 64
+
+# En-têtes neo4j-admin (les identifiants sont des entiers : option --id-type=integer)
+NODE_FILES = {
+    "films": ("Film", ["id:ID(Film)", "title", "year:int", "rating", "votes:long", "revenue:double"]),
+    "actors": ("Actor", ["id:ID(Actor)", "name"]),
+    "directors": ("Director", ["id:ID(Director)", "name"]),
+    "genres": ("Genre", ["id:ID(Genre)", "name"]),
+}
+RELATIONSHIP_FILES = {
+    "a_joue": ("A_JOUE", [":START_ID(Actor)", ":END_ID(Film)"]),
+    "realise": ("REALISE", [":START_ID(Director)", ":END_ID(Film)"]),
+    "appartient_a": ("APPARTIENT_A", [":START_ID(Film)", ":END_ID(Genre)"]),
+}
+
+# Nœuds dédupliqués par fusion (même nom que la clé des lignes encodées)
+_MERGED_NODES = ("actors", "directors", "genres")
+
+
+# Valeur numérique pour une colonne typée ("" si absente ou non numérique)
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return ""
+    return value
+
+
+# -------------------------------
+# Partitions
+# -------------------------------
+
+# Découpe la collection en partitions de _id de tailles voisines : [(borne basse, borne haute)]
+# (borne haute exclue, None pour la dernière partition)
+def partition_bounds(collection, partitions):
+    buckets = list(collection.aggregate([{"$bucketAuto": {"groupBy": "$_id", "buckets": partitions}}]))
+    lows = [bucket["_id"]["min"] for bucket in buckets]
+    return list(zip(lows, lows[1:] + [None]))
+
+
+# Filtre MongoDB d'une partition
+def _partition_filter(low, high):
+    if high is None:
+        return {"_id": {"$gte": low}}
+    return {"_id": {"$gte": low, "$lt": high}}
+
+
+# -------------------------------
+# Séquences triées sur disque
+# -------------------------------
+
+# Tampon de lignes (identifiant, nom) écrit en séquences triées et sans doublons
+class _RunWriter:
+    def __init__(self, directory, name, run_size):
+        self.directory, self.name, self.run_size = directory, name, run_size
+        self.rows, self.paths = {}, []
+
+    def add(self, entity_id, name):
+        self.rows[entity_id] = name
+        if len(self.rows) >= self.run_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        path = os.path.join(self.directory, f"{self.name}.run-{len(self.paths):04d}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(sorted(self.rows.items()))
+        self.paths.append(path)
+        self.rows = {}
+
+
+# Lit une séquence triée : lignes (identifiant entier, nom)
+def _read_run(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for entity_id, name in csv.reader(f):
+            yield int(entity_id), name
+
+
+# Fusionne des séquences triées en une seule, sans doublons d'identifiant ; supprime les entrées
+def _merge_runs(paths, out_path):
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer, last = csv.writer(f), None
+        for entity_id, name in heapq.merge(*(_read_run(path) for path in paths)):
+            if entity_id != last:
+                writer.writerow((entity_id, name))
+                last = entity_id
+    for path in paths:
+        os.remove(path)
+
+
+# Fusion en plusieurs passes pour ne jamais ouvrir plus de MERGE_FAN_IN fichiers à la fois
+def merge_sorted_runs(paths, out_path, fan_in=MERGE_FAN_IN):
+    paths, level = list(paths), 0
+    while len(paths) > fan_in:
+        merged = []
+        for i in range(0, len(paths), fan_in):
+            target = f"{out_path}.merge-{level}-{i // fan_in:04d}"
+            _merge_runs(paths[i:i + fan_in], target)
+            merged.append(target)
+        paths, level = merged, level + 1
+    _merge_runs(paths, out_path)
+
+
+# -------------------------------
+# Export d'une partition
+# -------------------------------
+
+# Écrit les fichiers d'une partition : films et relations, plus les séquences triées des
+# acteurs, réalisateurs et genres. S'exécute dans un processus (connexion MongoDB propre).
+def export_partition(uri, db_name, collection_name, bounds, index, out_dir, run_size=RUN_SIZE):
+    client = MongoClient(uri)
+    try:
+        db = client[db_name]
+        dictionary = Dictionary(db)
+        runs_dir = os.path.join(out_dir, "runs")
+        runs = {name: _RunWriter(runs_dir, f"{name}.p{index:03d}", run_size) for name in _MERGED_NODES}
+        suffix = f"part-{index:03d}.csv"
+        files = {name: open(os.path.join(out_dir, f"{name}.{suffix}"), "w", newline="", encoding="utf-8")
+                 for name in ("films", *RELATIONSHIP_FILES)}
+        try:
+            writers = {name: csv.writer(f) for name, f in files.items()}
+            cursor = db[collection_name].find(_partition_filter(*bounds))
+            count = 0
+            while True:
+                batch = list(islice(cursor, BATCH_SIZE))
+                if not batch:
+                    break
+                for row in encode_film_rows(dictionary, batch):
+                    rating = "" if row["rating"] is None else row["rating"]
+                    writers["films"].writerow((
+                        row["id"], row["title"], _number(row["year"]), rating,
+                        _number(row["votes"]), _number(row["revenue"]),
+                    ))
+                    for actor in row["actors"]:
+                        writers["a_joue"].writerow((actor["id"], row["id"]))
+                        runs["actors"].add(actor["id"], actor["name"])
+                    for director in row["directors"]:
+                        writers["realise"].writerow((director["id"], row["id"]))
+                        runs["directors"].add(director["id"], director["name"])
+                    for genre in row["genres"]:
+                        writers["appartient_a"].writerow((row["id"], genre["id"]))
+                        runs["genres"].add(genre["id"], genre["name"])
+                    count += 1
+        finally:
+            for f in files.values():
+                f.close()
+        for writer in runs.values():
+            writer.flush()
+        return {"films": count, "runs": {name: writer.paths for name, writer in runs.items()}}
+    finally:
+        client.close()
+
+
+# -------------------------------
+# Orchestration
+# -------------------------------
+
+# Écrit les fichiers d'en-tête neo4j-admin (une ligne, séparés des données)
+def _write_headers(out_dir):
+    for name, (_, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items():
+        with open(os.path.join(out_dir, f"{name}.header.csv"), "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(header)
+
+
+# Fichiers écrits par une génération précédente dans out_dir (et eux seuls)
+def _generated_files(out_dir):
+    paths = []
+    for name in {**NODE_FILES, **RELATIONSHIP_FILES}:
+        for pattern in (f"{name}.header.csv", f"{name}.csv", f"{name}.csv.merge-*", f"{name}.part-*.csv"):
+            paths.extend(glob.glob(os.path.join(out_dir, pattern)))
+    return paths + glob.glob(os.path.join(out_dir, "runs", "*.run-*.csv"))
+
+
+# Prépare le répertoire de sortie : il doit être vide ou absent ; avec force=True, seuls les
+# fichiers d'une génération précédente y sont supprimés (les autres sont laissés en place)
+def _prepare_out_dir(out_dir, force=False):
+    if os.path.isdir(out_dir) and os.listdir(out_dir):
+        if not force:
+            raise FileExistsError(f"Le répertoire {out_dir} n'est pas vide (--force pour remplacer une génération précédente)")
+        for path in _generated_files(out_dir):
+            os.remove(path)
+    os.makedirs(os.path.join(out_dir, "runs"), exist_ok=True)
+
+
+# Génère tous les fichiers d'import dans out_dir ; renvoie un rapport (films, fichiers, commande).
+# out_dir doit être vide, sauf force=True (voir _prepare_out_dir).
+def generate_import_files(uri, out_dir, db_name="entertainment", collection_name="films",
+                          partitions=4, workers=None, run_size=RUN_SIZE, force=False):
+    _prepare_out_dir(out_dir, force)
+    client = MongoClient(uri)
+    try:
+        db = client[db_name]
+        Dictionary(db).ensure_indexes()
+        bounds = partition_bounds(db[collection_name], partitions)
+    finally:
+        client.close()
+    _write_headers(out_dir)
+
+    results = []
+    if bounds:
+        with ProcessPoolExecutor(max_workers=workers or len(bounds)) as pool:
+            futures = [
+                pool.submit(export_partition, uri, db_name, collection_name, b, i, out_dir, run_size)
+                for i, b in enumerate(bounds)
+            ]
+            results = [future.result() for future in futures]
+
+    for name in _MERGED_NODES:
+        merge_sorted_runs([path for r in results for path in r["runs"][name]], os.path.join(out_dir, f"{name}.csv"))
+    return {
+        "films": sum(r["films"] for r in results),
+        "partitions": len(bounds),
+        "command": admin_import_command(out_dir),
+    }
+
+
+# Fichiers de données d'un type (hors en-tête), dans l'ordre des partitions
+def _data_files(out_dir, name):
+    merged = os.path.join(out_dir, f"{name}.csv")
+    if os.path.exists(merged):
+        return [merged]
+    return sorted(glob.glob(os.path.join(out_dir, f"{name}.part-*.csv")))
+
+
+# Commande neo4j-admin correspondant aux fichiers générés (base arrêtée et vide)
+def admin_import_command(out_dir, database="neo4j"):
+    args = ["neo4j-admin database import full", "--id-type=integer", "--skip-duplicate-nodes=false"]
+    for name, (label, _) in NODE_FILES.items():
+        files = [os.path.join(out_dir, f"{name}.header.csv")] + _data_files(out_dir, name)
+        args.append(f"--nodes={label}={','.join(files)}")
+    for name, (rel_type, _) in RELATIONSHIP_FILES.items():
+        files = [os.path.join(out_dir, f"{name}.header.csv")] + _data_files(out_dir, name)
+        args.append(f"--relationships={rel_type}={','.join(files)}")
+    args.append(database)
+    return " \\\n    ".join(args)
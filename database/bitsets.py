@@ -0,0 +1,335 @@
+# ================================
+# database/bitsets.py
+# Algèbre d'ensembles sur les castings (acteurs <-> films) à base de bitsets NumPy
+# ================================
+#
+# Les acteurs et les films sont repérés par leurs identifiants entiers. Chaque acteur
+# possède un bitset de ses films et chaque film un bitset de son casting ; un bitset est
+# un tableau de mots uint64 (64 identifiants par mot). Les opérations ET / OU / NON d'une
+# expression sont alors des opérations bit à bit vectorisées sur ces tableaux.
+#
+# Domaines d'évaluation (les feuilles de l'expression sont des noms) :
+#   - "films"   : feuille = acteur, valeur = ensemble de ses films
+#                 ex. "A" & "B"            -> films communs à A et B
+#   - "costars" : feuille = acteur, valeur = ensemble de ses partenaires (hors lui-même)
+#                 ex. "X" & "Y" - "Z"      -> acteurs ayant joué avec X et Y mais jamais avec Z
+#   - "cast"    : feuille = film,   valeur = ensemble des acteurs du film
+#
+# Syntaxe textuelle : noms entre guillemets, & (ET), | (OU), - (SAUF), ~ (NON), parenthèses.
+#
+# Les matrices de bitsets occupent (acteurs x films) / 4 octets : au-delà de MAX_BITSET_BYTES,
+# build_cast_index construit à la place un CastArrayIndex, qui évalue les mêmes expressions sur
+# des listes d'identifiants triées (proportionnelles au nombre de relations), comme celles d'un
+# instantané du graphe mappé en mémoire (database/snapshot.py).
+# Les mots-clés AND, OR, NOT sont acceptés à la place des symboles.
+
+import re
+
+import numpy as np
+
+from database.budget import budgeted, budget_session
+from database.snapshot import GraphSnapshot, graph_arrays
+
+DOMAINS = ("films", "costars", "cast")
+
+# Taille maximale (octets) des deux matrices de bitsets ; au-delà, listes d'identifiants triées
+MAX_BITSET_BYTES = 256 * 1024 * 1024
+
+
+# -------------------------------
+# Primitives sur les bitsets
+# -------------------------------
+
+# Nombre de mots uint64 nécessaires pour n identifiants
+def _word_count(n):
+    return (n + 63) // 64
+
+# Bitset de n positions dont seuls les identifiants `ids` sont à 1
+def _bitset_from_ids(ids, n):
+    ids = np.asarray(list(ids), dtype=np.uint64)
+    bitset = np.zeros(_word_count(n), dtype=np.uint64)
+    np.bitwise_or.at(bitset, (ids >> np.uint64(6)).astype(np.int64), np.uint64(1) << (ids & np.uint64(63)))
+    return bitset
+
+# Positionne dans `matrix` les bits (ligne rows[i], colonne cols[i]) en une seule opération
+def _set_bits(matrix, rows, cols):
+    cols = np.asarray(cols, dtype=np.uint64)
+    np.bitwise_or.at(
+        matrix,
+        (np.asarray(rows, dtype=np.int64), (cols >> np.uint64(6)).astype(np.int64)),
+        np.uint64(1) << (cols & np.uint64(63)),
+    )
+
+# Renvoie les identifiants présents dans un bitset, triés
+def bitset_to_ids(bitset, n):
+    bits = np.unpackbits(bitset.astype("<u8").view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits[:n])
+
+# Nombre d'éléments d'un bitset
+def bitset_count(bitset):
+    return int(np.unpackbits(bitset.astype("<u8").view(np.uint8)).sum())
+
+# Taille en octets des matrices acteur -> films et film -> casting
+def bitset_bytes(n_actors, n_films):
+    return 8 * (n_actors * _word_count(n_films) + n_films * _word_count(n_actors))
+
+
+# -------------------------------
+# Construction de l'index
+# -------------------------------
+
+# Index des castings : dictionnaires nom <-> identifiant et matrices de bitsets.
+# Les positions des bits sont les identifiants entiers des nœuds (database/dictionary.py).
+class CastBitsetIndex:
+    def __init__(self, pairs, actor_names, film_titles):
+        # pairs : couples (identifiant d'acteur, identifiant de film)
+        # actor_names / film_titles : {identifiant: nom} pour l'affichage et la recherche
+        pairs = np.asarray(list(pairs), dtype=np.int64).reshape(-1, 2)
+        self.actor_names = dict(actor_names)
+        self.film_titles = dict(film_titles)
+        self.actor_ids = {name: i for i, name in self.actor_names.items()}
+        # Plusieurs films distincts peuvent partager un titre
+        self.film_ids = {}
+        for i, title in self.film_titles.items():
+            self.film_ids.setdefault(title, []).append(i)
+
+        self.n_actors = max(self.actor_names, default=-1) + 1
+        self.n_films = max(self.film_titles, default=-1) + 1
+
+        # Ligne i de actor_films = films de l'acteur i ; ligne j de film_cast = acteurs du film j
+        self.actor_films = np.zeros((self.n_actors, _word_count(self.n_films)), dtype=np.uint64)
+        self.film_cast = np.zeros((self.n_films, _word_count(self.n_actors)), dtype=np.uint64)
+        _set_bits(self.actor_films, pairs[:, 0], pairs[:, 1])
+        _set_bits(self.film_cast, pairs[:, 1], pairs[:, 0])
+
+        # Univers = identifiants réellement présents (les identifiants libérés ne sont jamais renvoyés)
+        self.actor_mask = _bitset_from_ids(self.actor_names, self.n_actors)
+        self.film_mask = _bitset_from_ids(self.film_titles, self.n_films)
+
+    # Identifiant d'un acteur, avec une erreur explicite s'il est inconnu
+    def actor_id(self, name):
+        if name not in self.actor_ids:
+            raise ValueError(f"Acteur inconnu : {name}")
+        return self.actor_ids[name]
+
+    # Bitset des films portant un titre (union s'il y en a plusieurs)
+    def films_titled(self, title):
+        if title not in self.film_ids:
+            raise ValueError(f"Film inconnu : {title}")
+        return np.bitwise_or.reduce(self.film_cast[self.film_ids[title]], axis=0)
+
+    # Bitset des partenaires d'un acteur : OU des castings de ses films, sans l'acteur lui-même
+    def costars(self, name):
+        actor = self.actor_id(name)
+        films = bitset_to_ids(self.actor_films[actor], self.n_films)
+        if films.size == 0:
+            return np.zeros_like(self.actor_mask)
+        result = np.bitwise_or.reduce(self.film_cast[films], axis=0)
+        result[actor >> 6] &= ~(np.uint64(1) << np.uint64(actor & 63))
+        return result
+
+    # Opérations utilisées par l'évaluation des expressions (voir _evaluate)
+    def leaf(self, domain, name):
+        if domain == "films":
+            return self.actor_films[self.actor_id(name)]
+        if domain == "costars":
+            return self.costars(name)
+        return self.films_titled(name)
+
+    def complement(self, domain, value):
+        return ~value & (self.film_mask if domain == "films" else self.actor_mask)
+
+    def intersect(self, left, right):
+        return left & right
+
+    def union(self, left, right):
+        return left | right
+
+    # Noms triés des éléments d'un résultat
+    def names(self, domain, value):
+        if domain == "films":
+            return sorted(self.film_titles[i] for i in bitset_to_ids(value, self.n_films))
+        return sorted(self.actor_names[i] for i in bitset_to_ids(value, self.n_actors))
+
+
+# Index des castings sur des listes d'identifiants triées (CSR) : celles d'un instantané
+# mappé en mémoire (database/snapshot.py), lues sans copie ni matrice dense. Chaque ensemble
+# est un tableau d'identifiants trié ; ET / OU / NON sont des intersections, unions et
+# différences de tableaux triés.
+class CastArrayIndex:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._universes = {}
+
+    # Identifiants présents d'un domaine (calculés au premier NON)
+    def _universe(self, domain):
+        if domain not in self._universes:
+            index = self.snapshot.film_title_index if domain == "films" else self.snapshot.actor_name_index
+            self._universes[domain] = np.sort(np.asarray(index, dtype=np.int64))
+        return self._universes[domain]
+
+    # Union des listes d'identifiants de plusieurs lignes
+    @staticmethod
+    def _union_of(rows):
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate([np.asarray(row, dtype=np.int64) for row in rows]))
+
+    # Partenaires d'un acteur : union des castings de ses films, sans l'acteur lui-même
+    def costars(self, name):
+        actor = self.snapshot.actor_id(name)
+        cast = self._union_of([self.snapshot.cast_of(film) for film in self.snapshot.films_of(actor)])
+        return cast[cast != actor]
+
+    def leaf(self, domain, name):
+        if domain == "films":
+            return np.asarray(self.snapshot.films_of(self.snapshot.actor_id(name)), dtype=np.int64)
+        if domain == "costars":
+            return self.costars(name)
+        return self._union_of([self.snapshot.cast_of(film) for film in self.snapshot.film_ids(name)])
+
+    def complement(self, domain, value):
+        return np.setdiff1d(self._universe(domain), value, assume_unique=True)
+
+    def intersect(self, left, right):
+        return np.intersect1d(left, right, assume_unique=True)
+
+    def union(self, left, right):
+        return np.union1d(left, right)
+
+    def names(self, domain, value):
+        name = self.snapshot.film_title if domain == "films" else self.snapshot.actor_name
+        return sorted(name(int(i)) for i in value)
+
+
+# Charge les acteurs, les films et les relations A_JOUE depuis Neo4j et construit l'index de bitsets,
+# ou un index sur listes triées si les matrices dépasseraient max_bytes
+@budgeted("neo4j", stale=False)
+def build_cast_index(driver, max_bytes=MAX_BITSET_BYTES):
+    with budget_session(driver) as session:
+        actor_names = {r["id"]: r["name"] for r in session.run("MATCH (a:Actor) RETURN a.id AS id, a.name AS name")}
+        film_titles = {r["id"]: r["title"] for r in session.run("MATCH (f:Film) RETURN f.id AS id, f.title AS title")}
+        pairs = [
+            (r["actor"], r["film"])
+            for r in session.run("MATCH (a:Actor)-[:A_JOUE]->(f:Film) RETURN a.id AS actor, f.id AS film")
+        ]
+    n_actors, n_films = max(actor_names, default=-1) + 1, max(film_titles, default=-1) + 1
+    if bitset_bytes(n_actors, n_films) > max_bytes:
+        films = [{"id": i, "title": title} for i, title in film_titles.items()]
+        return CastArrayIndex(GraphSnapshot.from_arrays(graph_arrays(actor_names, films, pairs)))
+    return CastBitsetIndex(pairs, actor_names, film_titles)
+
+
+# Index des castings d'un instantané mappé en mémoire (database/snapshot.py), sans interroger
+# Neo4j : les requêtes lisent directement ses tableaux, partagés entre processus
+def cast_index_from_snapshot(snapshot):
+    return CastArrayIndex(snapshot)
+
+
+# -------------------------------
+# Analyse des expressions
+# -------------------------------
+
+_TOKEN_RE = re.compile(r"""\s*(?:"([^"]*)"|'([^']*)'|(\bAND\b|\bOR\b|\bNOT\b|[&|~()\-]))""", re.IGNORECASE)
+_KEYWORDS = {"AND": "&", "OR": "|", "NOT": "~"}
+
+
+# Découpe une expression textuelle en jetons ("name", valeur) ou ("op", symbole)
+def _tokenize(text):
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise ValueError(f"Expression invalide près de : {text[pos:pos + 20]!r}")
+        name = match.group(1) if match.group(1) is not None else match.group(2)
+        if name is not None:
+            tokens.append(("name", name.strip()))
+        else:
+            op = match.group(3)
+            tokens.append(("op", _KEYWORDS.get(op.upper(), op)))
+        pos = match.end()
+    return tokens
+
+
+# Transforme une expression textuelle en arbre : ("name", x), ("not", e), ("and"|"or", g, d)
+def parse_expression(text):
+    tokens = _tokenize(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def expect_op(symbol):
+        nonlocal pos
+        if peek() != ("op", symbol):
+            raise ValueError(f"'{symbol}' attendu dans l'expression")
+        pos += 1
+
+    # expr := term ('|' term)*
+    def parse_or():
+        nonlocal pos
+        node = parse_and()
+        while peek() == ("op", "|"):
+            pos += 1
+            node = ("or", node, parse_and())
+        return node
+
+    # term := factor (('&' | '-') factor)*
+    def parse_and():
+        nonlocal pos
+        node = parse_not()
+        while peek() in (("op", "&"), ("op", "-")):
+            op = peek()[1]
+            pos += 1
+            right = parse_not()
+            node = ("and", node, right if op == "&" else ("not", right))
+        return node
+
+    # factor := '~' factor | '(' expr ')' | "nom"
+    def parse_not():
+        nonlocal pos
+        kind, value = peek()
+        if (kind, value) == ("op", "~"):
+            pos += 1
+            return ("not", parse_not())
+        if (kind, value) == ("op", "("):
+            pos += 1
+            node = parse_or()
+            expect_op(")")
+            return node
+        if kind == "name":
+            pos += 1
+            return ("name", value)
+        raise ValueError("Nom entre guillemets attendu dans l'expression")
+
+    if not tokens:
+        raise ValueError("Expression vide")
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError("Jetons inattendus en fin d'expression")
+    return tree
+
+
+# -------------------------------
+# Évaluation
+# -------------------------------
+
+# Évalue un arbre d'expression dans le domaine demandé (bitset ou tableau trié selon l'index)
+def _evaluate(index, node, domain):
+    kind = node[0]
+    if kind == "name":
+        return index.leaf(domain, node[1])
+    if kind == "not":
+        return index.complement(domain, _evaluate(index, node[1], domain))
+    left = _evaluate(index, node[1], domain)
+    right = _evaluate(index, node[2], domain)
+    return index.intersect(left, right) if kind == "and" else index.union(left, right)
+
+
+# Évalue une expression (texte ou arbre) et renvoie la liste triée des noms résultants
+def query_cast_sets(index, expression, domain="films"):
+    if domain not in DOMAINS:
+        raise ValueError(f"Domaine inconnu : {domain} (attendu : {', '.join(DOMAINS)})")
+    tree = parse_expression(expression) if isinstance(expression, str) else expression
+    return index.names(domain, _evaluate(index, tree, domain))
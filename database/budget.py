@@ -0,0 +1,440 @@
+# ================================
+# database/budget.py
+# Budgets de requête : délais côté serveur, annulation coopérative et disjoncteur par base
+# ================================
+#
+# - Budget : chaque fonction décorée par @budgeted accepte budget=<secondes> et
+#   cancel=<threading.Event>. Le temps restant devient le maxTimeMS des opérations MongoDB
+#   (pymongo.timeout) et le délai de transaction des requêtes Neo4j (Query / unit_of_work) :
+#   le serveur interrompt lui-même une requête trop longue. Les budgets imbriqués gardent
+#   l'échéance la plus proche. Sans budget explicite, celui de la session
+#   (set_session_budget) s'applique ; par défaut aucun (scripts d'import). Les lectures en
+#   flux ne reçoivent que leur budget explicite, qui borne la lecture entière ; elles
+#   restent annulables à chaque élément.
+# - Annulation : l'événement cancel est vérifié avant chaque requête Neo4j, à chaque appel
+#   décoré et dans les boucles longues (check_cancelled) ; une requête déjà partie n'est
+#   interrompue que par son délai serveur.
+# - Disjoncteur : après FAILURE_THRESHOLD échecs consécutifs de surcharge (délai dépassé,
+#   serveur indisponible) sur une base, les appels échouent immédiatement pendant COOLDOWN
+#   secondes, puis un appel d'essai décide de la réouverture. Pendant ce temps, et après un
+#   échec, les lectures renvoient leur dernier résultat connu (served_stale() le signale) ;
+#   set_stale_serving(False) le désactive (mesures de charge, tests).
+# - Appels imbriqués : une fonction décorée appelée depuis une autre de la même base partage
+#   le budget et le disjoncteur de l'appel extérieur (un seul succès ou échec compté).
+
+import contextvars
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+import pymongo
+from pymongo import errors as mongo_errors
+from pymongo.collection import Collection
+from pymongo.database import Database
+from neo4j import Driver, Query, unit_of_work
+from neo4j import exceptions as neo4j_errors
+
+# Nombre d'échecs consécutifs qui ouvrent le disjoncteur, et durée d'ouverture (secondes)
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+
+# Nombre de résultats conservés pour être resservis pendant une surcharge
+STALE_CACHE_SIZE = 256
+
+# Délai minimal transmis à Neo4j (0 y signifie "sans limite")
+_MIN_TIMEOUT = 0.001
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# -------------------------------
+# Budget courant
+# -------------------------------
+
+# Échéance et événement d'annulation d'un appel
+class Budget:
+    def __init__(self, seconds=None, cancel_event=None):
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.cancel_event = cancel_event
+
+    # Secondes restantes (None si pas d'échéance)
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    # Lève QueryCancelled ou QueryTimeout si l'appel doit s'arrêter
+    def check(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise QueryCancelled("Requête annulée.")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise QueryTimeout("Budget de temps de la requête épuisé.")
+
+
+_current = contextvars.ContextVar("query_budget", default=None)
+_session = contextvars.ContextVar("session_budget", default=(None, None))
+_stale = contextvars.ContextVar("served_stale", default=False)
+_inside = contextvars.ContextVar("inside_budgeted", default=frozenset())
+
+
+# Budget par défaut du contexte courant (une session Streamlit, par exemple)
+def set_session_budget(seconds=None, cancel_event=None):
+    _session.set((seconds, cancel_event))
+
+
+# Budget de temps par défaut du contexte courant (None si aucun)
+def session_budget():
+    return _session.get()[0]
+
+
+# Budget resserré par celui du bloc englobant : l'échéance la plus proche est retenue, de
+# même que l'événement d'annulation englobant s'il n'y en a pas
+def _within_outer(seconds=None, cancel_event=None):
+    outer = _current.get()
+    budget = Budget(seconds, cancel_event)
+    if outer is not None:
+        if outer.deadline is not None and (budget.deadline is None or outer.deadline < budget.deadline):
+            budget.deadline = outer.deadline
+        if budget.cancel_event is None:
+            budget.cancel_event = outer.cancel_event
+    return budget
+
+
+# Rend un budget courant pour le bloc (vérifié à l'entrée ; maxTimeMS MongoDB du temps restant)
+@contextmanager
+def _applied(budget):
+    budget.check()
+    token = _current.set(budget)
+    try:
+        remaining = budget.remaining()
+        if remaining is None:
+            yield budget
+        else:
+            with pymongo.timeout(max(remaining, _MIN_TIMEOUT)):
+                yield budget
+    finally:
+        _current.reset(token)
+
+
+# Applique un budget au bloc (voir _within_outer pour les blocs imbriqués)
+@contextmanager
+def time_budget(seconds=None, cancel_event=None):
+    with _applied(_within_outer(seconds, cancel_event)) as budget:
+        yield budget
+
+
+# Vérifie le budget courant (à appeler dans les boucles longues)
+def check_cancelled():
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+# Temps restant du budget courant, au format attendu par Neo4j (None si pas d'échéance)
+def _neo4j_timeout():
+    budget = _current.get()
+    if budget is None:
+        return None
+    budget.check()
+    remaining = budget.remaining()
+    return None if remaining is None else max(remaining, _MIN_TIMEOUT)
+
+
+# -------------------------------
+# Sessions Neo4j soumises au budget
+# -------------------------------
+
+# Session Neo4j dont chaque requête et transaction gérée reçoit le temps restant comme délai
+class BudgetSession:
+    def __init__(self, session):
+        self._session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._session.close()
+
+    def run(self, query, parameters=None, **kwargs):
+        timeout = _neo4j_timeout()
+        if timeout is not None and isinstance(query, str):
+            query = Query(query, timeout=timeout)
+        return self._session.run(query, parameters, **kwargs)
+
+    def _unit(self, work):
+        timeout = _neo4j_timeout()
+        return work if timeout is None else unit_of_work(timeout=timeout)(work)
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._session.execute_read(self._unit(work), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._session.execute_write(self._unit(work), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+# Ouvre une session Neo4j soumise au budget courant (mêmes options que driver.session)
+def budget_session(driver, **kwargs):
+    return BudgetSession(driver.session(**kwargs))
+
+
+# -------------------------------
+# Disjoncteur et résultats périmés
+# -------------------------------
+
+# Disjoncteur d'une base : fermé (appels normaux), ouvert (échec immédiat), semi-ouvert (un essai)
+class CircuitBreaker:
+    def __init__(self, name, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    # Indique si un appel peut partir (un seul appel d'essai à la fois en semi-ouvert)
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures, self.opened_at, self.trial = 0, None, False
+
+    # Libère l'appel d'essai sans changer l'état (erreur sans rapport avec la charge)
+    def release(self):
+        with self.lock:
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+BREAKERS = {"mongo": CircuitBreaker("mongo"), "neo4j": CircuitBreaker("neo4j")}
+
+
+# Erreurs signalant une base surchargée ou indisponible (comptées par le disjoncteur)
+def is_overload_error(exc):
+    if isinstance(exc, (QueryTimeout, mongo_errors.ExecutionTimeout, mongo_errors.ConnectionFailure,
+                        neo4j_errors.ServiceUnavailable, neo4j_errors.SessionExpired,
+                        neo4j_errors.TransientError)):
+        return True
+    if isinstance(exc, mongo_errors.PyMongoError) and exc.timeout:
+        return True
+    return isinstance(exc, neo4j_errors.ClientError) and "TransactionTimedOut" in (exc.code or "")
+
+
+# Derniers résultats connus des lectures, par fonction et arguments. Chaque appelant reçoit sa
+# propre copie : un résultat modifié après coup (film["criteria"] = ...) ne change pas le cache.
+class _StaleCache:
+    def __init__(self, size=STALE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key, _MISSING)
+        return value if value is _MISSING else copy.deepcopy(value)
+
+    def put(self, key, value):
+        value = copy.deepcopy(value)
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+_MISSING = object()
+_STALE_CACHE = _StaleCache()
+
+# Résultats périmés servis en cas de surcharge (voir set_stale_serving)
+_stale_serving = True
+
+
+# Active ou désactive, pour tout le processus, le repli sur le dernier résultat connu :
+# désactivé, une surcharge remonte toujours son erreur
+def set_stale_serving(enabled=True):
+    global _stale_serving
+    _stale_serving = bool(enabled)
+
+
+# Représentation stable d'un argument : les connexions sont recréées à chaque exécution
+# du script Streamlit, on les identifie donc par ce qu'elles désignent (serveurs et base
+# par défaut des sessions pour un driver Neo4j)
+def _stable(value):
+    if isinstance(value, Collection):
+        return ("collection", value.full_name)
+    if isinstance(value, Database):
+        return ("database", value.name)
+    if isinstance(value, Driver):
+        return ("neo4j", tuple(str(address) for address in value.initial_addresses),
+                value._default_workspace_config.database)
+    return value
+
+
+# Clé de cache d'un appel (None si un argument n'est pas hachable)
+def _cache_key(fn, args, kwargs):
+    key = (fn.__module__, fn.__qualname__, tuple(_stable(a) for a in args),
+           tuple(sorted((k, _stable(v)) for k, v in kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+# Indique si une lecture du contexte courant a renvoyé un résultat périmé depuis reset_stale()
+def served_stale():
+    return _stale.get()
+
+
+def reset_stale():
+    _stale.set(False)
+
+
+# Signale un résultat périmé obtenu ailleurs (réponse du service JSON, par exemple)
+def mark_stale():
+    _stale.set(True)
+
+
+# Budget d'un appel : explicite, sinon celui de la session
+def _call_budget(budget, cancel):
+    session_seconds, session_cancel = _session.get()
+    return time_budget(session_seconds if budget is None else budget, cancel or session_cancel)
+
+
+# Budget d'un appel imbriqué : celui de l'appel extérieur, resserré seulement par un budget
+# ou un événement d'annulation explicite
+def _nested_budget(budget, cancel):
+    if budget is None and cancel is None and _current.get() is not None:
+        return nullcontext()
+    return time_budget(budget, cancel)
+
+
+# Décorateur : budget, annulation et disjoncteur de la base `backend` pour une fonction.
+# stale=True (lectures) : après un échec de surcharge ou disjoncteur ouvert, le dernier
+# résultat connu pour les mêmes arguments est renvoyé s'il existe.
+def budgeted(backend, stale=True):
+    breaker = BREAKERS[backend]
+
+    def decorate(fn):
+        # Lectures en flux : budget=<secondes> borne la lecture entière, à partir du premier
+        # élément demandé (sans budget explicite, pas d'échéance : un export peut être long).
+        # Chaque élément est lu sous ce budget (délai de la requête Neo4j, maxTimeMS des
+        # getMore MongoDB) ; l'annulation et l'échéance sont vérifiées avant chaque élément.
+        # Le disjoncteur compte la lecture entière : succès une fois épuisée, échec si une
+        # erreur de surcharge (dont l'échéance dépassée) l'interrompt.
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator(*args, budget=None, cancel=None, **kwargs):
+                inside = _inside.get()
+                nested = backend in inside
+                if not nested and not breaker.allow():
+                    raise CircuitOpenError(f"{backend} surchargé : requête refusée.")
+                stream_budget = _within_outer(budget, cancel or _session.get()[1])
+                iterator, settled = fn(*args, **kwargs), nested
+                try:
+                    while True:
+                        # Les appels décorés faits par le générateur lui-même sont imbriqués
+                        token = _inside.set(inside | {backend})
+                        try:
+                            with _applied(stream_budget):
+                                item = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            _inside.reset(token)
+                        yield item
+                except Exception as exc:
+                    if not settled:
+                        if is_overload_error(exc):
+                            breaker.record_failure()
+                        else:
+                            breaker.release()
+                        settled = True
+                    raise
+                else:
+                    if not settled:
+                        breaker.record_success()
+                        settled = True
+                finally:
+                    iterator.close()
+                    if not settled:
+                        breaker.release()  # Lecture abandonnée par l'appelant avant la fin
+            return generator
+
+        @functools.wraps(fn)
+        def wrapper(*args, budget=None, cancel=None, **kwargs):
+            # Appel imbriqué dans un appel décoré de la même base : seul l'appel extérieur
+            # passe par le disjoncteur et le cache
+            inside = _inside.get()
+            if backend in inside:
+                with _nested_budget(budget, cancel):
+                    return fn(*args, **kwargs)
+            key = _cache_key(fn, args, kwargs) if stale and _stale_serving else None
+            if not breaker.allow():
+                return _fallback(key, CircuitOpenError(f"{backend} surchargé : requête refusée."))
+            token = _inside.set(inside | {backend})
+            try:
+                with _call_budget(budget, cancel):
+                    result = fn(*args, **kwargs)
+            except Exception as exc:
+                if not is_overload_error(exc):
+                    breaker.release()  # Erreur de la requête elle-même : rien à conclure sur la base
+                    raise
+                breaker.record_failure()
+                return _fallback(key, exc)
+            finally:
+                _inside.reset(token)
+            breaker.record_success()
+            if key is not None:
+                _STALE_CACHE.put(key, result)
+            return result
+        return wrapper
+
+    return decorate
+
+
+# Renvoie le dernier résultat connu ou relève l'erreur s'il n'y en a pas
+def _fallback(key, exc):
+    value = _STALE_CACHE.get(key) if key is not None else _MISSING
+    if value is _MISSING:
+        raise exc
+    _stale.set(True)
+    return value
@@ -0,0 +1,134 @@
+# ================================
+# database/bulk_edit.py
+# Édition en masse du catalogue : MongoDB (bulk_write) puis propagation au graphe Neo4j
+# ================================
+#
+# Un appel :
+#   1. lit les documents visés par les mises à jour / suppressions (état avant, une requête),
+#   2. bulk_write non ordonné dans MongoDB,
+#   3. relit les documents touchés (état après, une requête),
+#   4. charge en une requête les identifiants du dictionnaire de tous les films, acteurs,
+#      réalisateurs et genres concernés (seuls les noms nouveaux en demandent d'autres),
+#   5. une transaction Neo4j qui supprime les films disparus et réécrit les autres ; les
+#      anciennes années des films viennent de l'état avant (pas de relecture du graphe).
+# Restent ensuite les mises à jour des structures dérivées : sketches (MongoDB), tranches
+# annuelles des années touchées et index de similarité (lectures Neo4j). Le modèle TF-IDF
+# enregistré, construit depuis MongoDB, est invalidé dès que le bulk_write a écrit un document.
+# Les deux bases ne sont pas écrites de façon atomique : si la propagation au graphe échoue
+# après le bulk_write, le rapport indique l'erreur et les _id des films touchés
+# (graph.failed_ids), que resync_films repropage depuis l'état courant de MongoDB.
+# Les films sont identifiés dans le graphe par l'identifiant entier de leur _id MongoDB
+# (voir database/dictionary.py) : un changement de titre est une simple mise à jour.
+
+from database.dictionary import Dictionary
+from database.mongo import bulk_write_films
+from database.sketches import SketchStore
+from database.temporal import TemporalStore
+from database.neo4j import split_field, sync_films
+from database.similarity import refresh_similarity_index
+from database.tfidf import DEFAULT_MODEL_PATH, invalidate_tfidf
+
+# Projection suffisante pour reconstruire un film dans le graphe
+GRAPH_PROJECTION = {
+    "title": 1, "year": 1, "rating": 1, "Votes": 1, "Revenue (Millions)": 1,
+    "Director": 1, "Actors": 1, "genre": 1,
+}
+
+
+# Clés de dictionnaire de documents films : {kind: clés} (voir encode_film_rows)
+def _dictionary_keys(documents):
+    keys = {"film": [], "director": [], "actor": [], "genre": []}
+    for document in documents:
+        keys["film"].append(str(document["_id"]))
+        director = (document.get("Director") or "").strip()
+        keys["director"].extend([director] if director else [])
+        keys["actor"].extend(split_field(document.get("Actors")))
+        keys["genre"].extend(split_field(document.get("genre")))
+    return keys
+
+
+# Filtres des opérations de mise à jour / suppression bien formées
+def _target_filters(operations):
+    return [
+        operation["filter"] for operation in operations
+        if isinstance(operation, dict) and operation.get("op") in ("update", "delete")
+        and isinstance(operation.get("filter"), dict) and operation["filter"]
+    ]
+
+
+# Applique les opérations dans MongoDB puis les modifications correspondantes dans Neo4j.
+# Renvoie le rapport de bulk_write_films complété d'une entrée "graph".
+# Si un index de similarité est fourni, les films touchés y sont mis à jour.
+def bulk_edit_films(collection, driver, operations, dry_run=False, dictionary=None, sketches=None,
+                    similarity=None, temporal=None, tfidf_path=DEFAULT_MODEL_PATH):
+    operations = list(operations)
+    if dictionary is None:
+        dictionary = Dictionary(collection.database)
+    if sketches is None:
+        sketches = SketchStore(collection.database)
+    if temporal is None:
+        temporal = TemporalStore(collection.database)
+
+    # État avant : documents visés par les filtres (une seule requête)
+    filters = _target_filters(operations)
+    before = {}
+    if filters:
+        before = {doc["_id"]: doc for doc in collection.find({"$or": filters}, GRAPH_PROJECTION)}
+
+    report = bulk_write_films(collection, operations, dry_run=dry_run)
+    if dry_run:
+        report["graph"] = {"films_to_sync": len(before), "dry_run": True}
+        return report
+    if report["inserted"] or report["modified"] or report["deleted"] or report["upserted"]:
+        invalidate_tfidf(tfidf_path)
+
+    # Les documents insérés ont reçu leur _id lors du bulk_write ; les upserts sont dans le rapport
+    touched = set(before) | set(report["upserted_ids"])
+    for operation in operations:
+        if isinstance(operation, dict) and operation.get("op") == "insert":
+            document = operation.get("document")
+            if isinstance(document, dict) and "_id" in document:
+                touched.add(document["_id"])
+
+    try:
+        report["graph"] = _sync_graph(collection, driver, touched, before, dictionary, sketches, similarity, temporal)
+    except Exception as e:
+        # MongoDB est déjà modifié : les films touchés restent à propager (resync_films)
+        report["graph"] = {"error": f"{type(e).__name__} : {e}", "failed_ids": sorted(touched, key=str)}
+    return report
+
+
+# Propage au graphe l'état MongoDB des films `touched` (_id). before : documents visés avant
+# l'écriture, dont les anciennes années évitent de relire le graphe (None : années relues).
+def _sync_graph(collection, driver, touched, before, dictionary, sketches, similarity, temporal):
+    # État après : documents encore présents (une seule requête)
+    after = list(collection.find({"_id": {"$in": list(touched)}}, GRAPH_PROJECTION))
+
+    # Identifiants de tous les films et noms concernés, en une requête au dictionnaire
+    keys = _dictionary_keys(list((before or {}).values()) + after)
+    keys["film"].extend(str(_id) for _id in touched)
+    dictionary.prefetch(keys)
+
+    # Films à retirer du graphe : documents touchés qui n'existent plus
+    remaining = {doc["_id"] for doc in after}
+    deleted_keys = [str(_id) for _id in touched if _id not in remaining]
+    deleted_ids = dictionary.lookup("film", deleted_keys).values()
+
+    previous_years = {doc.get("year") for doc in before.values()} if before is not None else None
+    graph = sync_films(driver, after, deleted_ids, dictionary, sketches, temporal, previous_years)
+    if similarity is not None:
+        film_ids = set(deleted_ids) | set(dictionary.lookup("film", [str(doc["_id"]) for doc in after]).values())
+        graph["similarity_refreshed"] = refresh_similarity_index(similarity, driver, film_ids)
+    return graph
+
+
+# Repropage au graphe des films déjà écrits dans MongoDB (graph.failed_ids d'un bulk_edit_films
+# dont la synchronisation a échoué) ; les films absents de MongoDB sont retirés du graphe
+def resync_films(collection, driver, film_ids, dictionary=None, sketches=None, similarity=None, temporal=None):
+    if dictionary is None:
+        dictionary = Dictionary(collection.database)
+    if sketches is None:
+        sketches = SketchStore(collection.database)
+    if temporal is None:
+        temporal = TemporalStore(collection.database)
+    return _sync_graph(collection, driver, set(film_ids), None, dictionary, sketches, similarity, temporal)
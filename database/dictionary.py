@@ -0,0 +1,111 @@
+# ================================
+# database/dictionary.py
+# Dictionnaire partagé nom <-> identifiant entier (MongoDB + Neo4j)
+# ================================
+#
+# Chaque film (clé : _id MongoDB), acteur, réalisateur et genre (clé : nom) reçoit un
+# identifiant entier stable, attribué une fois pour toutes lors de l'import :
+#   - collection "dictionary"          : {kind, key, id}, index uniques (kind, key) et (kind, id)
+#   - collection "dictionary_counters" : prochain identifiant libre par type
+# Les nœuds Neo4j sont identifiés par ces entiers (propriété `id`), les noms et titres ne
+# servant plus qu'à l'affichage et à la recherche.
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+KINDS = ("film", "actor", "director", "genre")
+
+# Code d'erreur MongoDB d'une clé en double
+DUPLICATE_KEY = 11000
+
+
+# Clé de dictionnaire d'un document film : son _id MongoDB sous forme de texte
+def film_key(film):
+    return str(film["_id"])
+
+
+# Dictionnaire nom <-> identifiant, avec cache en mémoire (les identifiants ne changent jamais)
+class Dictionary:
+    def __init__(self, db):
+        self.entries = db["dictionary"]
+        self.counters = db["dictionary_counters"]
+        self._ids = {kind: {} for kind in KINDS}    # kind -> {clé: identifiant}
+        self._keys = {kind: {} for kind in KINDS}   # kind -> {identifiant: clé}
+
+    # Crée les index uniques garantissant une seule entrée par clé et par identifiant
+    def ensure_indexes(self):
+        self.entries.create_index([("kind", ASCENDING), ("key", ASCENDING)], unique=True)
+        self.entries.create_index([("kind", ASCENDING), ("id", ASCENDING)], unique=True)
+
+    # Vérifie le type d'entrée demandé
+    def _check_kind(self, kind):
+        if kind not in KINDS:
+            raise ValueError(f"Type inconnu : {kind} (attendu : {', '.join(KINDS)})")
+
+    # Mémorise des entrées lues ou créées
+    def _remember(self, kind, entries):
+        for entry in entries:
+            self._ids[kind][entry["key"]] = entry["id"]
+            self._keys[kind][entry["id"]] = entry["key"]
+
+    # Réserve n identifiants consécutifs pour un type et renvoie le premier
+    def _reserve(self, kind, n):
+        counter = self.counters.find_one_and_update(
+            {"_id": kind}, {"$inc": {"next": n}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return counter["next"] - n
+
+    # Renvoie {clé: identifiant} pour des clés, en attribuant les identifiants manquants par lot
+    def encode(self, kind, keys):
+        self._check_kind(kind)
+        keys = list(dict.fromkeys(keys))
+        missing = [key for key in keys if key not in self._ids[kind]]
+        if missing:
+            self._remember(kind, self.entries.find({"kind": kind, "key": {"$in": missing}}))
+            missing = [key for key in missing if key not in self._ids[kind]]
+        if missing:
+            first = self._reserve(kind, len(missing))
+            new_entries = [{"kind": kind, "key": key, "id": first + i} for i, key in enumerate(missing)]
+            try:
+                self.entries.insert_many(new_entries, ordered=False)
+            except BulkWriteError as e:
+                # Seule une clé attribuée entre-temps par un autre import est attendue : relue ci-dessous
+                if e.details.get("writeConcernErrors") or any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                    raise
+            self._remember(kind, self.entries.find({"kind": kind, "key": {"$in": missing}}))
+        return {key: self._ids[kind][key] for key in keys}
+
+    # Charge en une seule requête les entrées connues de plusieurs types : {kind: clés}.
+    # Les appels suivants à encode / lookup pour ces clés n'interrogent plus la base.
+    def prefetch(self, keys_by_kind):
+        clauses = []
+        for kind, keys in keys_by_kind.items():
+            self._check_kind(kind)
+            missing = [key for key in dict.fromkeys(keys) if key not in self._ids[kind]]
+            if missing:
+                clauses.append({"kind": kind, "key": {"$in": missing}})
+        if clauses:
+            for entry in self.entries.find({"$or": clauses}):
+                self._remember(entry["kind"], [entry])
+
+    # Identifiant d'une clé unique (attribué si nécessaire)
+    def encode_one(self, kind, key):
+        return self.encode(kind, [key])[key]
+
+    # Renvoie {identifiant: clé} pour des identifiants connus (les inconnus sont omis)
+    def decode(self, kind, ids):
+        self._check_kind(kind)
+        ids = list(dict.fromkeys(ids))
+        missing = [i for i in ids if i not in self._keys[kind]]
+        if missing:
+            self._remember(kind, self.entries.find({"kind": kind, "id": {"$in": missing}}))
+        return {i: self._keys[kind][i] for i in ids if i in self._keys[kind]}
+
+    # Renvoie {clé: identifiant} pour des clés déjà connues, sans en attribuer de nouvelles
+    def lookup(self, kind, keys):
+        self._check_kind(kind)
+        keys = list(dict.fromkeys(keys))
+        missing = [key for key in keys if key not in self._ids[kind]]
+        if missing:
+            self._remember(kind, self.entries.find({"kind": kind, "key": {"$in": missing}}))
+        return {key: self._ids[kind][key] for key in keys if key in self._ids[kind]}
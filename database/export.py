@@ -0,0 +1,67 @@
+# ================================
+# database/export.py
+# Export en flux de résultats (CSV ou Parquet) sans charger l'ensemble en mémoire
+# ================================
+
+import csv
+import os
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Nombre de lignes converties en un lot Arrow avant écriture dans le fichier Parquet
+PARQUET_CHUNK_SIZE = 10000
+
+
+# Écrit des lignes (dictionnaires) dans un fichier CSV au fil de l'eau ; renvoie le nombre de lignes
+def export_rows_csv(rows, path):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# Écrit des lignes dans un fichier Parquet, un groupe de lignes par lot ; renvoie le nombre de lignes.
+# Le schéma est déduit du premier lot si non fourni (colonnes entièrement nulles typées float64,
+# les seules valeurs nulles attendues ici étant des agrégats numériques).
+def export_rows_parquet(rows, path, schema=None, chunk_size=PARQUET_CHUNK_SIZE):
+    rows = iter(rows)
+    writer, count = None, 0
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if schema is None:
+                inferred = pa.Table.from_pylist(chunk).schema
+                schema = pa.schema([
+                    pa.field(field.name, pa.float64()) if pa.types.is_null(field.type) else field
+                    for field in inferred
+                ])
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+# Exporte des lignes vers un fichier au format demandé (les dossiers manquants sont créés)
+def export_rows(rows, path, fmt="csv"):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (attendu : {', '.join(EXPORT_FORMATS)})")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "csv":
+        return export_rows_csv(rows, path)
+    return export_rows_parquet(rows, path)
@@ -0,0 +1,354 @@
+# ================================
+# database/leaderboards.py
+# Compteurs agrégés (classements) maintenus de façon incrémentale dans Neo4j
+# ================================
+#
+# Chaque acteur et chaque réalisateur porte ses agrégats directement sur son nœud :
+#   - film_count     : nombre de films
+#   - total_revenue  : somme des revenus (films avec revenu renseigné)
+#   - votes_sum / votes_count : pour calculer la moyenne des votes
+#   - director_count (Actor) / actor_count (Director) : nombre de collaborateurs distincts
+# Chaque binôme acteur–réalisateur est matérialisé par une relation :COLLABORE_AVEC
+# portant le nombre de films communs et les sommes nécessaires aux moyennes ; ces relations
+# sont lues par get_frequent_collaborations_with_success (database/neo4j.py).
+#
+# Les importeurs appellent apply_film_deltas() dans la même transaction que l'écriture
+# du film : l'ancienne contribution du film est retirée, la nouvelle est ajoutée.
+
+from database.budget import budgeted, budget_session
+
+# Métriques exposées pour les classements (nom public -> expression Cypher sur le nœud `n`)
+ACTOR_METRICS = {
+    "film_count": "n.film_count",
+    "total_revenue": "n.total_revenue",
+    "director_count": "n.director_count",
+    "avg_votes": "CASE WHEN n.votes_count > 0 THEN n.votes_sum / n.votes_count END",
+}
+
+DIRECTOR_METRICS = {
+    "film_count": "n.film_count",
+    "total_revenue": "n.total_revenue",
+    "actor_count": "n.actor_count",
+    "avg_votes": "CASE WHEN n.votes_count > 0 THEN n.votes_sum / n.votes_count END",
+}
+
+# Tolérance utilisée pour comparer les sommes flottantes lors de la vérification
+FLOAT_TOLERANCE = 1e-6
+
+
+# Convertit une valeur (nombre, chaîne, "" ou None) en float, ou None si non exploitable
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# -------------------------------
+# Lecture de l'état d'un film dans le graphe
+# -------------------------------
+
+# Renvoie l'état actuel de plusieurs films (identifiants entiers) dans le graphe,
+# indexé par identifiant ; acteurs et réalisateurs sont aussi donnés par identifiant
+def read_film_snapshots(tx, film_ids):
+    result = tx.run("""
+        UNWIND $ids AS id
+        MATCH (f:Film {id: id})
+        OPTIONAL MATCH (a:Actor)-[:A_JOUE]->(f)
+        WITH f, id, collect(DISTINCT a.id) AS actors
+        OPTIONAL MATCH (d:Director)-[:REALISE]->(f)
+        RETURN id, f.revenue AS revenue, f.votes AS votes, actors,
+               collect(DISTINCT d.id) AS directors
+    """, ids=list(film_ids))
+    return {
+        record["id"]: {
+            "id": record["id"],
+            "revenue": _to_float(record["revenue"]),
+            "votes": _to_float(record["votes"]),
+            "actors": sorted(record["actors"]),
+            "directors": sorted(record["directors"]),
+        }
+        for record in result
+    }
+
+
+# Renvoie l'état actuel d'un film dans le graphe (revenu, votes, acteurs, réalisateurs), ou None
+def read_film_snapshot(tx, film_id):
+    return read_film_snapshots(tx, [film_id]).get(film_id)
+
+
+# -------------------------------
+# Mise à jour incrémentale des compteurs
+# -------------------------------
+
+# Ajoute (sign = 1) ou retire (sign = -1) la contribution de plusieurs films aux compteurs
+def _apply_contributions(tx, rows):
+    if not rows:
+        return
+
+    # Compteurs individuels des acteurs et des réalisateurs
+    for label, key in (("Actor", "actors"), ("Director", "directors")):
+        tx.run(f"""
+            UNWIND $rows AS row
+            UNWIND row.{key} AS id
+            MATCH (n:{label} {{id: id}})
+            SET n.film_count = coalesce(n.film_count, 0) + row.sign,
+                n.total_revenue = coalesce(n.total_revenue, 0.0) + row.sign * coalesce(row.revenue, 0.0),
+                n.votes_sum = coalesce(n.votes_sum, 0.0) + row.sign * coalesce(row.votes, 0.0),
+                n.votes_count = coalesce(n.votes_count, 0) + CASE WHEN row.votes IS NULL THEN 0 ELSE row.sign END
+        """, rows=rows)
+
+    # Statistiques par binôme acteur–réalisateur : retraits d'abord, puis ajouts. Un nouveau
+    # binôme est compté par ON CREATE SET, au moment où le MERGE crée la relation, et non en
+    # relisant c.films après écriture (lecture exposée au plan Eager).
+    removed = [row for row in rows if row["sign"] < 0]
+    added = [row for row in rows if row["sign"] > 0]
+    if removed:
+        tx.run("""
+            UNWIND $rows AS row
+            UNWIND row.directors AS director
+            MATCH (d:Director {id: director})
+            UNWIND row.actors AS actor
+            MATCH (a:Actor {id: actor})-[c:COLLABORE_AVEC]->(d)
+            SET c.films = c.films - 1,
+                c.revenue_sum = c.revenue_sum - coalesce(row.revenue, 0.0),
+                c.revenue_count = c.revenue_count - CASE WHEN row.revenue IS NULL THEN 0 ELSE 1 END,
+                c.votes_sum = c.votes_sum - coalesce(row.votes, 0.0),
+                c.votes_count = c.votes_count - CASE WHEN row.votes IS NULL THEN 0 ELSE 1 END
+            WITH a, d, c
+            WHERE c.films <= 0
+            SET a.director_count = a.director_count - 1,
+                d.actor_count = d.actor_count - 1
+            DELETE c
+        """, rows=removed)
+    if added:
+        tx.run("""
+            UNWIND $rows AS row
+            UNWIND row.directors AS director
+            MATCH (d:Director {id: director})
+            UNWIND row.actors AS actor
+            MATCH (a:Actor {id: actor})
+            MERGE (a)-[c:COLLABORE_AVEC]->(d)
+            ON CREATE SET c.films = 0, c.revenue_sum = 0.0, c.revenue_count = 0,
+                          c.votes_sum = 0.0, c.votes_count = 0,
+                          a.director_count = coalesce(a.director_count, 0) + 1,
+                          d.actor_count = coalesce(d.actor_count, 0) + 1
+            SET c.films = c.films + 1,
+                c.revenue_sum = c.revenue_sum + coalesce(row.revenue, 0.0),
+                c.revenue_count = c.revenue_count + CASE WHEN row.revenue IS NULL THEN 0 ELSE 1 END,
+                c.votes_sum = c.votes_sum + coalesce(row.votes, 0.0),
+                c.votes_count = c.votes_count + CASE WHEN row.votes IS NULL THEN 0 ELSE 1 END
+        """, rows=added)
+
+
+# Applique les différences (avant, après) de plusieurs films en un lot de requêtes.
+# avant = None pour un ajout, après = None pour une suppression.
+def apply_film_deltas(tx, changes):
+    rows = []
+    for before, after in changes:
+        if before == after:
+            continue  # Rien n'a changé pour ce film
+        if before is not None:
+            rows.append(dict(before, sign=-1))
+        if after is not None:
+            rows.append(dict(after, sign=1))
+    _apply_contributions(tx, rows)
+
+
+# Applique la différence entre l'état d'un film avant et après écriture
+def apply_film_delta(tx, before, after):
+    apply_film_deltas(tx, [(before, after)])
+
+
+# -------------------------------
+# Lecture des classements (une seule requête indexée)
+# -------------------------------
+
+# Construit la requête de classement pour un label et une métrique donnés
+def _leaderboard_query(label, metrics, metric):
+    if metric not in metrics:
+        raise ValueError(f"Métrique inconnue : {metric} (attendu : {', '.join(metrics)})")
+    return f"""
+        MATCH (n:{label})
+        WHERE n.film_count > 0
+        WITH n, {metrics[metric]} AS value
+        WHERE value IS NOT NULL
+        RETURN n.name AS name, value
+        ORDER BY value DESC
+        LIMIT $limit
+    """
+
+
+# Classement des acteurs selon une métrique (film_count, total_revenue, director_count, avg_votes)
+@budgeted("neo4j")
+def get_actor_leaderboard(driver, metric="total_revenue", limit=5):
+    with budget_session(driver) as session:
+        result = session.run(_leaderboard_query("Actor", ACTOR_METRICS, metric), {"limit": limit})
+        return [{"actor": r["name"], metric: r["value"]} for r in result]
+
+
+# Classement des réalisateurs selon une métrique (film_count, total_revenue, actor_count, avg_votes)
+@budgeted("neo4j")
+def get_director_leaderboard(driver, metric="film_count", limit=5):
+    with budget_session(driver) as session:
+        result = session.run(_leaderboard_query("Director", DIRECTOR_METRICS, metric), {"limit": limit})
+        return [{"director": r["name"], metric: r["value"]} for r in result]
+
+
+# -------------------------------
+# Index, reconstruction complète et vérification
+# -------------------------------
+
+# Crée les contraintes d'unicité des identifiants entiers (clés des MERGE de l'import),
+# les index de recherche par nom et ceux utilisés par le tri des classements
+@budgeted("neo4j", stale=False)
+def create_leaderboard_indexes(driver):
+    statements = [
+        f"CREATE CONSTRAINT {label.lower()}_id IF NOT EXISTS FOR (n:{label}) REQUIRE n.id IS UNIQUE"
+        for label in ("Film", "Actor", "Director", "Genre")
+    ] + [
+        "CREATE INDEX film_title IF NOT EXISTS FOR (f:Film) ON (f.title)",
+        "CREATE INDEX film_year IF NOT EXISTS FOR (f:Film) ON (f.year)",
+        "CREATE INDEX actor_name IF NOT EXISTS FOR (a:Actor) ON (a.name)",
+        "CREATE INDEX director_name IF NOT EXISTS FOR (d:Director) ON (d.name)",
+        "CREATE INDEX genre_name IF NOT EXISTS FOR (g:Genre) ON (g.name)",
+        "CREATE INDEX collabore_avec_films IF NOT EXISTS FOR ()-[c:COLLABORE_AVEC]-() ON (c.films)",
+    ]
+    for label, metrics in (("Actor", ACTOR_METRICS), ("Director", DIRECTOR_METRICS)):
+        for metric in metrics:
+            if metric != "avg_votes":  # Moyenne calculée à la lecture, non indexable
+                statements.append(
+                    f"CREATE INDEX {label.lower()}_{metric} IF NOT EXISTS FOR (n:{label}) ON (n.{metric})"
+                )
+    with budget_session(driver) as session:
+        for statement in statements:
+            session.run(statement)
+    return "Index des classements créés."
+
+
+# Requête de recalcul complet des agrégats individuels (utilisée pour reconstruire et vérifier)
+_RECOMPUTE_NODE_QUERY = """
+MATCH (n:{label})
+OPTIONAL MATCH (n){pattern}(f:Film)
+WITH n, collect(DISTINCT f) AS films
+OPTIONAL MATCH (n){pattern}(:Film){other_pattern}(o:{other})
+WITH n, films, count(DISTINCT o) AS partners
+RETURN n.id AS id, n.name AS name,
+       size(films) AS film_count,
+       reduce(s = 0.0, f IN films | s + coalesce(toFloat(f.revenue), 0.0)) AS total_revenue,
+       reduce(s = 0.0, f IN films | s + coalesce(toFloat(f.votes), 0.0)) AS votes_sum,
+       size([f IN films WHERE toFloat(f.votes) IS NOT NULL]) AS votes_count,
+       partners
+"""
+
+_RECOMPUTE_PAIR_QUERY = """
+MATCH (a:Actor)-[:A_JOUE]->(f:Film)<-[:REALISE]-(d:Director)
+WITH a, d, collect(DISTINCT f) AS films
+RETURN a.id AS actor_id, d.id AS director_id, a.name AS actor, d.name AS director,
+       size(films) AS films,
+       reduce(s = 0.0, f IN films | s + coalesce(toFloat(f.revenue), 0.0)) AS revenue_sum,
+       size([f IN films WHERE toFloat(f.revenue) IS NOT NULL]) AS revenue_count,
+       reduce(s = 0.0, f IN films | s + coalesce(toFloat(f.votes), 0.0)) AS votes_sum,
+       size([f IN films WHERE toFloat(f.votes) IS NOT NULL]) AS votes_count
+"""
+
+# Paramètres de la requête de recalcul pour chaque type de nœud
+_NODE_SPECS = {
+    "Actor": {"pattern": "-[:A_JOUE]->", "other_pattern": "<-[:REALISE]-",
+              "other": "Director", "partners": "director_count"},
+    "Director": {"pattern": "-[:REALISE]->", "other_pattern": "<-[:A_JOUE]-",
+                 "other": "Actor", "partners": "actor_count"},
+}
+
+
+# Recalcule tous les agrégats depuis le graphe et les écrit (initialisation ou réparation)
+@budgeted("neo4j", stale=False)
+def rebuild_leaderboards(driver):
+    with budget_session(driver) as session:
+        session.run("MATCH ()-[c:COLLABORE_AVEC]->() DELETE c")
+        for label, spec in _NODE_SPECS.items():
+            session.run(f"""
+                CALL {{
+                    {_RECOMPUTE_NODE_QUERY.format(label=label, **spec)}
+                }}
+                MATCH (n:{label} {{id: id}})
+                SET n.film_count = film_count,
+                    n.total_revenue = total_revenue,
+                    n.votes_sum = votes_sum,
+                    n.votes_count = votes_count,
+                    n.{spec['partners']} = partners
+            """)
+        session.run(f"""
+            CALL {{
+                {_RECOMPUTE_PAIR_QUERY}
+            }}
+            MATCH (a:Actor {{id: actor_id}}), (d:Director {{id: director_id}})
+            CREATE (a)-[:COLLABORE_AVEC {{
+                films: films, revenue_sum: revenue_sum, revenue_count: revenue_count,
+                votes_sum: votes_sum, votes_count: votes_count
+            }}]->(d)
+        """)
+    return "Compteurs des classements recalculés."
+
+
+# Compare deux valeurs numériques (None = 0) avec la tolérance flottante
+def _same_value(stored, expected):
+    return abs((stored or 0) - (expected or 0)) <= FLOAT_TOLERANCE
+
+
+# Vérifie les compteurs stockés contre un recalcul complet ; renvoie la liste des écarts
+@budgeted("neo4j")
+def check_leaderboard_consistency(driver):
+    mismatches = []
+    with budget_session(driver) as session:
+        for label, spec in _NODE_SPECS.items():
+            partners = spec["partners"]
+            result = session.run(f"""
+                CALL {{
+                    {_RECOMPUTE_NODE_QUERY.format(label=label, **spec)}
+                }}
+                MATCH (n:{label} {{id: id}})
+                RETURN id, name, film_count, total_revenue, votes_sum, votes_count, partners,
+                       n {{.film_count, .total_revenue, .votes_sum, .votes_count, .{partners}}} AS stored
+            """)
+            for record in result:
+                expected = {
+                    "film_count": record["film_count"],
+                    "total_revenue": record["total_revenue"],
+                    "votes_sum": record["votes_sum"],
+                    "votes_count": record["votes_count"],
+                    partners: record["partners"],
+                }
+                for field, value in expected.items():
+                    if not _same_value(record["stored"].get(field), value):
+                        mismatches.append({
+                            "kind": label, "id": record["id"], "key": record["name"], "field": field,
+                            "stored": record["stored"].get(field), "expected": value,
+                        })
+
+        # Binômes : chaque relation stockée doit correspondre au recalcul, et inversement
+        stored_pairs = {
+            (r["actor_id"], r["director_id"]): (r["actor"], r["director"], r["stats"])
+            for r in session.run("""
+                MATCH (a:Actor)-[c:COLLABORE_AVEC]->(d:Director)
+                RETURN a.id AS actor_id, d.id AS director_id, a.name AS actor, d.name AS director,
+                       properties(c) AS stats
+            """)
+        }
+        for record in session.run(_RECOMPUTE_PAIR_QUERY):
+            pair = (record["actor_id"], record["director_id"])
+            stats = stored_pairs.pop(pair, (None, None, {}))[2]
+            for field in ("films", "revenue_sum", "revenue_count", "votes_sum", "votes_count"):
+                if not _same_value(stats.get(field), record[field]):
+                    mismatches.append({
+                        "kind": "COLLABORE_AVEC", "id": pair, "key": (record["actor"], record["director"]),
+                        "field": field, "stored": stats.get(field), "expected": record[field],
+                    })
+        for pair, (actor, director, stats) in stored_pairs.items():
+            mismatches.append({
+                "kind": "COLLABORE_AVEC", "id": pair, "key": (actor, director), "field": "films",
+                "stored": stats.get("films"), "expected": 0,
+            })
+    return mismatches
@@ -5,10 +5,21 @@
 
 # Importation du client MongoDB
 from pymongo import MongoClient
+# Opérations d'écriture en masse et erreur associée
+from pymongo import InsertOne, UpdateOne, UpdateMany, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError
 # Utilisation de pandas pour les éventuelles manipulations de DataFrame
 import pandas as pd
 # Importation de l’URI MongoDB depuis le fichier de configuration
 from config.config import MONGO_URI
+# Mode approximatif : sketches et estimations par échantillonnage
+from database.sketches import (
+    DEFAULT_SAMPLE_SIZE, SketchStore, sample_values, estimate_mean, estimate_correlation
+)
+# Budgets de requête (maxTimeMS), annulation et disjoncteur
+from database.budget import budgeted
+# Agrégations découpées en plages exécutées en parallèle
+from database.partitioned import DEFAULT_PARTITIONS, parallel_aggregate, merged_mean, merged_correlation
 
 # Connexion à MongoDB à partir de l'URI (par défaut, celui défini dans config)
 def connect_mongo(uri=MONGO_URI):
@@ -19,38 +30,38 @@ def connect_mongo(uri=MONGO_URI):
 # -------------------------------
 
 # Retourne l’année avec le plus grand nombre de films
+@budgeted("mongo")
 def get_most_common_year(collection):
-    pipeline = [
-        {"$group": {"_id": "$year", "count": {"$sum": 1}}},  # Regroupement par année avec comptage
-        {"$sort": {"count": -1}},                            # Tri décroissant par nombre de films
-        {"$limit": 1}                                        # On garde seulement la première année
-    ]
-    result = list(collection.aggregate(pipeline))
+    result = list(collection.aggregate(FACET_PIPELINES["most_common_year"]["pipeline"]))
     return result[0] if result else None  # Retourne le résultat ou None si vide
 
 # Compte le nombre de films sortis après 1999
+@budgeted("mongo")
 def count_movies_after_1999(collection):
     return collection.count_documents({"year": {"$gt": 1999}})
 
-# Calcule la moyenne des votes pour les films sortis en 2007
-def average_votes_2007(collection):
-    pipeline = [
-        {"$match": {"year": 2007, "Votes": {"$exists": True}}},       # Filtre les films de 2007 avec des votes
-        {"$group": {"_id": None, "avgVotes": {"$avg": "$Votes"}}}     # Calcule la moyenne des votes
-    ]
-    result = list(collection.aggregate(pipeline))
+# Calcule la moyenne des votes pour les films sortis en 2007.
+# approximate=True estime la moyenne sur un échantillon $sample (valeur avec bornes .low / .high).
+@budgeted("mongo")
+def average_votes_2007(collection, approximate=False, sample_size=DEFAULT_SAMPLE_SIZE):
+    if approximate:
+        sample = sample_values(collection, ["Votes"], {"year": 2007}, sample_size)
+        estimate = estimate_mean(sample[:, 0])
+        return estimate if estimate is not None else 0
+    result = list(collection.aggregate(FACET_PIPELINES["average_votes_2007"]["pipeline"]))
     return result[0]["avgVotes"] if result else 0
 
 # Donne le nombre de films par année (pour créer un histogramme)
+@budgeted("mongo")
 def get_films_per_year(collection):
-    pipeline = [
-        {"$group": {"_id": "$year", "count": {"$sum": 1}}},  # Regroupe par année
-        {"$sort": {"_id": 1}}                                # Trie chronologiquement
-    ]
-    return list(collection.aggregate(pipeline))
+    return list(collection.aggregate(FACET_PIPELINES["films_per_year"]["pipeline"]))
 
-# Récupère tous les genres distincts dans la base (nettoyés si séparés par des virgules)
-def get_genres(collection):
+# Récupère tous les genres distincts dans la base (nettoyés si séparés par des virgules).
+# approximate=True lit la liste tenue à jour par les sketches de genre (sans parcours de la collection).
+@budgeted("mongo")
+def get_genres(collection, approximate=False):
+    if approximate:
+        return SketchStore(collection.database).names("genre")
     all_genres = collection.distinct("genre")  # Liste brute des genres
     genre_set = set()
     # Pour chaque champ genre, on découpe par virgule et on nettoie les espaces
@@ -59,10 +70,12 @@ def get_genres(collection):
     return sorted(list(genre_set))  # Retourne une liste triée des genres uniques
 
 # Récupère le film ayant généré le plus de revenus
+@budgeted("mongo")
 def get_top_revenue_film(collection):
     return collection.find_one({"Revenue (Millions)": {"$ne": ""}}, sort=[("Revenue (Millions)", -1)])
 
 # Récupère les réalisateurs ayant dirigé plus de 5 films
+@budgeted("mongo")
 def get_directors_with_more_than_5_films(collection):
     pipeline = [
         {"$group": {"_id": "$Director", "count": {"$sum": 1}}},         # Regroupe les films par réalisateur
@@ -71,22 +84,25 @@ def get_directors_with_more_than_5_films(collection):
     ]
     return list(collection.aggregate(pipeline))
 
-# Trouve le genre qui rapporte le plus en moyenne
-def get_best_avg_revenue_by_genre(collection):
-    pipeline = [
-        {"$match": {"Revenue (Millions)": {"$ne": ""}}},               # Garde les films avec revenu renseigné
-        {"$project": {
-            "genre": {"$split": ["$genre", ","]},                      # Sépare les genres multiples en liste
-            "revenue": "$Revenue (Millions)"
-        }},
-        {"$unwind": "$genre"},                                         # Dénormalise pour un genre par ligne
-        {"$group": {"_id": "$genre", "avgRevenue": {"$avg": "$revenue"}}},  # Moyenne des revenus par genre
-        {"$sort": {"avgRevenue": -1}},                                 # Trie décroissant
-        {"$limit": 1}                                                  # Garde le meilleur genre
-    ]
-    result = list(collection.aggregate(pipeline))
-    return result[0] if result else None
-
+# Trouve le genre qui rapporte le plus en moyenne.
+# Les sommes et effectifs par genre sont calculés sur des plages de _id en parallèle puis fusionnés.
+@budgeted("mongo")
+def get_best_avg_revenue_by_genre(collection, partitions=DEFAULT_PARTITIONS):
+    groups = parallel_aggregate(
+        collection, "$genre",
+        {"count": ("count", None), "sum": ("sum", "$revenue")},
+        match={"Revenue (Millions)": {"$type": "number"}},     # Garde les films avec revenu renseigné
+        prepare=[
+            {"$project": {
+                "genre": {"$split": ["$genre", ","]},          # Sépare les genres multiples en liste
+                "revenue": "$Revenue (Millions)"
+            }},
+            {"$unwind": "$genre"}                              # Dénormalise pour un genre par ligne
+        ],
+        partitions=partitions,
+    )
+    averages = [{"_id": g["_id"], "avgRevenue": merged_mean(g)} for g in groups]
+    return max(averages, key=lambda g: g["avgRevenue"], default=None)  # Garde le meilleur genre
 
 
 # ==========================
@@ -94,46 +110,29 @@ def get_best_avg_revenue_by_genre(collection):
 # ==========================
 
 # Récupère les 3 meilleurs films par décennie, selon leur note (rating)
+@budgeted("mongo")
 def get_top_rated_per_decade(collection):
-    pipeline = [
-        {"$match": {"rating": {"$exists": True}}},  # On garde les films qui ont un rating
-        {"$project": {
-            "title": 1,
-            "rating": 1,
-            # Calcule la décennie : par ex. 1994 -> "1990s"
-            "decade": {"$concat": [
-                {"$substr": [{"$subtract": ["$year", {"$mod": ["$year", 10]}]}, 0, 4]},
-                "s"
-            ]}
-        }},
-        {"$sort": {"decade": 1, "rating": -1}},  # Trie les films par décennie puis par note décroissante
-        {"$group": {
-            "_id": "$decade",                     # Groupe les films par décennie
-            "top3": {"$push": {"title": "$title", "rating": "$rating"}}  # Stocke tous les films triés
-        }},
-        {"$project": {"top3": {"$slice": ["$top3", 3]}}}  # Garde les 3 meilleurs par groupe
-    ]
-    return list(collection.aggregate(pipeline))
+    groups = top_k_per_group(collection, "decade", "rating", k=3)
+    return [{"_id": g["_id"], "top3": [{"title": f["title"], "rating": f["value"]} for f in g["top"]]} for g in groups]
 
 # Renvoie le film le plus long par genre
+@budgeted("mongo")
 def get_longest_film_per_genre(collection):
-    pipeline = [
-        {"$project": {
-            "title": 1,
-            "genre": {"$split": ["$genre", ","]},          # Sépare les genres multiples
-            "runtime": "$Runtime (Minutes)"
-        }},
-        {"$unwind": "$genre"},                             # Dénormalise un genre par ligne
-        {"$sort": {"runtime": -1}},                        # Trie par durée décroissante
-        {"$group": {
-            "_id": "$genre",                               # Groupe par genre
-            "title": {"$first": "$title"},                 # Prend le film avec la durée max
-            "runtime": {"$first": "$runtime"}
-        }}
-    ]
-    return list(collection.aggregate(pipeline))
+    groups = top_k_per_group(collection, "genre", "Runtime (Minutes)", k=1)
+    return [{"_id": g["_id"], "title": g["top"][0]["title"], "runtime": g["top"][0]["value"]} for g in groups]
+
+# Récupère les k films ayant le plus rapporté pour chaque année
+@budgeted("mongo")
+def get_top_revenue_per_year(collection, k=3):
+    return top_k_per_group(collection, "year", "Revenue (Millions)", k)
+
+# Récupère les k films ayant reçu le plus de votes pour chaque réalisateur
+@budgeted("mongo")
+def get_top_votes_per_director(collection, k=3):
+    return top_k_per_group(collection, "director", "Votes", k)
 
 # Crée une vue MongoDB contenant les films ayant un score élevé (>80) et revenu > 50M$
+@budgeted("mongo", stale=False)
 def create_high_score_view(collection):
     pipeline = [
         {"$match": {
@@ -145,20 +144,31 @@ def create_high_score_view(collection):
     collection.aggregate(pipeline)
     return "Vue 'high_score_films' créée avec succès."
 
-# Calcule la corrélation statistique entre la durée d’un film et son revenu
-def compute_runtime_revenue_correlation(collection):
-    # On récupère les films ayant une durée et un revenu
-    df = pd.DataFrame(list(collection.find(
-        {"Runtime (Minutes)": {"$exists": True}, "Revenue (Millions)": {"$ne": ""}},
-        {"Runtime (Minutes)": 1, "Revenue (Millions)": 1, "_id": 0}
-    )))
-    if len(df) < 2:
-        return None  # Trop peu de données pour calculer une corrélation
-    # Convertit les types vers float pour analyse
-    df = df.astype({"Runtime (Minutes)": float, "Revenue (Millions)": float})
-    return df["Runtime (Minutes)"].corr(df["Revenue (Millions)"])  # Calcule la corrélation de Pearson
+# Calcule la corrélation statistique entre la durée d’un film et son revenu.
+# approximate=True l'estime sur un échantillon $sample (valeur avec bornes .low / .high).
+@budgeted("mongo")
+def compute_runtime_revenue_correlation(collection, approximate=False, sample_size=DEFAULT_SAMPLE_SIZE,
+                                        partitions=DEFAULT_PARTITIONS):
+    if approximate:
+        sample = sample_values(collection, ["Runtime (Minutes)", "Revenue (Millions)"], None, sample_size)
+        return estimate_correlation(sample[:, 0], sample[:, 1])
+    # Sommes fusionnables (n, Σx, Σy, Σx², Σy², Σxy) calculées par plages de _id en parallèle
+    runtime, revenue = "$Runtime (Minutes)", "$Revenue (Millions)"
+    groups = parallel_aggregate(
+        collection, None,
+        {
+            "n": ("count", None),
+            "sum_x": ("sum", runtime), "sum_y": ("sum", revenue),
+            "sumsq_x": ("sumsq", runtime), "sumsq_y": ("sumsq", revenue),
+            "sum_xy": ("sum", {"$multiply": [runtime, revenue]}),
+        },
+        match={"Runtime (Minutes)": {"$type": "number"}, "Revenue (Millions)": {"$type": "number"}},
+        partitions=partitions,
+    )
+    return merged_correlation(groups[0]) if groups else None  # None si trop peu de données
 
 # Calcule la durée moyenne des films par décennie
+@budgeted("mongo")
 def get_avg_runtime_by_decade(collection):
     pipeline = [
         {"$project": {
@@ -170,8 +180,14 @@ def get_avg_runtime_by_decade(collection):
     ]
     return list(collection.aggregate(pipeline))
 
-# Recommande un film à un acteur donné selon ses genres préférés
-def recommend_film_mongo(collection, preferred_genres, excluded_actor):
+# Nombre de films candidats départagés par la similarité de contenu (TF-IDF)
+CONTENT_CANDIDATES = 50
+
+# Recommande un film à un acteur donné selon ses genres préférés.
+# Avec un modèle TF-IDF (database/tfidf.py), les meilleurs candidats de chaque niveau sont
+# départagés par la proximité de leur titre / description avec les films de l'acteur.
+@budgeted("mongo")
+def recommend_film_mongo(collection, preferred_genres, excluded_actor, tfidf=None):
     projection = {"title": 1, "genre": 1, "rating": 1, "Votes": 1, "Actors": 1}
 
     # Liste d'étapes progressives pour élargir les critères de sélection
@@ -190,10 +206,297 @@ def recommend_film_mongo(collection, preferred_genres, excluded_actor):
             "rating": {"$gte": step["rating"]},
             "Votes": {"$gte": step["votes"]}
         }
-        film = collection.find_one(query, projection, sort=[("rating", -1)])
-        
+        if tfidf is None:
+            film = collection.find_one(query, projection, sort=[("rating", -1)])
+        else:
+            film = _best_content_match(collection, query, projection, excluded_actor, tfidf)
+
         if film:
             film["criteria"] = f"Note ≥ {step['rating']}, Votes ≥ {step['votes']}"
             return film  # Retourne le premier film trouvé avec les critères
 
     return None  # Aucun film trouvé avec les genres/critères fournis
+
+# Parmi les films les mieux notés vérifiant la requête, celui dont le contenu est le plus proche
+# des films de l'acteur (note en cas d'égalité) ; sa similarité est ajoutée au document
+def _best_content_match(collection, query, projection, actor, tfidf):
+    candidates = list(collection.find(query, projection).sort("rating", -1).limit(CONTENT_CANDIDATES))
+    if not candidates:
+        return None
+    liked = [str(doc["_id"]) for doc in collection.find({"Actors": {"$regex": actor, "$options": "i"}}, {"_id": 1})]
+    scores = tfidf.similarity_to([str(doc["_id"]) for doc in candidates], liked)
+    best = max(range(len(candidates)), key=lambda i: scores[i])  # max garde le premier (mieux noté) à égalité
+    film = candidates[best]
+    film["similarity"] = scores[best]
+    return film
+
+
+
+# ==========================
+# Écriture en masse (ajout, mise à jour, suppression)
+# ==========================
+
+# Types d'opérations acceptés par bulk_write_films
+BULK_OPERATIONS = ("insert", "update", "delete")
+
+# Transforme une opération décrite par un dictionnaire en requête pymongo.
+# Formats acceptés :
+#   {"op": "insert", "document": {...}}
+#   {"op": "update", "filter": {...}, "update": {"$set": {...}}, "many": False, "upsert": False}
+#   {"op": "delete", "filter": {...}, "many": False}
+def _build_bulk_request(operation):
+    kind = operation.get("op")
+    if kind not in BULK_OPERATIONS:
+        raise ValueError(f"Opération inconnue : {kind!r} (attendu : {', '.join(BULK_OPERATIONS)})")
+    if kind == "insert":
+        document = operation.get("document")
+        if not isinstance(document, dict) or not document:
+            raise ValueError("Un ajout nécessite un document non vide")
+        return InsertOne(document)
+    filter_ = operation.get("filter")
+    if not isinstance(filter_, dict) or not filter_:
+        raise ValueError("Un filtre non vide est requis (protection contre les modifications globales)")
+    many = bool(operation.get("many", False))
+    if kind == "delete":
+        return DeleteMany(filter_) if many else DeleteOne(filter_)
+    update = operation.get("update")
+    if not isinstance(update, dict) or not update or not all(key.startswith("$") for key in update):
+        raise ValueError("Une mise à jour nécessite des opérateurs ($set, $unset, ...)")
+    upsert = bool(operation.get("upsert", False))
+    return UpdateMany(filter_, update, upsert=upsert) if many else UpdateOne(filter_, update, upsert=upsert)
+
+# Simule les opérations : compte en une seule agrégation $facet les documents visés par
+# chaque filtre (et les _id déjà présents pour les ajouts), sans rien écrire
+def _dry_run_bulk(collection, operations, valid_indexes, report):
+    facets = {}
+    for i in valid_indexes:
+        operation = operations[i]
+        if operation["op"] == "insert":
+            if "_id" not in operation["document"]:
+                continue
+            match = {"_id": operation["document"]["_id"]}
+        else:
+            match = operation["filter"]
+        stages = [{"$match": match}]
+        if not operation.get("many", False):
+            stages.append({"$limit": 1})
+        facets[f"op_{i}"] = stages + [{"$count": "n"}]
+    counts = {}
+    if facets:
+        result = next(collection.aggregate([{"$facet": facets}]), {})
+        counts = {key: (value[0]["n"] if value else 0) for key, value in result.items()}
+
+    for i in valid_indexes:
+        operation = operations[i]
+        n = counts.get(f"op_{i}", 0)
+        if operation["op"] == "insert":
+            if n:
+                report["errors"].append({"index": i, "op": "insert", "error": "_id déjà présent"})
+            else:
+                report["inserted"] += 1
+        elif operation["op"] == "update":
+            report["matched"] += n
+            if not n and operation.get("upsert", False):
+                report["upserted"] += 1
+        else:
+            report["deleted"] += n
+    return report
+
+# Exécute une liste d'opérations en un seul bulk_write non ordonné.
+# Chaque opération invalide ou en échec est rapportée avec son indice dans la liste d'origine ;
+# les autres sont appliquées. dry_run=True valide et compte les documents visés sans écrire.
+@budgeted("mongo", stale=False)
+def bulk_write_films(collection, operations, dry_run=False):
+    operations = list(operations)
+    report = {
+        "dry_run": dry_run, "requested": len(operations),
+        "inserted": 0, "matched": 0, "modified": 0, "deleted": 0, "upserted": 0,
+        "upserted_ids": [], "errors": [],
+    }
+
+    # Validation locale : les opérations mal formées ne sont jamais envoyées au serveur
+    requests, valid_indexes = [], []
+    for i, operation in enumerate(operations):
+        try:
+            requests.append(_build_bulk_request(operation))
+            valid_indexes.append(i)
+        except (ValueError, TypeError, AttributeError) as e:
+            kind = operation.get("op") if isinstance(operation, dict) else None
+            report["errors"].append({"index": i, "op": kind, "error": str(e)})
+
+    if dry_run:
+        report = _dry_run_bulk(collection, operations, valid_indexes, report)
+        report["errors"].sort(key=lambda error: error["index"])
+        return report
+    if not requests:
+        return report
+
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        # L'indice renvoyé par le serveur est celui de la requête envoyée : on le ramène à l'opération d'origine
+        for error in details.get("writeErrors", []):
+            i = valid_indexes[error["index"]]
+            report["errors"].append({"index": i, "op": operations[i]["op"], "error": error.get("errmsg")})
+    report["inserted"] += details.get("nInserted", 0)
+    report["matched"] += details.get("nMatched", 0)
+    report["modified"] += details.get("nModified", 0)
+    report["deleted"] += details.get("nRemoved", 0)
+    report["upserted"] += details.get("nUpserted", 0)
+    report["upserted_ids"] = [upsert["_id"] for upsert in details.get("upserted", [])]
+    report["errors"].sort(key=lambda error: error["index"])
+    return report
+
+
+# ==========================
+# Lectures groupées (une seule agrégation $facet)
+# ==========================
+
+# Agrégations indépendantes pouvant être regroupées dans un même $facet.
+#   - pipeline : étapes de l'agrégation (autorisées dans un $facet : ni $facet, ni $out, etc.)
+#   - single : True si le résultat est un seul document (ou None)
+#   - field / default : champ à extraire du document unique, et valeur s'il n'y en a pas
+FACET_PIPELINES = {
+    "most_common_year": {
+        "pipeline": [
+            {"$group": {"_id": "$year", "count": {"$sum": 1}}},  # Regroupement par année avec comptage
+            {"$sort": {"count": -1}},                            # Tri décroissant par nombre de films
+            {"$limit": 1}                                        # On garde seulement la première année
+        ],
+        "single": True,
+    },
+    "movies_after_1999": {
+        "pipeline": [
+            {"$match": {"year": {"$gt": 1999}}},
+            {"$count": "count"}
+        ],
+        "single": True, "field": "count", "default": 0,
+    },
+    "average_votes_2007": {
+        "pipeline": [
+            {"$match": {"year": 2007, "Votes": {"$exists": True}}},       # Filtre les films de 2007 avec des votes
+            {"$group": {"_id": None, "avgVotes": {"$avg": "$Votes"}}}     # Calcule la moyenne des votes
+        ],
+        "single": True, "field": "avgVotes", "default": 0,
+    },
+    "films_per_year": {
+        "pipeline": [
+            {"$group": {"_id": "$year", "count": {"$sum": 1}}},  # Regroupe par année
+            {"$sort": {"_id": 1}}                                # Trie chronologiquement
+        ],
+        "single": False,
+    },
+    "top_revenue_film": {
+        "pipeline": [
+            {"$match": {"Revenue (Millions)": {"$ne": ""}}},
+            {"$sort": {"Revenue (Millions)": -1}},
+            {"$limit": 1}
+        ],
+        "single": True,
+    },
+}
+
+# Statistiques générales du tableau de bord MongoDB
+OVERVIEW_PIPELINES = ["most_common_year", "movies_after_1999", "average_votes_2007", "top_revenue_film"]
+
+# Exécute plusieurs agrégations enregistrées en une seule requête $facet (un seul aller-retour,
+# un seul parcours de la collection) et renvoie leurs résultats indexés par nom.
+# Remarque : dans un $facet, les $match ne profitent pas des index de la collection.
+@budgeted("mongo")
+def run_aggregate_batch(collection, names=OVERVIEW_PIPELINES):
+    unknown = [name for name in names if name not in FACET_PIPELINES]
+    if unknown:
+        raise ValueError(f"Agrégation inconnue : {', '.join(unknown)} (attendu : {', '.join(FACET_PIPELINES)})")
+    if not names:
+        return {}
+    facet = {name: FACET_PIPELINES[name]["pipeline"] for name in names}
+    output = next(collection.aggregate([{"$facet": facet}]))
+    results = {}
+    for name in names:
+        spec, docs = FACET_PIPELINES[name], output[name]
+        if not spec["single"]:
+            results[name] = docs
+        elif "field" in spec:
+            results[name] = docs[0][spec["field"]] if docs else spec["default"]
+        else:
+            results[name] = docs[0] if docs else None
+    return results
+
+# Statistiques générales (année la plus fréquente, films après 1999, moyenne des votes 2007,
+# film le plus rentable) en une seule agrégation
+@budgeted("mongo")
+def get_collection_overview(collection):
+    return run_aggregate_batch(collection, OVERVIEW_PIPELINES)
+
+
+# ==========================
+# Top k par groupe ($topN / $bottomN)
+# ==========================
+
+# Regroupements prédéfinis :
+#   - key : expression de regroupement
+#   - prepare : étapes préalables (découpage des champs multivalués)
+TOP_K_GROUPS = {
+    "decade": {
+        # Calcule la décennie : par ex. 1994 -> "1990s"
+        "key": {"$concat": [
+            {"$substr": [{"$subtract": ["$year", {"$mod": ["$year", 10]}]}, 0, 4]},
+            "s"
+        ]},
+    },
+    "year": {"key": "$year"},
+    "director": {"key": "$Director"},
+    "genre": {
+        "key": "$genre",
+        "prepare": [
+            # Sépare les genres multiples sans retirer les espaces, comme le regroupement d'origine
+            # de get_longest_film_per_genre (" Drama" et "Drama" restent deux groupes)
+            {"$set": {"genre": {"$split": ["$genre", ","]}}},
+            {"$unwind": "$genre"}                                # Dénormalise un genre par ligne
+        ],
+    },
+}
+
+# Index facultatifs : filtre sur la mesure (et champ de regroupement simple)
+TOP_K_INDEXES = [
+    [("rating", -1)],
+    [("Runtime (Minutes)", -1)],
+    [("year", 1), ("Revenue (Millions)", -1)],
+    [("Director", 1), ("Votes", -1)],
+]
+
+# Crée les index facultatifs des classements par groupe
+@budgeted("mongo", stale=False)
+def create_top_k_indexes(collection):
+    for keys in TOP_K_INDEXES:
+        collection.create_index(keys)
+    return "Index des classements par groupe créés."
+
+# Renvoie les k meilleurs documents de chaque groupe selon une mesure :
+# [{"_id": groupe, "top": [{"value": mesure, <champs>}, ...]}] trié par groupe.
+#   - group : nom d'un regroupement de TOP_K_GROUPS ou expression de regroupement ("$champ", {...})
+#   - largest=False renvoie les k plus petites valeurs ($bottomN sur le même tri décroissant)
+#   - match : filtre supplémentaire ; par défaut, seuls les documents ayant la mesure comptent
+# L'accumulateur $topN (MongoDB 5.2+) ne garde que k documents par groupe : la mémoire ne dépend
+# plus de la taille des groupes, contrairement à un $sort global suivi de $push / $slice.
+@budgeted("mongo")
+def top_k_per_group(collection, group, metric, k=3, largest=True, fields=("title",), match=None):
+    if k < 1:
+        raise ValueError("k doit être supérieur ou égal à 1.")
+    spec = TOP_K_GROUPS.get(group, {"key": group}) if isinstance(group, str) else {"key": group}
+    if isinstance(spec["key"], str) and not spec["key"].startswith("$"):
+        raise ValueError(f"Regroupement inconnu : {group} (attendu : {', '.join(TOP_K_GROUPS)} ou une expression)")
+    output = {field: f"${field}" for field in fields}
+    output["value"] = f"${metric}"
+    pipeline = [
+        {"$match": {metric: {"$exists": True, "$ne": ""}, **(match or {})}},
+        *spec.get("prepare", []),
+        {"$group": {
+            "_id": spec["key"],
+            "top": {"$topN" if largest else "$bottomN": {"n": k, "sortBy": {metric: -1}, "output": output}}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    return list(collection.aggregate(pipeline))
@@ -10,6 +10,18 @@ from neo4j import GraphDatabase
 # - NEO4J_PASSWORD : le mot de passe associé à cet utilisateur
 from config.config import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
 
+# Mise à jour incrémentale des compteurs de classement lors des écritures de films
+from database.leaderboards import read_film_snapshots, apply_film_deltas
+
+# Clé de dictionnaire des films (identifiants entiers partagés avec MongoDB)
+from database.dictionary import film_key
+
+# Budgets de requête (délais de transaction), annulation et disjoncteur
+from database.budget import budgeted, budget_session
+# Couche temporelle : tranches annuelles recalculées pour les seules années touchées
+from database.temporal import film_years, refresh_years
+# Modèle TF-IDF enregistré, périmé dès que le catalogue change
+
 
 # ==========================
 # Connexion à Neo4j
@@ -20,30 +32,250 @@ def connect_neo4j(uri=NEO4J_URI, user=NEO4J_USER, password=NEO4J_PASSWORD):
     return GraphDatabase.driver(uri, auth=(user, password))
 
 # Teste la connexion à Neo4j en renvoyant un message de confirmation
+@budgeted("neo4j")
 def test_connection(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         result = session.run("RETURN 'Connexion à Neo4j réussie !' AS message")
         return result.single()["message"]
 
+# ==========================
+# Écriture des films dans le graphe
+# ==========================
+
+# Découpe un champ texte séparé par des virgules ("Drama, Crime") en liste nettoyée
+def split_field(value):
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+# Prépare les paramètres Cypher d'un document film MongoDB (noms encore non encodés)
+def _film_row(film):
+    director = (film.get("Director") or "").strip()
+    return {
+        "key": film_key(film),
+        "title": film.get("title"),
+        "year": film.get("year"),
+        "rating": film.get("rating"),
+        "votes": film.get("Votes"),
+        "revenue": film.get("Revenue (Millions)"),
+        "directors": [director] if director else [],
+        "actors": list(dict.fromkeys(split_field(film.get("Actors")))),
+        "genres": list(dict.fromkeys(split_field(film.get("genre")))),
+    }
+
+# Encode un lot de documents films : chaque film, acteur, réalisateur et genre reçoit son
+# identifiant entier (attribué par lot dans le dictionnaire partagé)
+def encode_film_rows(dictionary, films):
+    rows = [_film_row(film) for film in films if film.get("title")]
+    film_ids = dictionary.encode("film", [row["key"] for row in rows])
+    ids = {
+        key: dictionary.encode(kind, [name for row in rows for name in row[key]])
+        for kind, key in (("director", "directors"), ("actor", "actors"), ("genre", "genres"))
+    }
+    encoded = {}
+    for row in rows:
+        row["id"] = film_ids[row.pop("key")]
+        for key in ("directors", "actors", "genres"):
+            row[key] = [{"id": ids[key][name], "name": name} for name in row[key]]
+        encoded[row["id"]] = row  # Un même document présent deux fois : la dernière version l'emporte
+    return list(encoded.values())
+
+# Relations d'un film reconstruites depuis le document (motif, clé de ligne)
+_FILM_EDGES = (
+    ("(o:Director)-[r:REALISE]->(f)", "directors"),
+    ("(o:Actor)-[r:A_JOUE]->(f)", "actors"),
+    ("(f)-[r:APPARTIENT_A]->(o:Genre)", "genres"),
+)
+
+# Écrit un lot de films encodés (nœuds, réalisateurs, acteurs, genres) avec des requêtes UNWIND
+# et met à jour les compteurs de classement dans la même transaction.
+# replace=True supprime d'abord les relations absentes du document (correction d'un film).
+def _import_films_tx(tx, rows, replace=False):
+    if not rows:
+        return 0
+    film_ids = [row["id"] for row in rows]
+    before = read_film_snapshots(tx, film_ids)
+    tx.run("""
+        UNWIND $rows AS row
+        MERGE (f:Film {id: row.id})
+        SET f.title = row.title,
+            f.year = row.year,
+            f.rating = row.rating,
+            f.votes = row.votes,
+            f.revenue = row.revenue
+    """, rows=rows)
+    if replace:
+        for pattern, key in _FILM_EDGES:
+            tx.run(f"""
+                UNWIND $rows AS row
+                MATCH (f:Film {{id: row.id}})
+                MATCH {pattern}
+                WHERE NOT o.id IN [x IN row.{key} | x.id]
+                DELETE r
+            """, rows=rows)
+    tx.run("""
+        UNWIND $rows AS row
+        MATCH (f:Film {id: row.id})
+        UNWIND row.directors AS director
+        MERGE (d:Director {id: director.id})
+        SET d.name = director.name
+        MERGE (d)-[:REALISE]->(f)
+    """, rows=rows)
+    tx.run("""
+        UNWIND $rows AS row
+        MATCH (f:Film {id: row.id})
+        UNWIND row.actors AS actor
+        MERGE (a:Actor {id: actor.id})
+        SET a.name = actor.name
+        MERGE (a)-[:A_JOUE]->(f)
+    """, rows=rows)
+    tx.run("""
+        UNWIND $rows AS row
+        MATCH (f:Film {id: row.id})
+        UNWIND row.genres AS genre
+        MERGE (g:Genre {id: genre.id})
+        SET g.name = genre.name
+        MERGE (f)-[:APPARTIENT_A]->(g)
+    """, rows=rows)
+    after = read_film_snapshots(tx, film_ids)
+    apply_film_deltas(tx, [(before.get(film_id), after.get(film_id)) for film_id in film_ids])
+    return len(rows)
+
+# Importe (ou met à jour) un lot de documents films MongoDB dans le graphe, en une transaction.
+# Si un SketchStore est fourni, les sketches du mode approximatif sont mis à jour ensuite ;
+# si un TemporalStore est fourni, seules les tranches annuelles des années touchées sont recalculées.
+@budgeted("neo4j", stale=False)
+def import_films(driver, films, dictionary, sketches=None, temporal=None):
+    rows = encode_film_rows(dictionary, films)
+    years = film_years(driver, [row["id"] for row in rows]) if temporal is not None else set()
+    with budget_session(driver) as session:
+        written = session.execute_write(_import_films_tx, rows)
+    if sketches is not None:
+        sketches.add_film_rows(rows)
+    if temporal is not None:
+        refresh_years(driver, temporal, years | {row["year"] for row in rows})
+    return written
+
+# Importe (ou met à jour) un document film MongoDB dans le graphe
+@budgeted("neo4j", stale=False)
+def import_film(driver, film, dictionary, sketches=None, temporal=None):
+    return import_films(driver, [film], dictionary, sketches, temporal) > 0
+
+# Supprime un lot de films (identifiants entiers) du graphe en retirant leur contribution aux compteurs
+def _delete_films_tx(tx, film_ids):
+    before = read_film_snapshots(tx, film_ids)
+    if not before:
+        return 0
+    apply_film_deltas(tx, [(snapshot, None) for snapshot in before.values()])
+    tx.run("UNWIND $ids AS id MATCH (f:Film {id: id}) DETACH DELETE f", ids=list(before))
+    return len(before)
+
+# Supprime des films (et leurs relations) du graphe, en une transaction
+@budgeted("neo4j", stale=False)
+def delete_films(driver, film_ids):
+    with budget_session(driver) as session:
+        return session.execute_write(_delete_films_tx, list(film_ids))
+
+# Supprime un film (et ses relations) du graphe
+@budgeted("neo4j", stale=False)
+def delete_film(driver, film_id):
+    return delete_films(driver, [film_id]) > 0
+
+# Applique en une seule transaction des suppressions (identifiants) puis des écritures
+# (remplacement) de documents films
+# Avec un TemporalStore, les tranches des anciennes et nouvelles années des films sont recalculées ;
+# previous_years (années avant modification, connues de l'appelant) évite de les relire dans le graphe.
+@budgeted("neo4j", stale=False)
+def sync_films(driver, upserts, deletions, dictionary, sketches=None, temporal=None, previous_years=None):
+    rows = encode_film_rows(dictionary, upserts)
+    deletions = list(deletions)
+    years = set()
+    if temporal is not None:
+        if previous_years is None:
+            previous_years = film_years(driver, deletions + [row["id"] for row in rows])
+        years = set(previous_years) | {row["year"] for row in rows}
+    def work(tx):
+        deleted = _delete_films_tx(tx, deletions)
+        written = _import_films_tx(tx, rows, replace=True)
+        return {"deleted": deleted, "written": written}
+    with budget_session(driver) as session:
+        report = session.execute_write(work)
+    if sketches is not None:
+        sketches.add_film_rows(rows)
+    if temporal is not None:
+        report["years_refreshed"] = refresh_years(driver, temporal, years)
+    return report
+
+# Nombre de nœuds migrés par transaction lors de la migration des identifiants
+MIGRATION_BATCH_SIZE = 1000
+
+# Migration d'un graphe créé avant le dictionnaire (nœuds fusionnés sur leur titre ou leur nom,
+# sans propriété `id`) : chaque acteur, réalisateur et genre reçoit l'identifiant de son nom ;
+# chaque film reçoit celui du document MongoDB portant son titre. Un titre porté par plusieurs
+# documents (ou par aucun) ne désigne pas un film précis : le nœud est supprimé, et l'import
+# le recrée document par document. À exécuter avant import_films sur un tel graphe.
+@budgeted("neo4j", stale=False)
+def migrate_legacy_ids(driver, collection, dictionary):
+    report = {}
+    with budget_session(driver) as session:
+        for label, kind in (("Actor", "actor"), ("Director", "director"), ("Genre", "genre")):
+            names = [r["name"] for r in session.run(f"MATCH (n:{label}) WHERE n.id IS NULL AND n.name IS NOT NULL RETURN n.name AS name")]
+            for i in range(0, len(names), MIGRATION_BATCH_SIZE):
+                ids = dictionary.encode(kind, names[i:i + MIGRATION_BATCH_SIZE])
+                session.run(f"""
+                    UNWIND $rows AS row
+                    MATCH (n:{label} {{name: row.key}}) WHERE n.id IS NULL
+                    SET n.id = row.id
+                """, rows=[{"key": key, "id": value} for key, value in ids.items()])
+            report[kind] = len(names)
+
+        titles = [r["title"] for r in session.run("MATCH (f:Film) WHERE f.id IS NULL AND f.title IS NOT NULL RETURN f.title AS title")]
+        matched = 0
+        for i in range(0, len(titles), MIGRATION_BATCH_SIZE):
+            documents = {}
+            for film in collection.find({"title": {"$in": titles[i:i + MIGRATION_BATCH_SIZE]}}, {"title": 1}):
+                documents.setdefault(film["title"], []).append(film)
+            unique = {title: films[0] for title, films in documents.items() if len(films) == 1}
+            ids = dictionary.encode("film", [film_key(film) for film in unique.values()])
+            session.run("""
+                UNWIND $rows AS row
+                MATCH (f:Film {title: row.title}) WHERE f.id IS NULL
+                SET f.id = row.id
+            """, rows=[{"title": title, "id": ids[film_key(film)]} for title, film in unique.items()])
+            matched += len(unique)
+        deleted = session.run("MATCH (f:Film) WHERE f.id IS NULL DETACH DELETE f RETURN count(*) AS n").single()["n"]
+        report["film"] = matched
+        report["film_deleted"] = deleted
+    return report
+
 # ==========================
 # Fonctions de requêtage Neo4j
 # ==========================
 
+# Classement approximatif lu dans les sketches, avec les mêmes clés que la version exacte
+def _approximate_top(sketches, kind, limit, name_key, count_key):
+    if sketches is None:
+        raise ValueError("Le mode approximatif nécessite un SketchStore (database/sketches.py)")
+    return [{name_key: name, count_key: count} for name, count in sketches.top(kind, limit)]
+
 # Renvoie la liste des 50 premiers titres de films, triés par ordre alphabétique
+@budgeted("neo4j")
 def get_all_films(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         result = session.run("MATCH (f:Film) RETURN f.title AS title ORDER BY f.title LIMIT 50")
         return [record["title"] for record in result]
 
 # Renvoie tous les noms de réalisateurs, triés par ordre alphabétique
+@budgeted("neo4j")
 def get_all_directors(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         result = session.run("MATCH (d:Director) RETURN d.name AS name ORDER BY d.name")
         return [record["name"] for record in result]
 
 # Récupère tous les films réalisés par un réalisateur donné
+@budgeted("neo4j")
 def get_films_by_director(driver, director_name):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         result = session.run(
             "MATCH (d:Director {name: $name})-[:REALISE]->(f:Film) RETURN f.title AS title ORDER BY f.year",
             name=director_name
@@ -51,20 +283,16 @@ def get_films_by_director(driver, director_name):
         return [record["title"] for record in result]
 
 # Trouve l’acteur ayant joué dans le plus de films
+@budgeted("neo4j")
 def get_most_active_actor(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (a:Actor)-[:A_JOUE]->(f:Film)
-        RETURN a.name AS actor, COUNT(f) AS nb_films
-        ORDER BY nb_films DESC
-        LIMIT 1
-        """
-        result = session.run(query)
+    with budget_session(driver) as session:
+        result = session.run(BATCH_QUERIES["most_active_actor"]["query"])
         return result.single()
 
 # Liste les co-acteurs ayant joué avec un acteur donné (par défaut Anne Hathaway)
+@budgeted("neo4j")
 def get_actors_who_played_with(driver, actor_name="Anne Hathaway"):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (a1:Actor {name: $actor_name})-[:A_JOUE]->(f:Film)<-[:A_JOUE]-(a2:Actor)
         WHERE a1 <> a2
@@ -74,45 +302,34 @@ def get_actors_who_played_with(driver, actor_name="Anne Hathaway"):
         result = session.run(query, {"actor_name": actor_name})
         return [record["co_actor"] for record in result]
 
-# Renvoie l’acteur ayant généré le plus de revenus cumulés
+# Renvoie l’acteur ayant généré le plus de revenus cumulés (compteur Actor.total_revenue, database/leaderboards.py)
+@budgeted("neo4j")
 def get_top_grossing_actor(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (a:Actor)-[:A_JOUE]->(f:Film)
-        WHERE f.revenue IS NOT NULL
-        RETURN a.name AS actor, SUM(toFloat(f.revenue)) AS total_revenue
-        ORDER BY total_revenue DESC
-        LIMIT 1
-        """
-        result = session.run(query)
+    with budget_session(driver) as session:
+        result = session.run(BATCH_QUERIES["top_grossing_actor"]["query"])
         return result.single()
 
 # Calcule la moyenne du nombre de votes sur l’ensemble des films
+@budgeted("neo4j")
 def get_average_votes(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (f:Film)
-        WHERE f.votes IS NOT NULL
-        RETURN avg(toFloat(f.votes)) AS avg_votes
-        """
-        result = session.run(query)
+    with budget_session(driver) as session:
+        result = session.run(BATCH_QUERIES["average_votes"]["query"])
         return result.single()
 
-# Trouve le genre de film le plus courant dans la base
-def get_most_common_genre(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (f:Film)-[:APPARTIENT_A]->(g:Genre)
-        RETURN g.name AS genre, COUNT(f) AS nb_films
-        ORDER BY nb_films DESC
-        LIMIT 1
-        """
-        result = session.run(query)
+# Trouve le genre de film le plus courant dans la base.
+# approximate=True lit l'estimation HyperLogLog du SketchStore `sketches` au lieu de parcourir le graphe.
+@budgeted("neo4j")
+def get_most_common_genre(driver, approximate=False, sketches=None):
+    if approximate:
+        return next(iter(_approximate_top(sketches, "genre", 1, "genre", "nb_films")), None)
+    with budget_session(driver) as session:
+        result = session.run(BATCH_QUERIES["most_common_genre"]["query"])
         return result.single()
 
 # Récupère les films dans lesquels ont joué les co-acteurs d’un acteur donné
+@budgeted("neo4j")
 def get_films_played_by_coactors(driver, actor_name):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (me:Actor {name: $name})-[:A_JOUE]->(f1:Film)<-[:A_JOUE]-(co:Actor)
         WHERE me <> co
@@ -124,8 +341,9 @@ def get_films_played_by_coactors(driver, actor_name):
         return [record["film"] for record in result]
 
 # Récupère tous les noms d’acteurs dans la base
+@budgeted("neo4j")
 def get_all_actors(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         result = session.run("MATCH (a:Actor) RETURN a.name AS name ORDER BY name")
         return [record["name"] for record in result]
 
@@ -136,20 +354,18 @@ def get_all_actors(driver):
 # ==========================
 
 # Récupère le réalisateur ayant collaboré avec le plus grand nombre d’acteurs distincts
-def get_director_with_most_actors(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (d:Director)-[:REALISE]->(f:Film)<-[:A_JOUE]-(a:Actor)
-        RETURN d.name AS director, COUNT(DISTINCT a) AS nb_actors
-        ORDER BY nb_actors DESC
-        LIMIT 1
-        """
-        result = session.run(query)
+@budgeted("neo4j")
+def get_director_with_most_actors(driver, approximate=False, sketches=None):
+    if approximate:
+        return next(iter(_approximate_top(sketches, "director", 1, "director", "nb_actors")), None)
+    with budget_session(driver) as session:
+        result = session.run(BATCH_QUERIES["director_with_most_actors"]["query"])
         return result.single()
 
 # Récupère les films qui ont le plus d’acteurs (par défaut top 5)
+@budgeted("neo4j")
 def get_most_connected_films(driver, limit=5):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (a:Actor)-[:A_JOUE]->(f:Film)
         RETURN f.title AS title, COUNT(a) AS nb_acteurs
@@ -159,21 +375,33 @@ def get_most_connected_films(driver, limit=5):
         result = session.run(query, {"limit": limit})
         return [{"title": r["title"], "actors": r["nb_acteurs"]} for r in result]
 
-# Trouve les acteurs ayant travaillé avec le plus de réalisateurs différents
-def get_actors_with_most_directors(driver, limit=5):
-    with driver.session() as session:
+# Trouve les acteurs ayant travaillé avec le plus de réalisateurs différents (compteur Actor.director_count)
+@budgeted("neo4j")
+def get_actors_with_most_directors(driver, limit=5, approximate=False, sketches=None):
+    if approximate:
+        return _approximate_top(sketches, "actor", limit, "actor", "directors")
+    with budget_session(driver) as session:
         query = """
-        MATCH (a:Actor)-[:A_JOUE]->(f:Film)<-[:REALISE]-(d:Director)
-        RETURN a.name AS actor, COUNT(DISTINCT d) AS nb_directors
-        ORDER BY nb_directors DESC
+        MATCH (a:Actor)
+        WHERE a.director_count > 0
+        RETURN a.name AS actor, a.director_count AS nb_directors
+        ORDER BY a.director_count DESC
         LIMIT $limit
         """
         result = session.run(query, {"limit": limit})
         return [{"actor": r["actor"], "directors": r["nb_directors"]} for r in result]
 
-# Recommande un film à un acteur selon son genre préféré
-def recommend_film_by_genre(driver, actor_name):
-    with driver.session() as session:
+# Nombre de films candidats départagés par la similarité de contenu (TF-IDF)
+CONTENT_CANDIDATES = 50
+
+# Recommande un film à un acteur selon son genre préféré.
+# Avec un modèle TF-IDF (database/tfidf.py), le film retenu parmi les candidats du genre est
+# celui dont le titre / la description ressemble le plus aux films de l'acteur.
+@budgeted("neo4j")
+def recommend_film_by_genre(driver, actor_name, tfidf=None):
+    if tfidf is not None:
+        return _recommend_film_by_content(driver, actor_name, tfidf)
+    with budget_session(driver) as session:
         query = """
         MATCH (a:Actor {name: $name})-[:A_JOUE]->(:Film)-[:APPARTIENT_A]->(g:Genre)
         WITH a, g, COUNT(*) AS freq
@@ -187,9 +415,30 @@ def recommend_film_by_genre(driver, actor_name):
         result = session.run(query, {"name": actor_name})
         return result.single()
 
+# Variante de recommend_film_by_genre classant les candidats du genre préféré par TF-IDF
+def _recommend_film_by_content(driver, actor_name, tfidf):
+    with budget_session(driver) as session:
+        query = """
+        MATCH (a:Actor {name: $name})-[:A_JOUE]->(:Film)-[:APPARTIENT_A]->(g:Genre)
+        WITH a, g, COUNT(*) AS freq
+        ORDER BY freq DESC
+        LIMIT 1
+        MATCH (rec:Film)-[:APPARTIENT_A]->(g)
+        WHERE NOT (a)-[:A_JOUE]->(rec)
+        WITH a, g, collect(rec.title)[..$candidates] AS candidates
+        RETURN g.name AS genre, candidates, [(a)-[:A_JOUE]->(f:Film) | f.title] AS seen
+        """
+        record = session.run(query, {"name": actor_name, "candidates": CONTENT_CANDIDATES}).single()
+    if record is None or not record["candidates"]:
+        return None
+    scores = tfidf.similarity_to(record["candidates"], record["seen"])
+    best = max(range(len(scores)), key=lambda i: scores[i])
+    return {"title": record["candidates"][best], "genre": record["genre"], "similarity": scores[best]}
+
 # Crée les relations d'influence entre réalisateurs ayant réalisé des films de même genre
+@budgeted("neo4j", stale=False)
 def create_influence_relationships(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (d1:Director)-[:REALISE]->(:Film)-[:APPARTIENT_A]->(g:Genre)<-[:APPARTIENT_A]-(:Film)<-[:REALISE]-(d2:Director)
         WHERE d1 <> d2
@@ -199,8 +448,9 @@ def create_influence_relationships(driver):
     return "Relations :INFLUENCE_PAR créées entre réalisateurs avec genres communs."
 
 # Calcule le chemin le plus court entre deux acteurs (via la relation A_JOUE)
+@budgeted("neo4j")
 def get_shortest_path_between_actors(driver, actor1, actor2):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH path = shortestPath(
             (a1:Actor {name: $actor1})-[:A_JOUE*]-(a2:Actor {name: $actor2})
@@ -218,8 +468,9 @@ def get_shortest_path_between_actors(driver, actor1, actor2):
         return nodes
 
 # Crée les relations A_JOUE_AVEC entre tous les acteurs ayant joué dans le même film
+@budgeted("neo4j", stale=False)
 def create_actor_collaboration_edges(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (a1:Actor)-[:A_JOUE]->(f:Film)<-[:A_JOUE]-(a2:Actor)
         WHERE a1 <> a2
@@ -229,8 +480,9 @@ def create_actor_collaboration_edges(driver):
     return "Relations :A_JOUE_AVEC créées entre acteurs ayant partagé un film."
 
 # Utilise l'algorithme Louvain de Neo4j GDS pour détecter des communautés d’acteurs
+@budgeted("neo4j", stale=False)
 def detect_actor_communities(driver):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         # Supprimer le graphe en mémoire s’il existe
         session.run("CALL gds.graph.drop('actorGraph', false)")
         # Créer un graphe projeté basé sur les relations A_JOUE_AVEC
@@ -261,8 +513,9 @@ def detect_actor_communities(driver):
 # ==========================
 
 # Trouve des paires de films appartenant à un même genre mais réalisés par des personnes différentes
+@budgeted("neo4j")
 def get_films_with_common_genres_diff_directors(driver, limit=10):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (f1:Film)-[:APPARTIENT_A]->(g:Genre)<-[:APPARTIENT_A]-(f2:Film),
               (f1)<-[:REALISE]-(d1:Director),
@@ -277,8 +530,9 @@ def get_films_with_common_genres_diff_directors(driver, limit=10):
         return result.data()
 
 # Identifie les genres préférés d’un acteur donné, en fonction du nombre de films associés
+@budgeted("neo4j")
 def get_preferred_genres_for_actor(driver, actor_name, limit=3):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
         MATCH (a:Actor {name: $name})-[:A_JOUE]->(:Film)-[:APPARTIENT_A]->(g:Genre)
         RETURN g.name AS genre, COUNT(*) AS freq
@@ -288,28 +542,292 @@ def get_preferred_genres_for_actor(driver, actor_name, limit=3):
         result = session.run(query, {"name": actor_name, "limit": limit})
         return [record["genre"] for record in result]
 
-# Crée une relation :CONCURRENCE entre deux réalisateurs ayant fait des films similaires la même année
-def create_director_concurrence_relationships(driver):
-    with driver.session() as session:
-        query = """
-        MATCH (d1:Director)-[:REALISE]->(f1:Film)-[:APPARTIENT_A]->(g:Genre)<-[:APPARTIENT_A]-(f2:Film)<-[:REALISE]-(d2:Director)
-        WHERE d1 <> d2 AND f1.year = f2.year
+# Crée une relation :CONCURRENCE entre deux réalisateurs ayant fait des films similaires la même année.
+# Avec un TemporalStore, les couples sont lus dans les tranches annuelles (déjà calculées année
+# par année) au lieu de joindre toutes les paires de films de même genre du graphe. Les années
+# dont la tranche est tronquée (MAX_COMPETITORS) sont jointes dans le graphe, seules : les relations
+# créées sont les mêmes que sans tranches (dans les deux sens, comme la jointure symétrique).
+@budgeted("neo4j", stale=False)
+def create_director_concurrence_relationships(driver, temporal=None):
+    query = """
+    MATCH (d1:Director)-[:REALISE]->(f1:Film)-[:APPARTIENT_A]->(g:Genre)<-[:APPARTIENT_A]-(f2:Film)<-[:REALISE]-(d2:Director)
+    WHERE d1 <> d2 AND f1.year = f2.year
+    MERGE (d1)-[:CONCURRENCE]->(d2)
+    """
+    with budget_session(driver) as session:
+        if temporal is None:
+            session.run(query)
+            return "Relations :CONCURRENCE créées entre réalisateurs avec films similaires la même année."
+        slices = temporal.load()
+        complete = [data for data in slices.values() if not data["competition_truncated"]]
+        truncated = [year for year, data in slices.items() if data["competition_truncated"]]
+        pairs = {tuple(int(d) for d in row[:2]) for data in complete for row in data["competition"]}
+        session.run("""
+        UNWIND $pairs AS pair
+        MATCH (d1:Director {id: pair[0]}), (d2:Director {id: pair[1]})
         MERGE (d1)-[:CONCURRENCE]->(d2)
-        """
-        session.run(query)
+        MERGE (d2)-[:CONCURRENCE]->(d1)
+        """, pairs=[list(pair) for pair in sorted(pairs)])
+        if truncated:
+            session.run(query.replace("WHERE d1 <> d2", "WHERE f1.year IN $years AND d1 <> d2"), years=truncated)
     return "Relations :CONCURRENCE créées entre réalisateurs avec films similaires la même année."
 
-# Renvoie les collaborations fréquentes entre acteurs et réalisateurs, avec leurs performances (revenu et votes)
+# Renvoie les collaborations fréquentes entre acteurs et réalisateurs, avec leurs performances (revenu et votes),
+# lues sur les relations :COLLABORE_AVEC maintenues par database/leaderboards.py
+@budgeted("neo4j")
 def get_frequent_collaborations_with_success(driver, min_collaborations=1):
-    with driver.session() as session:
+    with budget_session(driver) as session:
         query = """
-        MATCH (a:Actor)-[:A_JOUE]->(f:Film)<-[:REALISE]-(d:Director)
-        WITH a, d, COUNT(f) AS collaborations, 
-             AVG(toFloat(f.revenue)) AS avg_revenue, 
-             AVG(toFloat(f.votes)) AS avg_votes
-        WHERE collaborations >= $min_collaborations
-        RETURN a.name AS actor, d.name AS director, collaborations, avg_revenue, avg_votes
+        MATCH (a:Actor)-[c:COLLABORE_AVEC]->(d:Director)
+        WHERE c.films >= $min_collaborations
+        RETURN a.name AS actor, d.name AS director, c.films AS collaborations,
+               CASE WHEN c.revenue_count > 0 THEN c.revenue_sum / c.revenue_count END AS avg_revenue,
+               CASE WHEN c.votes_count > 0 THEN c.votes_sum / c.votes_count END AS avg_votes
         ORDER BY collaborations DESC
         """
         result = session.run(query, {"min_collaborations": min_collaborations})
         return result.data()
+
+
+# ==========================
+# Lecture en flux et pagination par clé (keyset)
+# ==========================
+
+# Nombre d'enregistrements demandés au serveur par aller-retour lors d'une lecture en flux
+DEFAULT_FETCH_SIZE = 1000
+
+# Requêtes listées pouvant être lues en flux ou page par page.
+#   - body : partie MATCH terminée par un WITH qui expose les colonnes
+#   - columns : colonnes renvoyées
+#   - keys : clé de tri (colonne, sens) ; elle sert aussi de curseur de pagination et doit
+#     donc être unique (les titres ne l'étant pas, l'identifiant entier du film départage)
+PAGINATED_QUERIES = {
+    "films": {
+        "body": "MATCH (f:Film) WITH f.title AS title, f.id AS id",
+        "columns": ["title", "id"],
+        "keys": [("title", "ASC"), ("id", "ASC")],
+    },
+    "actors": {
+        "body": "MATCH (a:Actor) WITH a.name AS name",
+        "columns": ["name"],
+        "keys": [("name", "ASC")],
+    },
+    "directors": {
+        "body": "MATCH (d:Director) WITH d.name AS name",
+        "columns": ["name"],
+        "keys": [("name", "ASC")],
+    },
+    "co_actors": {
+        "body": """
+            MATCH (a1:Actor {name: $actor_name})-[:A_JOUE]->(:Film)<-[:A_JOUE]-(a2:Actor)
+            WHERE a1 <> a2
+            WITH DISTINCT a2.name AS co_actor
+        """,
+        "columns": ["co_actor"],
+        "keys": [("co_actor", "ASC")],
+    },
+    "coactor_films": {
+        "body": """
+            MATCH (me:Actor {name: $name})-[:A_JOUE]->(:Film)<-[:A_JOUE]-(co:Actor)
+            WHERE me <> co
+            MATCH (co)-[:A_JOUE]->(f2:Film)
+            WITH DISTINCT f2.title AS film, f2.id AS film_id
+        """,
+        "columns": ["film", "film_id"],
+        "keys": [("film", "ASC"), ("film_id", "ASC")],
+    },
+    # Binômes lus sur les relations :COLLABORE_AVEC (database/leaderboards.py) : chaque page
+    # parcourt les relations au lieu de ré-agréger tous les films du graphe
+    "collaborations": {
+        "body": """
+            MATCH (a:Actor)-[c:COLLABORE_AVEC]->(d:Director)
+            WHERE c.films >= $min_collaborations
+            WITH a.name AS actor, d.name AS director, c.films AS collaborations,
+                 CASE WHEN c.revenue_count > 0 THEN c.revenue_sum / c.revenue_count END AS avg_revenue,
+                 CASE WHEN c.votes_count > 0 THEN c.votes_sum / c.votes_count END AS avg_votes
+        """,
+        "columns": ["actor", "director", "collaborations", "avg_revenue", "avg_votes"],
+        "keys": [("collaborations", "DESC"), ("actor", "ASC"), ("director", "ASC")],
+    },
+}
+
+# Construit la condition "ligne strictement après le curseur $after" pour une clé composite
+def _keyset_condition(keys):
+    clauses = []
+    for i, (column, direction) in enumerate(keys):
+        op = ">" if direction == "ASC" else "<"
+        equal = [f"{previous} = $after.{previous}" for previous, _ in keys[:i]]
+        clauses.append("(" + " AND ".join(equal + [f"{column} {op} $after.{column}"]) + ")")
+    return "$after IS NULL OR " + " OR ".join(clauses)
+
+# Assemble la requête complète (tri, curseur et éventuelle limite) pour une requête listée
+def _paginated_query(name, paged):
+    if name not in PAGINATED_QUERIES:
+        raise ValueError(f"Requête inconnue : {name} (attendu : {', '.join(PAGINATED_QUERIES)})")
+    spec = PAGINATED_QUERIES[name]
+    query = f"""
+        {spec['body']}
+        WITH * WHERE {_keyset_condition(spec['keys'])}
+        RETURN {', '.join(spec['columns'])}
+        ORDER BY {', '.join(f'{column} {direction}' for column, direction in spec['keys'])}
+    """
+    return query + ("LIMIT $limit" if paged else "")
+
+# Parcourt les résultats d'une requête listée sans les matérialiser : les enregistrements
+# sont récupérés par lots de fetch_size et produits un à un (générateur)
+@budgeted("neo4j")
+def stream_list(driver, name, fetch_size=DEFAULT_FETCH_SIZE, **params):
+    query = _paginated_query(name, paged=False)
+    with budget_session(driver, fetch_size=fetch_size) as session:
+        result = session.run(query, {"after": None, **params})
+        for record in result:
+            yield record.data()
+
+# Renvoie une page de résultats et le curseur de la page suivante (None s'il n'y en a plus).
+# Le curseur est la clé de tri de la dernière ligne : la page suivante reprend juste après.
+@budgeted("neo4j")
+def get_list_page(driver, name, after=None, page_size=50, **params):
+    query = _paginated_query(name, paged=True)
+    with budget_session(driver) as session:
+        result = session.run(query, {"after": after, "limit": page_size + 1, **params})
+        rows = result.data()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = {column: rows[-1][column] for column, _ in PAGINATED_QUERIES[name]["keys"]}
+    return rows, next_cursor
+
+# Collaborations acteur–réalisateur en flux (voir get_frequent_collaborations_with_success)
+@budgeted("neo4j")
+def stream_frequent_collaborations(driver, min_collaborations=1, fetch_size=DEFAULT_FETCH_SIZE):
+    yield from stream_list(driver, "collaborations", fetch_size, min_collaborations=min_collaborations)
+
+# Une page de collaborations acteur–réalisateur et le curseur de la page suivante
+@budgeted("neo4j")
+def get_frequent_collaborations_page(driver, min_collaborations=1, after=None, page_size=50):
+    return get_list_page(driver, "collaborations", after, page_size, min_collaborations=min_collaborations)
+
+
+# ==========================
+# Lectures groupées (un seul aller-retour)
+# ==========================
+
+# Requêtes de lecture indépendantes pouvant être regroupées dans un même appel.
+#   - query : requête complète terminée par RETURN (sans paramètre propre à l'appelant)
+#   - columns : colonnes renvoyées
+#   - single : True si la requête renvoie au plus une ligne (résultat = dict ou None)
+BATCH_QUERIES = {
+    "most_active_actor": {
+        "query": """
+            MATCH (a:Actor)
+            WHERE a.film_count > 0
+            RETURN a.name AS actor, a.film_count AS nb_films
+            ORDER BY a.film_count DESC
+            LIMIT 1
+        """,
+        "columns": ["actor", "nb_films"],
+        "single": True,
+    },
+    "top_grossing_actor": {
+        "query": """
+            MATCH (a:Actor)
+            WHERE a.total_revenue IS NOT NULL AND a.film_count > 0
+            RETURN a.name AS actor, a.total_revenue AS total_revenue
+            ORDER BY a.total_revenue DESC
+            LIMIT 1
+        """,
+        "columns": ["actor", "total_revenue"],
+        "single": True,
+    },
+    "average_votes": {
+        "query": """
+            MATCH (f:Film)
+            WHERE f.votes IS NOT NULL
+            RETURN avg(toFloat(f.votes)) AS avg_votes
+        """,
+        "columns": ["avg_votes"],
+        "single": True,
+    },
+    "most_common_genre": {
+        "query": """
+            MATCH (f:Film)-[:APPARTIENT_A]->(g:Genre)
+            RETURN g.name AS genre, COUNT(f) AS nb_films
+            ORDER BY nb_films DESC
+            LIMIT 1
+        """,
+        "columns": ["genre", "nb_films"],
+        "single": True,
+    },
+    "director_with_most_actors": {
+        "query": """
+            MATCH (d:Director)
+            WHERE d.actor_count > 0
+            RETURN d.name AS director, d.actor_count AS nb_actors
+            ORDER BY d.actor_count DESC
+            LIMIT 1
+        """,
+        "columns": ["director", "nb_actors"],
+        "single": True,
+    },
+}
+
+# Statistiques générales du tableau de bord Neo4j
+OVERVIEW_QUERIES = ["average_votes", "most_common_genre", "most_active_actor", "top_grossing_actor"]
+
+# Modes de regroupement : une seule requête Cypher (CALL {}) ou une transaction de lecture
+BATCH_MODES = ("call", "transaction")
+
+# Vérifie les noms demandés et renvoie leurs définitions
+def _batch_specs(names):
+    unknown = [name for name in names if name not in BATCH_QUERIES]
+    if unknown:
+        raise ValueError(f"Requête inconnue : {', '.join(unknown)} (attendu : {', '.join(BATCH_QUERIES)})")
+    return [(name, BATCH_QUERIES[name]) for name in names]
+
+# Met en forme les lignes d'une requête selon sa définition (dict ou None si single, sinon liste)
+def _batch_result(spec, rows):
+    if spec["single"]:
+        return rows[0] if rows else None
+    return rows
+
+# Compose les requêtes en une seule instruction Cypher : chaque requête devient une
+# sous-requête CALL {} dont les lignes sont agrégées par collect() (une liste vide si elle
+# ne renvoie rien, ce qui évite d'annuler le produit des autres sous-requêtes)
+def _compose_batch_query(specs):
+    parts, results = [], []
+    for i, (_, spec) in enumerate(specs):
+        row = ", ".join(f"{column}: {column}" for column in spec["columns"])
+        parts.append(f"CALL {{ {spec['query']} }}")
+        parts.append(f"WITH {''.join(f'{r}, ' for r in results)}collect({{{row}}}) AS batch_{i}")
+        results.append(f"batch_{i}")
+    return "\n".join(parts) + "\nRETURN " + ", ".join(f"batch_{i} AS `{name}`" for i, (name, _) in enumerate(specs))
+
+# Exécute toutes les requêtes dans une même transaction de lecture gérée (rejouée par le
+# driver en cas d'erreur transitoire)
+def _run_batch_tx(tx, specs):
+    return {name: tx.run(spec["query"]).data() for name, spec in specs}
+
+# Exécute plusieurs requêtes de lecture enregistrées en un seul appel et renvoie leurs résultats
+# indexés par nom.
+#   - mode "call" : une seule instruction Cypher, donc un seul aller-retour réseau
+#   - mode "transaction" : une transaction de lecture gérée, une requête par instruction
+@budgeted("neo4j")
+def run_read_batch(driver, names=OVERVIEW_QUERIES, mode="call"):
+    if mode not in BATCH_MODES:
+        raise ValueError(f"Mode inconnu : {mode} (attendu : {', '.join(BATCH_MODES)})")
+    specs = _batch_specs(names)
+    if not specs:
+        return {}
+    with budget_session(driver) as session:
+        if mode == "call":
+            record = session.execute_read(lambda tx: tx.run(_compose_batch_query(specs)).single())
+            rows = {name: record[name] for name, _ in specs}
+        else:
+            rows = session.execute_read(_run_batch_tx, specs)
+    return {name: _batch_result(spec, rows[name]) for name, spec in specs}
+
+# Statistiques générales (moyenne des votes, genre le plus courant, acteur le plus actif,
+# acteur le plus rentable) en un seul aller-retour
+@budgeted("neo4j")
+def get_graph_overview(driver, mode="call"):
+    return run_read_batch(driver, OVERVIEW_QUERIES, mode)
@@ -0,0 +1,156 @@
+# ================================
+# database/pagerank.py
+# Recommandation de films par PageRank personnalisé (marche aléatoire avec redémarrage)
+# ================================
+#
+# Le graphe acteurs – films – réalisateurs est chargé une fois depuis Neo4j sous forme de
+# listes d'arêtes NumPy (non orientées : A_JOUE et REALISE dans les deux sens). Depuis un
+# acteur, une marche aléatoire suit une arête au hasard et revient à l'acteur avec la
+# probabilité alpha : la probabilité stationnaire d'un film mesure sa proximité avec
+# l'acteur (partenaires, réalisateurs et partenaires de partenaires), et non la seule
+# fréquence des genres.
+#
+# Une itération est un produit creux vectorisé : chaque arête transporte
+# score[source] / degré[source], les contributions sont sommées par destination
+# (np.add.reduceat sur les arêtes triées). Plusieurs acteurs sont traités ensemble, une
+# colonne par acteur ; l'itération s'arrête dès que tous les vecteurs ont convergé.
+
+import numpy as np
+
+from database.budget import budgeted, budget_session
+
+# Probabilité de revenir à l'acteur de départ à chaque pas
+DEFAULT_ALPHA = 0.15
+
+# Convergence : variation L1 maximale entre deux itérations, et nombre maximal d'itérations
+DEFAULT_TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+NODE_KINDS = ("film", "actor", "director")
+
+
+# Graphe de recommandation : nœuds numérotés (films, puis acteurs, puis réalisateurs)
+class RecommendationGraph:
+    def __init__(self, films, actors, directors, played, directed):
+        # films / actors / directors : {identifiant Neo4j: nom} ; played / directed : couples
+        # (identifiant d'acteur ou de réalisateur, identifiant de film)
+        self.names, self.kinds, self.index = [], [], {}
+        for kind, nodes in (("film", films), ("actor", actors), ("director", directors)):
+            for node_id, name in nodes.items():
+                self.index[(kind, node_id)] = len(self.names)
+                self.names.append(name)
+                self.kinds.append(kind)
+        self.kinds = np.array(self.kinds)
+        self.n = len(self.names)
+        self.films = np.flatnonzero(self.kinds == "film")
+        self.actor_index = {name: self.index[("actor", i)] for i, name in actors.items()}
+
+        pairs = [(self.index[("actor", a)], self.index[("film", f)]) for a, f in played
+                 if ("actor", a) in self.index and ("film", f) in self.index]
+        pairs += [(self.index[("director", d)], self.index[("film", f)]) for d, f in directed
+                  if ("director", d) in self.index and ("film", f) in self.index]
+        pairs = np.unique(np.asarray(pairs, dtype=np.int64).reshape(-1, 2), axis=0)
+
+        # Arêtes dans les deux sens, triées par destination pour np.add.reduceat
+        src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        order = np.argsort(dst, kind="stable")
+        self.src, self.dst = src[order], dst[order]
+        self.degree = np.bincount(src, minlength=self.n)
+        self.weights = 1.0 / self.degree[self.src]
+        self.targets, self.starts = np.unique(self.dst, return_index=True)
+        self.dangling = self.degree == 0
+
+        # Voisins de chaque nœud (CSR), pour les chemins d'explication
+        self.neighbour_ptr = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=self.n), out=self.neighbour_ptr[1:])
+
+    # Voisins d'un nœud
+    def neighbours(self, node):
+        return self.src[self.neighbour_ptr[node]:self.neighbour_ptr[node + 1]]
+
+    # Numéro de nœud d'un acteur, avec une erreur explicite s'il est inconnu
+    def actor_node(self, name):
+        if name not in self.actor_index:
+            raise ValueError(f"Acteur inconnu : {name}")
+        return self.actor_index[name]
+
+    # Un pas de marche pour toutes les colonnes : scores transportés le long des arêtes
+    def _propagate(self, scores):
+        result = np.zeros_like(scores)
+        if self.src.size:
+            contributions = scores[self.src] * self.weights[:, None]
+            result[self.targets] = np.add.reduceat(contributions, self.starts, axis=0)
+        return result
+
+    # PageRank personnalisé depuis plusieurs nœuds de départ (une colonne par départ).
+    # La masse des nœuds isolés et le redémarrage reviennent au nœud de départ.
+    def personalized_pagerank(self, seeds, alpha=DEFAULT_ALPHA, tol=DEFAULT_TOLERANCE, max_iter=MAX_ITERATIONS):
+        seeds = np.asarray(seeds, dtype=np.int64)
+        restart = np.zeros((self.n, seeds.size))
+        restart[seeds, np.arange(seeds.size)] = 1.0
+        scores = restart.copy()
+        for iteration in range(1, max_iter + 1):
+            lost = scores[self.dangling].sum(axis=0)
+            updated = (1 - alpha) * self._propagate(scores) + (alpha + (1 - alpha) * lost) * restart
+            delta = np.abs(updated - scores).sum(axis=0)
+            scores = updated
+            if delta.max(initial=0.0) < tol:
+                break
+        return scores, iteration
+
+    # Chemin acteur -> film vu -> personne -> film recommandé passant par la personne la mieux
+    # classée ; chemin direct acteur -> film -> film si rien à distance 3 (None sinon)
+    def explain(self, seed, film, scores):
+        seen = set(self.neighbours(seed).tolist())
+        best = None
+        for person in self.neighbours(film):
+            for via in self.neighbours(person):
+                if via in seen and (best is None or scores[person] > scores[best[1]]):
+                    best = (via, person)
+        if best is None:
+            return None
+        return [self.names[node] for node in (seed, best[0], best[1], film)]
+
+    # Films non vus les mieux classés pour une colonne de scores
+    def top_films(self, seed, scores, limit):
+        seen = set(self.neighbours(seed).tolist())
+        candidates = np.array([f for f in self.films if f not in seen], dtype=np.int64)
+        if candidates.size == 0:
+            return []
+        limit = min(limit, candidates.size)
+        best = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            {"title": self.names[f], "score": float(scores[f]), "path": self.explain(seed, f, scores)}
+            for f in best if scores[f] > 0
+        ]
+
+
+# Charge le graphe acteurs – films – réalisateurs depuis Neo4j
+@budgeted("neo4j", stale=False)
+def build_recommendation_graph(driver):
+    with budget_session(driver) as session:
+        films = {r["id"]: r["title"] for r in session.run("MATCH (f:Film) RETURN f.id AS id, f.title AS title")}
+        actors = {r["id"]: r["name"] for r in session.run("MATCH (a:Actor) RETURN a.id AS id, a.name AS name")}
+        directors = {r["id"]: r["name"] for r in session.run("MATCH (d:Director) RETURN d.id AS id, d.name AS name")}
+        played = [(r["a"], r["f"]) for r in session.run("MATCH (a:Actor)-[:A_JOUE]->(f:Film) RETURN a.id AS a, f.id AS f")]
+        directed = [(r["d"], r["f"]) for r in session.run("MATCH (d:Director)-[:REALISE]->(f:Film) RETURN d.id AS d, f.id AS f")]
+    return RecommendationGraph(films, actors, directors, played, directed)
+
+
+# Recommande à plusieurs acteurs à la fois les films non vus les plus proches dans le graphe,
+# avec un chemin d'explication ; renvoie {acteur: [{title, score, path}]}
+def recommend_films_pagerank_batch(graph, actor_names, limit=5, alpha=DEFAULT_ALPHA):
+    actor_names = list(dict.fromkeys(actor_names))
+    seeds = [graph.actor_node(name) for name in actor_names]
+    scores, _ = graph.personalized_pagerank(seeds, alpha)
+    return {
+        name: graph.top_films(seed, scores[:, column], limit)
+        for column, (name, seed) in enumerate(zip(actor_names, seeds))
+    }
+
+
+# Recommande à un acteur les films non vus les plus proches dans le graphe
+def recommend_films_pagerank(graph, actor_name, limit=5, alpha=DEFAULT_ALPHA):
+    return recommend_films_pagerank_batch(graph, [actor_name], limit, alpha)[actor_name]
@@ -0,0 +1,209 @@
+# ================================
+# database/partitioned.py
+# Agrégations MongoDB découpées en partitions exécutées en parallèle, résultats fusionnés côté client
+# ================================
+#
+# Sur un déploiement non partitionné, une agrégation lourde s'exécute sur un seul fil du
+# serveur. Ici, la collection est découpée en plages disjointes d'un champ (_id ou year) ;
+# chaque plage exécute la même agrégation dans un fil du client (ThreadPoolExecutor, le
+# MongoClient étant partagé), et le serveur traite les plages en parallèle.
+#
+# Seuls des agrégats partiels fusionnables sont demandés au serveur, puis combinés ici :
+#   count, sum, sumsq (somme des carrés) : additionnés ; min / max ; top / bottom : k meilleurs
+#   des k meilleurs de chaque plage (valeurs numériques uniquement). Moyennes, variances et corrélations s'en déduisent.
+# Si une étape préalable n'est pas applicable document par document ($sort, $limit, $group...),
+# la plage n'a plus de sens : l'agrégation part alors en un seul pipeline sur toute la collection.
+
+import contextvars
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+from database.budget import budgeted, check_cancelled
+
+# Nombre de plages par défaut
+DEFAULT_PARTITIONS = 4
+
+# Taille de l'échantillon $sample servant à choisir les bornes des plages
+BOUNDARY_SAMPLE_SIZE = 1000
+
+# Étapes applicables document par document (le résultat d'une plage ne dépend que de ses documents)
+DECOMPOSABLE_STAGES = {"$match", "$project", "$set", "$addFields", "$unset", "$unwind", "$replaceRoot", "$replaceWith"}
+
+ACCUMULATORS = ("count", "sum", "sumsq", "min", "max", "top", "bottom")
+
+
+# -------------------------------
+# Plages
+# -------------------------------
+
+# Bornes des plages d'un champ, choisies parmi les valeurs d'un échantillon aléatoire
+# (quantiles) : pas de parcours complet de la collection
+def partition_boundaries(collection, field="_id", partitions=DEFAULT_PARTITIONS, sample_size=BOUNDARY_SAMPLE_SIZE):
+    if partitions <= 1:
+        return []
+    sample = collection.aggregate([
+        {"$sample": {"size": sample_size}},
+        {"$match": {field: {"$type": ["number", "objectId", "string", "date"]}}},
+        {"$project": {"_id": 0, "value": f"${field}"}}
+    ])
+    values = [doc["value"] for doc in sample]
+    try:
+        values.sort()
+    except TypeError:
+        return []  # Types mélangés : pas de découpage fiable
+    bounds = [values[len(values) * i // partitions] for i in range(1, partitions)] if values else []
+    return list(dict.fromkeys(bounds))
+
+
+# Filtres disjoints couvrant toute la collection : la première plage reçoit aussi les documents
+# sans valeur comparable (champ absent, null, autre type)
+def partition_filters(field, boundaries):
+    if not boundaries:
+        return [{}]
+    filters = [{field: {"$not": {"$gte": boundaries[0]}}}]
+    for low, high in zip(boundaries, boundaries[1:]):
+        filters.append({field: {"$gte": low, "$lt": high}})
+    filters.append({field: {"$gte": boundaries[-1]}})
+    return filters
+
+
+# -------------------------------
+# Agrégats partiels
+# -------------------------------
+
+# Vérifie les accumulateurs : {nom: (type, expression[, k, champs])}
+def _check_accumulators(accumulators):
+    for name, spec in accumulators.items():
+        if spec[0] not in ACCUMULATORS:
+            raise ValueError(f"Accumulateur inconnu pour {name} : {spec[0]} (attendu : {', '.join(ACCUMULATORS)})")
+
+
+# Étapes $set et $group calculant les agrégats partiels d'une plage. Pour top / bottom, seules
+# les valeurs numériques comptent : les autres sont remplacées par une valeur que l'ordre BSON
+# classe derrière tous les nombres (null < nombres < chaînes), puis retirées après le $group
+def _partial_stages(group, accumulators):
+    values, fields, numeric = {}, {}, {}
+    for name, (kind, expr, *options) in accumulators.items():
+        if kind == "count":
+            fields[name] = {"$sum": 1}
+        elif kind == "sum":
+            fields[name] = {"$sum": expr}
+        elif kind == "sumsq":
+            fields[name] = {"$sum": {"$multiply": [expr, expr]}}
+        elif kind in ("min", "max"):
+            fields[name] = {f"${kind}": expr}
+        else:
+            k, output = options[0], {field: f"${field}" for field in (options[1] if len(options) > 1 else ("title",))}
+            # $topN trie sur un champ : l'expression est d'abord calculée
+            values[f"__{name}"] = {"$cond": [{"$isNumber": expr}, expr, None if kind == "top" else ""]}
+            output["value"] = f"$__{name}"
+            operator = "$topN" if kind == "top" else "$bottomN"
+            fields[name] = {operator: {"n": k, "sortBy": {f"__{name}": -1}, "output": output}}
+            numeric[name] = {"$filter": {"input": f"${name}", "cond": {"$isNumber": "$$this.value"}}}
+    stages = [{"$set": values}] if values else []
+    stages.append({"$group": {"_id": group, **fields}})
+    return stages + ([{"$set": numeric}] if numeric else [])
+
+
+# Valeur numérique (les booléens exclus), seule comparable entre plages pour top / bottom
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# Fusionne deux agrégats partiels d'un même accumulateur
+def _merge_value(spec, left, right):
+    kind = spec[0]
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if kind in ("count", "sum", "sumsq"):
+        return left + right
+    if kind == "min":
+        return min(left, right)
+    if kind == "max":
+        return max(left, right)
+    pick = heapq.nlargest if kind == "top" else heapq.nsmallest
+    docs = [doc for doc in left + right if _is_number(doc.get("value"))]
+    return pick(spec[2], docs, key=lambda doc: doc["value"])
+
+
+# Fusionne les résultats de toutes les plages : [{"_id": groupe, <accumulateurs>}]
+def merge_partials(accumulators, partials):
+    merged = {}
+    for docs in partials:
+        for doc in docs:
+            current = merged.get(doc["_id"])
+            if current is None:
+                merged[doc["_id"]] = dict(doc)
+                continue
+            for name, spec in accumulators.items():
+                current[name] = _merge_value(spec, current.get(name), doc.get(name))
+    return list(merged.values())
+
+
+# -------------------------------
+# Exécution
+# -------------------------------
+
+# Indique si les étapes préalables permettent le découpage en plages
+def is_decomposable(prepare):
+    return all(len(stage) == 1 and next(iter(stage)) in DECOMPOSABLE_STAGES for stage in prepare)
+
+
+# Filtre d'une plage : celui de l'appelant ET la plage (le filtre de l'appelant peut porter
+# sur le champ de découpage lui-même)
+def _combined_match(match, partition):
+    if not match:
+        return partition
+    if not partition:
+        return match
+    return {"$and": [match, partition]}
+
+
+# Exécute l'agrégation d'une plage
+def _run_partition(collection, pipeline):
+    check_cancelled()
+    return list(collection.aggregate(pipeline))
+
+
+# Agrégation groupée découpée en plages du champ `field` exécutées en parallèle.
+#   - group : expression de regroupement (None pour un seul groupe)
+#   - accumulators : {nom: ("count", None) | ("sum" / "sumsq" / "min" / "max", expression)
+#                     | ("top" / "bottom", expression, k[, champs])}
+#   - match / prepare : filtre et étapes préalables appliqués dans chaque plage
+# Renvoie [{"_id": groupe, <nom>: valeur fusionnée}] (ordre quelconque). Avec partitions=1 ou
+# des étapes non décomposables, un seul pipeline est exécuté sur toute la collection.
+@budgeted("mongo")
+def parallel_aggregate(collection, group, accumulators, match=None, prepare=(), field="_id",
+                       partitions=DEFAULT_PARTITIONS, workers=None):
+    _check_accumulators(accumulators)
+    stages = list(prepare) + _partial_stages(group, accumulators)
+    boundaries = partition_boundaries(collection, field, partitions) if is_decomposable(prepare) else []
+    filters = partition_filters(field, boundaries)
+    pipelines = [[{"$match": _combined_match(match, f)}] + stages if (match or f) else stages for f in filters]
+    if len(pipelines) == 1:
+        return merge_partials(accumulators, [_run_partition(collection, pipelines[0])])
+    # Chaque fil reçoit une copie du contexte : budget (maxTimeMS) et annulation s'y appliquent
+    with ThreadPoolExecutor(max_workers=workers or len(pipelines)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _run_partition, collection, p) for p in pipelines]
+        return merge_partials(accumulators, [future.result() for future in futures])
+
+
+# Moyenne d'un groupe fusionné à partir de sa somme et de son effectif (None si vide)
+def merged_mean(doc, total="sum", count="count"):
+    return doc[total] / doc[count] if doc.get(count) else None
+
+
+# Corrélation de Pearson à partir des sommes fusionnées (n, Σx, Σy, Σx², Σy², Σxy) ;
+# None si moins de deux points ou variance nulle
+def merged_correlation(doc):
+    n = doc.get("n") or 0
+    if n < 2:
+        return None
+    cov = doc["sum_xy"] - doc["sum_x"] * doc["sum_y"] / n
+    var_x = doc["sumsq_x"] - doc["sum_x"] ** 2 / n
+    var_y = doc["sumsq_y"] - doc["sum_y"] ** 2 / n
+    if var_x <= 0 or var_y <= 0:
+        return None
+    return cov / (var_x * var_y) ** 0.5
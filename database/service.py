@@ -0,0 +1,427 @@
+# ================================
+# database/service.py
+# Service JSON en lecture seule devant les fonctions de database/mongo.py et database/neo4j.py
+# ================================
+#
+# Serveur Tornado (déjà installé avec Streamlit) :
+#   GET    /api                      liste des fonctions exposées et de leurs paramètres
+#   GET    /api/<base>/<fonction>    résultat JSON ; chaque paramètre de la chaîne de requête est
+#                                    une valeur JSON (?limit=5&actor_name="Tom Hanks"), budget=<s>
+#   DELETE /api/cache                vide le cache (après une écriture)
+# Un seul MongoClient et un seul driver Neo4j sont partagés par toutes les requêtes ; les
+# fonctions bloquantes s'exécutent dans un pool de fils. Les réponses sont gardées CACHE_TTL
+# secondes avec leur ETag : If-None-Match renvoie 304 sans corps, et des requêtes identiques
+# simultanées n'interrogent la base qu'une fois. Un résultat périmé (disjoncteur) est servi
+# avec l'en-tête X-Served-Stale mais jamais mis en cache.
+#
+# ServiceClient permet à app.py d'utiliser le service à la place des bases (SERVICE_URL dans
+# config/config.py) : remote_functions() renvoie des fonctions de même signature, dont le
+# premier argument (collection ou driver) est ignoré. Au lieu d'un modèle TF-IDF, elles
+# acceptent l'indicateur use_tfidf=True (tfidf=true) : le service charge et utilise le sien
+# (models/tfidf.npz). ReadFunctions regroupe les fonctions de lecture, locales ou distantes.
+
+import asyncio
+import contextvars
+import datetime
+import hashlib
+import inspect
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tornado.web
+from bson import ObjectId
+from neo4j import Record
+
+from database import mongo, neo4j
+from database.budget import (
+    CircuitOpenError, QueryCancelled, QueryTimeout,
+    mark_stale, reset_stale, served_stale, session_budget
+)
+from database.sketches import CountEstimate, Estimate, SketchStore
+from database.tfidf import DEFAULT_MODEL_PATH, load_or_build_tfidf, tfidf_version
+
+# Port d'écoute par défaut
+DEFAULT_PORT = 8888
+
+# Durée de vie des réponses en cache (secondes) et nombre maximal de réponses gardées
+CACHE_TTL = 60
+CACHE_SIZE = 1024
+
+# Fils exécutant les fonctions bloquantes, et budget par défaut d'une requête (secondes)
+WORKERS = 16
+DEFAULT_BUDGET = 30
+
+# Fonctions de lecture exposées (les fonctions d'écriture ne le sont jamais)
+READ_FUNCTIONS = {
+    "mongo": [
+        "get_most_common_year", "count_movies_after_1999", "average_votes_2007", "get_films_per_year",
+        "get_genres", "get_top_revenue_film", "get_directors_with_more_than_5_films",
+        "get_best_avg_revenue_by_genre", "get_top_rated_per_decade", "get_longest_film_per_genre",
+        "get_top_revenue_per_year", "get_top_votes_per_director", "compute_runtime_revenue_correlation",
+        "get_avg_runtime_by_decade", "recommend_film_mongo", "get_collection_overview",
+    ],
+    "neo4j": [
+        "get_all_films", "get_all_directors", "get_films_by_director", "get_most_active_actor",
+        "get_actors_who_played_with", "get_top_grossing_actor", "get_average_votes", "get_most_common_genre",
+        "get_films_played_by_coactors", "get_all_actors", "get_director_with_most_actors",
+        "get_most_connected_films", "get_actors_with_most_directors", "recommend_film_by_genre",
+        "get_shortest_path_between_actors", "get_films_with_common_genres_diff_directors",
+        "get_preferred_genres_for_actor", "get_frequent_collaborations_with_success",
+        "get_frequent_collaborations_page", "get_graph_overview",
+    ],
+}
+_MODULES = {"mongo": mongo, "neo4j": neo4j}
+
+# Paramètres fournis par le service lui-même (jamais par la requête). Pour `tfidf`, la requête
+# indique seulement si le modèle doit être utilisé (tfidf=true) : le service passe le sien.
+_SERVER_PARAMS = {"sketches", "tfidf"}
+
+
+# -------------------------------
+# Sérialisation
+# -------------------------------
+
+# Convertit un résultat en valeurs JSON. Les estimations gardent leurs bornes ; les
+# identifiants MongoDB deviennent des chaînes.
+def to_json(value):
+    if isinstance(value, Estimate):
+        return {"$estimate": [float(value), value.low, value.high, value.sample_size]}
+    if isinstance(value, CountEstimate):
+        return {"$count_estimate": [int(value), value.low, value.high]}
+    if isinstance(value, Record):
+        value = value.data()
+    if isinstance(value, dict):
+        return {str(k): to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+# Reconstruit les estimations d'une réponse décodée (object_hook de json.loads)
+def _from_json(obj):
+    if len(obj) == 1 and "$estimate" in obj:
+        return Estimate(*obj["$estimate"])
+    if len(obj) == 1 and "$count_estimate" in obj:
+        return CountEstimate(*obj["$count_estimate"])
+    return obj
+
+
+# Valeur d'un paramètre de requête : JSON si possible, sinon chaîne brute
+def _parse_param(raw):
+    text = raw.decode("utf-8")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+# -------------------------------
+# Cache des réponses
+# -------------------------------
+
+# Réponses JSON récentes par clé (fonction et paramètres) : corps, ETag et date d'expiration
+class ResponseCache:
+    def __init__(self, ttl=CACHE_TTL, size=CACHE_SIZE):
+        self.ttl, self.size = ttl, size
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, body, etag):
+        self.entries[key] = (body, etag, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# ETag d'un corps de réponse
+def _etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+# -------------------------------
+# Serveur
+# -------------------------------
+
+# État partagé par toutes les requêtes : connexions, pool de fils, cache, calculs en cours
+class QueryService:
+    def __init__(self, mongo_uri, neo4j_uri, neo4j_user, neo4j_password,
+                 ttl=CACHE_TTL, workers=WORKERS, budget=DEFAULT_BUDGET, tfidf_path=DEFAULT_MODEL_PATH):
+        self.mongo_client = mongo.connect_mongo(mongo_uri)
+        self.db = self.mongo_client["entertainment"]
+        self.targets = {"mongo": self.db["films"], "neo4j": neo4j.connect_neo4j(neo4j_uri, neo4j_user, neo4j_password)}
+        self.sketches = SketchStore(self.db)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache = ResponseCache(ttl)
+        self.pending = {}
+        self.budget = budget
+        self.tfidf_path = tfidf_path
+        self.tfidf = (None, None)  # (date de modification du fichier, modèle chargé)
+        self.tfidf_lock = threading.Lock()
+
+    # Fonction exposée (None si elle ne l'est pas)
+    def function(self, backend, name):
+        if name not in READ_FUNCTIONS.get(backend, ()):
+            return None
+        return getattr(_MODULES[backend], name)
+
+    # Modèle TF-IDF du service : construit au premier appel s'il n'existe pas, relu quand le
+    # fichier enregistré change (reconstruction depuis app.py ou après une édition)
+    def tfidf_model(self):
+        with self.tfidf_lock:
+            version = tfidf_version(self.tfidf_path)
+            if self.tfidf[1] is None or version != self.tfidf[0]:
+                model = load_or_build_tfidf(self.db["films"], self.tfidf_path)
+                self.tfidf = (tfidf_version(self.tfidf_path), model)
+            return self.tfidf[1]
+
+    # Exécute une fonction dans un fil : renvoie (corps JSON, résultat périmé ?)
+    def _call(self, backend, fn, kwargs):
+        reset_stale()
+        if "sketches" in inspect.signature(fn).parameters and kwargs.get("approximate"):
+            kwargs["sketches"] = self.sketches
+        if kwargs.get("tfidf"):
+            kwargs["tfidf"] = self.tfidf_model()
+        result = fn(self.targets[backend], **kwargs)
+        return json.dumps(to_json(result), ensure_ascii=False).encode("utf-8"), served_stale()
+
+    # Réponse d'une requête : depuis le cache, un calcul identique en cours ou un nouveau calcul
+    async def respond(self, backend, fn, kwargs):
+        key = (backend, fn.__name__, json.dumps(kwargs, sort_keys=True, default=str))
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[0], entry[1], False
+        if key not in self.pending:
+            call = contextvars.copy_context().run
+            future = asyncio.get_running_loop().run_in_executor(self.executor, call, self._call, backend, fn, kwargs)
+            self.pending[key] = asyncio.ensure_future(future)
+        try:
+            body, stale = await asyncio.shield(self.pending[key])
+        finally:
+            self.pending.pop(key, None)
+        etag = _etag(body)
+        if not stale:
+            self.cache.put(key, body, etag)
+        return body, etag, stale
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.targets["neo4j"].close()
+        self.mongo_client.close()
+
+
+# Code HTTP des erreurs de la couche d'accès aux données
+_ERROR_STATUS = (
+    (QueryTimeout, 504), (CircuitOpenError, 503), (QueryCancelled, 503), (ValueError, 400), (TypeError, 400),
+)
+
+
+class _ServiceHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def write_json(self, value, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(json.dumps(value, ensure_ascii=False))
+
+
+# GET /api/<base>/<fonction>
+class QueryHandler(_ServiceHandler):
+    async def get(self, backend, name):
+        fn = self.service.function(backend, name)
+        if fn is None:
+            return self.write_json({"error": f"Fonction inconnue : {backend}/{name}"}, 404)
+        kwargs = {k: _parse_param(v[-1]) for k, v in self.request.query_arguments.items()}
+        budget = kwargs.pop("budget", None)
+        use_tfidf = kwargs.pop("tfidf", False)
+        try:
+            if _SERVER_PARAMS & kwargs.keys():
+                raise TypeError(f"Paramètres réservés au service : {', '.join(_SERVER_PARAMS & kwargs.keys())}")
+            if not isinstance(use_tfidf, bool):
+                raise TypeError("tfidf : true ou false attendu (le modèle est celui du service)")
+            if use_tfidf:
+                kwargs["tfidf"] = True
+            inspect.signature(fn).bind(None, **kwargs)  # Paramètres inconnus ou manquants : 400
+            kwargs["budget"] = self.service.budget if budget is None else budget
+            body, etag, stale = await self.service.respond(backend, fn, kwargs)
+        except Exception as exc:
+            for error, status in _ERROR_STATUS:
+                if isinstance(exc, error):
+                    return self.write_json({"error": str(exc), "type": type(exc).__name__}, status)
+            raise
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", f"max-age={self.service.cache.ttl}")
+        if stale:
+            self.set_header("X-Served-Stale", "1")
+        if etag in self.request.headers.get("If-None-Match", ""):
+            self.set_status(304)
+            return self.finish()
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.finish(body)
+
+    # ETag calculé par le handler lui-même (Tornado n'en ajoute pas un second)
+    def compute_etag(self):
+        return None
+
+
+# GET /api : fonctions exposées et leurs paramètres
+class IndexHandler(_ServiceHandler):
+    def get(self):
+        self.write_json({
+            backend: {
+                name: [p for p in list(inspect.signature(self.service.function(backend, name)).parameters)[1:]
+                       if p not in _SERVER_PARAMS or p == "tfidf"]
+                for name in names
+            }
+            for backend, names in READ_FUNCTIONS.items()
+        })
+
+
+# DELETE /api/cache : vide le cache des réponses
+class CacheHandler(_ServiceHandler):
+    def delete(self):
+        self.service.cache.clear()
+        self.write_json({"cleared": True})
+
+
+# Application Tornado du service
+def make_app(service):
+    return tornado.web.Application([
+        (r"/api/?", IndexHandler, {"service": service}),
+        (r"/api/cache", CacheHandler, {"service": service}),
+        (r"/api/(mongo|neo4j)/(\w+)", QueryHandler, {"service": service}),
+    ])
+
+
+# -------------------------------
+# Client
+# -------------------------------
+
+# Client HTTP du service : garde la dernière réponse de chaque URL avec son ETag et la
+# revalide par If-None-Match (304 : le corps déjà reçu est réutilisé)
+class ServiceClient:
+    def __init__(self, base_url, timeout=DEFAULT_BUDGET + 5, size=CACHE_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.size = size
+        self.responses = OrderedDict()  # Dernières réponses par URL (ETag, corps), les moins récentes évincées
+        self.lock = threading.Lock()
+
+    # Appelle une fonction exposée avec des paramètres nommés
+    def call(self, backend, name, **kwargs):
+        query = urllib.parse.urlencode({k: json.dumps(v) for k, v in kwargs.items()})
+        url = f"{self.base_url}/api/{backend}/{name}" + (f"?{query}" if query else "")
+        request = urllib.request.Request(url)
+        with self.lock:
+            cached = self.responses.get(url)
+            if cached is not None:
+                self.responses.move_to_end(url)
+        if cached is not None:
+            request.add_header("If-None-Match", cached[0])
+        timeout = self.timeout if kwargs.get("budget") is None else kwargs["budget"] + 5
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body, etag, stale = response.read(), response.headers.get("ETag"), response.headers.get("X-Served-Stale")
+        except urllib.error.HTTPError as exc:
+            if exc.code != 304 or cached is None:
+                raise _remote_error(exc) from None
+            etag, body, stale = cached[0], cached[1], exc.headers.get("X-Served-Stale")
+        if stale:
+            mark_stale()
+        if etag:
+            with self.lock:
+                self.responses[url] = (etag, body)
+                self.responses.move_to_end(url)
+                while len(self.responses) > self.size:
+                    self.responses.popitem(last=False)
+        return json.loads(body, object_hook=_from_json)
+
+    # Vide le cache du service et celui du client (après une écriture)
+    def invalidate(self):
+        with self.lock:
+            self.responses.clear()
+        request = urllib.request.Request(f"{self.base_url}/api/cache", method="DELETE")
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+    # Fonction distante de même signature que la fonction locale : le premier argument
+    # (collection ou driver) et les objets fournis par le service sont ignorés ;
+    # use_tfidf=True demande au service d'utiliser son propre modèle TF-IDF
+    def remote_function(self, backend, name):
+        signature = inspect.signature(getattr(_MODULES[backend], name))
+
+        def call(*args, budget=None, cancel=None, use_tfidf=False, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            params = {k: v for k, v in list(bound.arguments.items())[1:] if k not in _SERVER_PARAMS}
+            if use_tfidf:
+                params["tfidf"] = True
+            budget = budget if budget is not None else session_budget()
+            if budget is not None:
+                params["budget"] = budget
+            return self.call(backend, name, **params)
+
+        call.__name__ = name
+        return call
+
+    # Toutes les fonctions exposées, par nom
+    def remote_functions(self):
+        return {name: self.remote_function(backend, name) for backend, names in READ_FUNCTIONS.items() for name in names}
+
+
+# Fonctions de lecture appelées par l'interface (reads.get_all_films(driver), ...) : celles de
+# database/mongo.py et database/neo4j.py, ou leurs équivalents distants si un client est fourni
+class ReadFunctions:
+    def __init__(self, client=None):
+        self.client = client
+        if client is not None:
+            self.functions = client.remote_functions()
+        else:
+            self.functions = {
+                name: getattr(_MODULES[backend], name) for backend, names in READ_FUNCTIONS.items() for name in names
+            }
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["functions"][name]
+        except KeyError:
+            raise AttributeError(f"Fonction de lecture inconnue : {name}") from None
+
+    # Paramètres TF-IDF d'une recommandation : le modèle local (load_model(), None s'il n'y en a
+    # pas), ou l'indicateur use_tfidf avec le service, qui utilise le sien
+    def tfidf_params(self, load_model):
+        if self.client is not None:
+            return {"use_tfidf": True}
+        return {"tfidf": load_model()}
+
+
+# Exception locale correspondant à une réponse d'erreur du service
+def _remote_error(exc):
+    try:
+        message = json.loads(exc.read()).get("error", exc.reason)
+    except (ValueError, AttributeError):
+        message = exc.reason
+    for error, status in _ERROR_STATUS:
+        if status == exc.code:
+            return error(message)
+    return RuntimeError(f"Service : erreur {exc.code} ({message})")
@@ -0,0 +1,217 @@
+# ================================
+# database/similarity.py
+# Index de similarité MinHash / LSH entre films (genres, casting, réalisateurs)
+# ================================
+#
+# Chaque film est décrit par l'ensemble de ses genres, acteurs et réalisateurs (identifiants
+# entiers du dictionnaire partagé). Sa signature MinHash (NUM_PERM minima de hachages)
+# permet d'estimer la similarité de Jaccard entre deux films ; les signatures sont découpées
+# en BANDS bandes de ROWS lignes et chaque bande est rangée dans une table de hachage (LSH).
+# Deux films ne sont comparés que s'ils partagent au moins un seau : on évite ainsi
+# l'énumération quadratique de toutes les paires. Les candidats sont classés par Jaccard exact.
+#
+# Avec 32 bandes de 4 lignes, deux films sont candidats avec une probabilité de 1 - (1 - J^4)^32 :
+# environ 0,5 pour J = 0,42, au-delà de 0,98 pour J ≥ 0,6.
+
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+
+from database.budget import budgeted, budget_session
+from database.sketches import _hash64
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+
+# Taille maximale d'un seau énuméré par candidate_pairs : au-delà, le seau regroupe des films
+# qui ne partagent guère qu'un élément très courant (un genre seul, par exemple) et ses
+# paires, en nombre quadratique, sont ignorées
+MAX_BUCKET_SIZE = 100
+
+# Code de chaque type d'élément, mélangé à l'identifiant pour distinguer les espaces de noms
+FEATURE_KINDS = {"genre": 0, "actor": 1, "director": 2}
+
+# Graines des NUM_PERM fonctions de hachage (fixes pour que les signatures restent comparables)
+_SEEDS = _hash64(np.arange(1, NUM_PERM + 1, dtype=np.uint64))
+
+# Signature d'un ensemble vide : aucun seau
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+
+# Éléments d'un film sous forme d'entiers : identifiant * 3 + code du type
+def film_features(genres, actors, directors):
+    features = set()
+    for kind, ids in (("genre", genres), ("actor", actors), ("director", directors)):
+        features.update(int(i) * len(FEATURE_KINDS) + FEATURE_KINDS[kind] for i in ids)
+    return frozenset(features)
+
+
+# Signature MinHash d'un ensemble d'entiers (un hachage par couple graine / élément, vectorisé)
+def minhash_signature(features):
+    if not features:
+        return _EMPTY.copy()
+    values = np.fromiter(features, dtype=np.uint64, count=len(features))
+    return _hash64(values[None, :] ^ _SEEDS[:, None]).min(axis=1)
+
+
+# Similarité de Jaccard exacte entre deux ensembles
+def jaccard(a, b):
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Index LSH des films, mis à jour film par film
+class SimilarityIndex:
+    def __init__(self):
+        self.titles = {}        # identifiant de film -> titre
+        self.film_ids = {}      # titre -> identifiants (les titres ne sont pas uniques)
+        self.features = {}      # identifiant de film -> ensemble d'éléments
+        self.genres = {}        # identifiant de film -> {identifiant: nom} des genres
+        self.directors = {}     # identifiant de film -> {identifiant: nom} des réalisateurs
+        self.signatures = {}    # identifiant de film -> signature MinHash
+        self.buckets = [defaultdict(set) for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self.titles)
+
+    # Clés de seau d'une signature, une par bande
+    def _band_keys(self, signature):
+        return [signature[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+    # Ajoute ou remplace un film. genres / actors / directors : listes de {"id", "name"}
+    def add_film(self, film_id, title, genres, actors, directors):
+        self.remove_film(film_id)
+        features = film_features(
+            [g["id"] for g in genres], [a["id"] for a in actors], [d["id"] for d in directors]
+        )
+        signature = minhash_signature(features)
+        self.titles[film_id] = title
+        self.film_ids.setdefault(title, []).append(film_id)
+        self.features[film_id] = features
+        self.genres[film_id] = {g["id"]: g["name"] for g in genres}
+        self.directors[film_id] = {d["id"]: d["name"] for d in directors}
+        self.signatures[film_id] = signature
+        if features:
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                bucket[key].add(film_id)
+
+    # Retire un film de l'index (sans effet s'il en est absent)
+    def remove_film(self, film_id):
+        if film_id not in self.titles:
+            return
+        signature = self.signatures.pop(film_id)
+        if self.features.pop(film_id):
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                bucket[key].discard(film_id)
+                if not bucket[key]:
+                    del bucket[key]
+        title = self.titles.pop(film_id)
+        self.film_ids[title].remove(film_id)
+        if not self.film_ids[title]:
+            del self.film_ids[title]
+        del self.genres[film_id], self.directors[film_id]
+
+    # Jaccard estimé par les signatures (part des minima égaux)
+    def estimated_jaccard(self, a, b):
+        return float(np.mean(self.signatures[a] == self.signatures[b]))
+
+    # Films partageant au moins un seau avec un film
+    def candidates(self, film_id):
+        found = set()
+        if self.features.get(film_id):
+            for bucket, key in zip(self.buckets, self._band_keys(self.signatures[film_id])):
+                found |= bucket.get(key, set())
+        found.discard(film_id)
+        return found
+
+    # Films les plus similaires à un film (identifiant ou titre), classés par Jaccard décroissant
+    def similar(self, film, limit=10):
+        if film in self.titles:
+            film_ids = [film]
+        elif film in self.film_ids:
+            film_ids = self.film_ids[film]
+        else:
+            raise ValueError(f"Film inconnu : {film}")
+        scores = {}
+        for film_id in film_ids:
+            for other in self.candidates(film_id) - set(film_ids):
+                score = jaccard(self.features[film_id], self.features[other])
+                scores[other] = max(score, scores.get(other, 0.0))
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.titles[item[0]]))[:limit]
+        return [{"id": other, "title": self.titles[other], "jaccard": score} for other, score in ranked]
+
+    # Paires de films candidates (au moins un seau commun), chacune une seule fois ; les seaux
+    # de plus de max_bucket_size films sont ignorés
+    def candidate_pairs(self, max_bucket_size=MAX_BUCKET_SIZE):
+        pairs = set()
+        for bucket in self.buckets:
+            for members in bucket.values():
+                if 1 < len(members) <= max_bucket_size:
+                    pairs.update(combinations(sorted(members), 2))
+        return pairs
+
+    # Paires les plus similaires, éventuellement limitées aux films sans réalisateur commun
+    # et / ou ayant au moins un genre commun
+    def top_pairs(self, limit=10, different_directors=True, common_genre=False):
+        scored = []
+        for a, b in self.candidate_pairs():
+            if different_directors and self.directors[a].keys() & self.directors[b].keys():
+                continue
+            if common_genre and not self.genres[a].keys() & self.genres[b].keys():
+                continue
+            scored.append((jaccard(self.features[a], self.features[b]), a, b))
+        scored.sort(key=lambda item: (-item[0], self.titles[item[1]], self.titles[item[2]]))
+        return scored[:limit]
+
+
+# Lecture des films (genres, acteurs, réalisateurs) depuis Neo4j ; $ids = None pour tous les films
+_FILM_FEATURES_QUERY = """
+MATCH (f:Film)
+WHERE $ids IS NULL OR f.id IN $ids
+RETURN f.id AS id, f.title AS title,
+       [(f)-[:APPARTIENT_A]->(g:Genre) | {id: g.id, name: g.name}] AS genres,
+       [(f)<-[:A_JOUE]-(a:Actor) | {id: a.id, name: a.name}] AS actors,
+       [(f)<-[:REALISE]-(d:Director) | {id: d.id, name: d.name}] AS directors
+"""
+
+
+# Construit l'index de similarité à partir de tous les films du graphe
+@budgeted("neo4j", stale=False)
+def build_similarity_index(driver):
+    index = SimilarityIndex()
+    refresh_similarity_index(index, driver)
+    return index
+
+
+# Met à jour l'index pour des films modifiés (identifiants entiers) ; film_ids = None relit tout.
+# Les films demandés qui n'existent plus dans le graphe sont retirés de l'index.
+@budgeted("neo4j", stale=False)
+def refresh_similarity_index(index, driver, film_ids=None):
+    with budget_session(driver) as session:
+        result = session.run(_FILM_FEATURES_QUERY, ids=None if film_ids is None else list(film_ids))
+        seen = set()
+        for r in result:
+            index.add_film(r["id"], r["title"], r["genres"], r["actors"], r["directors"])
+            seen.add(r["id"])
+    stale = set(index.titles) if film_ids is None else set(film_ids)
+    for film_id in stale - seen:
+        index.remove_film(film_id)
+    return len(seen)
+
+
+# Paires de films proches, de réalisateurs différents et partageant au moins un genre, au format
+# de get_films_with_common_genres_diff_directors (avec les genres communs et le score de Jaccard)
+def get_similar_films_diff_directors(index, limit=10):
+    rows = []
+    for score, a, b in index.top_pairs(limit, different_directors=True, common_genre=True):
+        common = sorted(index.genres[a].keys() & index.genres[b].keys())
+        rows.append({
+            "film1": index.titles[a], "director1": ", ".join(sorted(index.directors[a].values())),
+            "film2": index.titles[b], "director2": ", ".join(sorted(index.directors[b].values())),
+            "genre": ", ".join(sorted(index.genres[a][g] for g in common)),
+            "jaccard": score,
+        })
+    return rows
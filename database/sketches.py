@@ -0,0 +1,290 @@
+# ================================
+# database/sketches.py
+# Mode approximatif : sketches HyperLogLog et estimations par échantillonnage
+# ================================
+#
+# - Comptages distincts : un sketch HyperLogLog par réalisateur (acteurs distincts), par
+#   acteur (réalisateurs distincts) et par genre (films distincts), stocké dans la collection
+#   MongoDB "sketches" avec son estimation courante, et mis à jour à chaque import de films.
+#   Un HyperLogLog ne sait pas retirer un élément : après des suppressions, les estimations
+#   peuvent rester au-dessus de la réalité jusqu'au prochain rebuild_sketches().
+# - Moyennes et corrélations : calculées sur un échantillon $sample, avec intervalle de
+#   confiance à 95 %.
+#
+# Les estimations sont renvoyées sous forme de nombres (int ou float) qui portent en plus
+# leurs bornes (.low, .high) : elles s'utilisent donc comme les valeurs exactes.
+
+import math
+from collections import defaultdict
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.budget import budgeted, budget_session
+
+# Nombre de bits d'index du HyperLogLog : 2^10 registres (1 Ko), erreur type ≈ 3,25 %
+DEFAULT_PRECISION = 10
+
+# Taille d'échantillon par défaut pour les moyennes et corrélations
+DEFAULT_SAMPLE_SIZE = 1000
+
+# Quantile de la loi normale pour un intervalle de confiance à 95 %
+Z_95 = 1.96
+
+# Nombre de tentatives de fusion d'un sketch modifié en même temps par un autre import
+MAX_MERGE_ATTEMPTS = 5
+
+# Code d'erreur MongoDB d'une clé en double (deux imports créant le même sketch)
+DUPLICATE_KEY = 11000
+
+# Ce que compte le sketch de chaque type d'entité
+SKETCH_KINDS = {
+    "director": "acteurs distincts",
+    "actor": "réalisateurs distincts",
+    "genre": "films distincts",
+}
+
+
+# -------------------------------
+# Valeurs estimées
+# -------------------------------
+
+# Entier estimé (comptage distinct) avec bornes de l'intervalle de confiance
+class CountEstimate(int):
+    def __new__(cls, value, low, high):
+        estimate = super().__new__(cls, int(round(value)))
+        estimate.low, estimate.high = low, high
+        return estimate
+
+
+# Réel estimé (moyenne, corrélation) avec bornes et taille d'échantillon
+class Estimate(float):
+    def __new__(cls, value, low, high, sample_size):
+        estimate = super().__new__(cls, value)
+        estimate.low, estimate.high, estimate.sample_size = low, high, sample_size
+        return estimate
+
+
+# -------------------------------
+# HyperLogLog
+# -------------------------------
+
+# Mélange splitmix64 : hache des identifiants entiers en 64 bits, de façon vectorisée
+def _hash64(values):
+    with np.errstate(over="ignore"):
+        x = np.asarray(values, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+# Longueur en bits d'entiers 64 bits (0 pour 0), calculée sur deux moitiés de 32 bits
+def _bit_length(values):
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide="ignore"):
+        high_bits = np.where(high > 0, np.floor(np.log2(np.maximum(high, 1))) + 33, 0)
+        low_bits = np.where(low > 0, np.floor(np.log2(np.maximum(low, 1))) + 1, 0)
+    return np.where(high_bits > 0, high_bits, low_bits).astype(np.int64)
+
+
+# Sketch HyperLogLog sur des identifiants entiers
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        self.registers = registers
+
+    # Ajoute des identifiants entiers au sketch (une seule passe vectorisée)
+    def add_many(self, values):
+        values = np.asarray(list(values), dtype=np.int64)
+        if values.size == 0:
+            return self
+        hashes = _hash64(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = hashes << np.uint64(self.precision)
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    # Fusionne un autre sketch de même précision (union des ensembles)
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    # Erreur type relative du sketch
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    # Estimation du nombre d'éléments distincts, avec intervalle de confiance
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        value = raw
+        if raw <= 2.5 * self.m and zeros:
+            value = self.m * math.log(self.m / zeros)  # Correction pour les petits ensembles
+        margin = Z_95 * self.relative_error * value
+        return CountEstimate(value, max(0.0, value - margin), value + margin)
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        return cls(precision, np.frombuffer(data, dtype=np.uint8).copy())
+
+
+# -------------------------------
+# Stockage des sketches dans MongoDB
+# -------------------------------
+
+# Sketches par entité, stockés dans la collection "sketches" :
+# {_id: "<kind>:<id>", kind, id, name, precision, registers, estimate, version}
+class SketchStore:
+    def __init__(self, db, precision=DEFAULT_PRECISION):
+        self.collection = db["sketches"]
+        self.precision = precision
+
+    # Index servant aux classements approximatifs (tri par estimation)
+    def ensure_indexes(self):
+        self.collection.create_index([("kind", ASCENDING), ("estimate", DESCENDING)])
+
+    # Ajoute des éléments aux sketches : additions = {(kind, id): (nom, ensemble d'identifiants)}.
+    # Chaque sketch est relu, fusionné puis réécrit à condition que sa version n'ait pas changé
+    # entre-temps ; les sketches modifiés par un autre import sont relus et fusionnés à nouveau
+    # (ajouter deux fois les mêmes éléments à un HyperLogLog ne change rien).
+    def add(self, additions):
+        pending = {f"{kind}:{entity_id}": (kind, entity_id, name, members)
+                   for (kind, entity_id), (name, members) in additions.items()}
+        versions, written = {}, 0
+        for attempt in range(MAX_MERGE_ATTEMPTS + 1):
+            if not pending:
+                break
+            existing = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": list(pending)}})}
+            for key in [key for key in pending if key in versions]:
+                if existing.get(key, {}).get("version") == versions[key]:
+                    del pending[key]  # Écriture précédente appliquée
+                    written += 1
+            if not pending:
+                break
+            if attempt == MAX_MERGE_ATTEMPTS:
+                raise RuntimeError(f"Sketches modifiés en continu par d'autres imports : {', '.join(sorted(pending))}")
+            requests = []
+            for key, (kind, entity_id, name, members) in pending.items():
+                doc = existing.get(key)
+                if doc:
+                    sketch = HyperLogLog.from_bytes(doc["registers"], doc.get("precision", self.precision))
+                else:
+                    sketch = HyperLogLog(self.precision)
+                sketch.add_many(members)
+                versions[key] = ObjectId()
+                requests.append(UpdateOne({"_id": key, "version": doc.get("version") if doc else None}, {"$set": {
+                    "kind": kind, "id": entity_id, "name": name, "precision": sketch.precision,
+                    "registers": sketch.to_bytes(), "estimate": int(sketch.count()), "version": versions[key],
+                }}, upsert=True))
+            try:
+                self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # Sketch créé entre-temps par un autre import : fusionné de nouveau au tour suivant
+                if e.details.get("writeConcernErrors") or any(error["code"] != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                    raise
+        return written
+
+    # Met à jour les sketches à partir de lignes de films encodées (voir database/neo4j.py)
+    def add_film_rows(self, rows):
+        names, members = {}, defaultdict(set)
+        for row in rows:
+            actor_ids = {actor["id"] for actor in row["actors"]}
+            director_ids = {director["id"] for director in row["directors"]}
+            for kind, entities, added in (("director", row["directors"], actor_ids),
+                                          ("actor", row["actors"], director_ids),
+                                          ("genre", row["genres"], {row["id"]})):
+                for entity in entities:
+                    names[(kind, entity["id"])] = entity["name"]
+                    members[(kind, entity["id"])] |= added
+        return self.add({key: (names[key], members[key]) for key in names})
+
+    # Les `limit` entités d'un type ayant la plus grande estimation
+    def top(self, kind, limit=1):
+        if kind not in SKETCH_KINDS:
+            raise ValueError(f"Type inconnu : {kind} (attendu : {', '.join(SKETCH_KINDS)})")
+        docs = self.collection.find({"kind": kind}).sort("estimate", DESCENDING).limit(limit)
+        return [
+            (doc["name"], HyperLogLog.from_bytes(doc["registers"], doc.get("precision", self.precision)).count())
+            for doc in docs
+        ]
+
+    # Noms de toutes les entités d'un type disposant d'un sketch
+    def names(self, kind):
+        return sorted(self.collection.distinct("name", {"kind": kind}))
+
+    # Supprime tous les sketches (avant reconstruction complète)
+    def clear(self):
+        self.collection.delete_many({})
+
+
+# Reconstruit tous les sketches à partir du graphe (après des suppressions par exemple)
+@budgeted("neo4j", stale=False)
+def rebuild_sketches(driver, store):
+    store.clear()
+    queries = {
+        "director": "MATCH (o:Director)-[:REALISE]->(:Film)<-[:A_JOUE]-(m:Actor)",
+        "actor": "MATCH (o:Actor)-[:A_JOUE]->(:Film)<-[:REALISE]-(m:Director)",
+        "genre": "MATCH (m:Film)-[:APPARTIENT_A]->(o:Genre)",
+    }
+    with budget_session(driver) as session:
+        for kind, match in queries.items():
+            result = session.run(match + " RETURN o.id AS id, o.name AS name, collect(DISTINCT m.id) AS members")
+            store.add({(kind, r["id"]): (r["name"], r["members"]) for r in result})
+    return "Sketches reconstruits."
+
+
+# -------------------------------
+# Estimations par échantillonnage
+# -------------------------------
+
+# Tire un échantillon aléatoire parmi les documents vérifiant le filtre et ayant des valeurs
+# numériques : $match d'abord (index utilisables), puis $sample, puis $project
+@budgeted("mongo", stale=False)
+def sample_values(collection, fields, filter_=None, sample_size=DEFAULT_SAMPLE_SIZE):
+    numeric = {field: {"$type": "number"} for field in fields}
+    pipeline = [
+        {"$match": {"$and": [filter_, numeric]} if filter_ else numeric},
+        {"$sample": {"size": sample_size}},
+        {"$project": {"_id": 0, **{f"v{i}": f"${field}" for i, field in enumerate(fields)}}},
+    ]
+    rows = []
+    for doc in collection.aggregate(pipeline):
+        values = [doc.get(f"v{i}") for i in range(len(fields))]
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            rows.append([float(v) for v in values])
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(fields))
+
+
+# Moyenne estimée avec intervalle de confiance à 95 % (None si l'échantillon est vide)
+def estimate_mean(values):
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    if n == 0:
+        return None
+    mean = float(values.mean())
+    margin = Z_95 * float(values.std(ddof=1)) / math.sqrt(n) if n > 1 else float("inf")
+    return Estimate(mean, mean - margin, mean + margin, n)
+
+
+# Corrélation de Pearson estimée, intervalle de confiance par la transformation de Fisher
+def estimate_correlation(x, y):
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n < 4 or x.std() == 0 or y.std() == 0:
+        return None
+    r = float(np.corrcoef(x, y)[0, 1])
+    z = math.atanh(max(min(r, 0.999999), -0.999999))
+    margin = Z_95 / math.sqrt(n - 3)
+    return Estimate(r, math.tanh(z - margin), math.tanh(z + margin), n)
@@ -0,0 +1,296 @@
+# ================================
+# database/snapshot.py
+# Instantané du graphe acteurs <-> films sur disque, partagé entre processus par mmap
+# ================================
+#
+# Un instantané est un répertoire versionné de fichiers .npy (plus un manifest.json) :
+#   - actor_offsets / actor_targets : listes d'adjacence acteur -> films (format CSR,
+#     ligne = identifiant entier de l'acteur, voir database/dictionary.py)
+#   - film_offsets / film_targets   : listes d'adjacence film -> acteurs
+#   - actor_name_offsets / actor_name_bytes, film_title_offsets / film_title_bytes : noms
+#     encodés en UTF-8 mis bout à bout, le nom de l'identifiant i occupant les octets
+#     [offsets[i], offsets[i + 1]) (vide si identifiant libre)
+#   - actor_name_index / film_title_index : identifiants présents triés par nom (recherche
+#     dichotomique sur les octets, dont l'ordre est celui des chaînes)
+#   - film_year, film_rating, film_votes, film_revenue : propriétés des films (NaN si absente)
+# Chaque processus ouvre les fichiers avec np.load(mmap_mode="r") : l'ouverture est immédiate
+# et les pages sont partagées en lecture seule par le cache du système.
+#
+# L'instantané ne contient que le graphe acteurs <-> films. Son consommateur est l'algèbre
+# d'ensembles sur les castings (database/bitsets.py, CastArrayIndex), qui travaille
+# directement sur les tableaux mappés. PageRank (réalisateurs), similarité (genres,
+# réalisateurs), TF-IDF (textes MongoDB) et couche temporelle (années, genres) utilisent des
+# données absentes de l'instantané et restent construits depuis leur source.
+#
+# Le fichier CURRENT du répertoire racine désigne la version active. L'export écrit une
+# nouvelle version dans un répertoire temporaire, la renomme, puis remplace CURRENT par
+# os.replace (opération atomique) : un lecteur voit l'ancienne ou la nouvelle version,
+# jamais un état intermédiaire. current_snapshot() bascule sur la nouvelle version au
+# prochain appel.
+
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from database.budget import budgeted, budget_session
+
+# Répertoire racine par défaut des instantanés
+DEFAULT_SNAPSHOT_DIR = "snapshots"
+
+# Version du format de fichiers (incrémentée si la structure change)
+FORMAT_VERSION = 2
+
+# Nombre de versions conservées sur disque (les plus anciennes sont supprimées)
+KEEP_VERSIONS = 3
+
+ARRAYS = (
+    "actor_offsets", "actor_targets", "film_offsets", "film_targets",
+    "actor_name_offsets", "actor_name_bytes", "actor_name_index",
+    "film_title_offsets", "film_title_bytes", "film_title_index",
+    "film_year", "film_rating", "film_votes", "film_revenue",
+)
+
+_FILM_PROPERTIES = {"film_year": "year", "film_rating": "rating", "film_votes": "votes", "film_revenue": "revenue"}
+
+
+# -------------------------------
+# Construction des tableaux
+# -------------------------------
+
+# Listes d'adjacence CSR (offsets, cibles triées) à partir de couples (source, cible)
+def _adjacency(sources, targets, n):
+    order = np.lexsort((targets, sources))
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32)
+
+
+# Noms indexés par identifiant (offsets, octets UTF-8 mis bout à bout) et identifiants
+# présents triés par nom
+def _names(mapping, n):
+    encoded = [b""] * n
+    for i, name in mapping.items():
+        encoded[i] = (name or "").encode("utf-8")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    ids = np.array(sorted(mapping, key=lambda i: (encoded[i], i)), dtype=np.int32)
+    return offsets, blob, ids
+
+
+# Propriété numérique des films indexée par identifiant (NaN si absente ou non numérique)
+def _property(films, key, n):
+    values = np.full(n, np.nan)
+    for film in films:
+        try:
+            values[film["id"]] = float(film.get(key))
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+# Lit le graphe dans Neo4j et renvoie les tableaux de l'instantané
+@budgeted("neo4j", stale=False)
+def read_graph_arrays(driver):
+    with budget_session(driver) as session:
+        actors = {r["id"]: r["name"] for r in session.run("MATCH (a:Actor) RETURN a.id AS id, a.name AS name")}
+        films = session.run(
+            "MATCH (f:Film) RETURN f.id AS id, f.title AS title, f.year AS year, "
+            "f.rating AS rating, f.votes AS votes, f.revenue AS revenue"
+        ).data()
+        pairs = [
+            (r["actor"], r["film"])
+            for r in session.run("MATCH (a:Actor)-[:A_JOUE]->(f:Film) RETURN a.id AS actor, f.id AS film")
+        ]
+    return graph_arrays(actors, films, pairs)
+
+
+# Construit les tableaux à partir des acteurs {id: nom}, des films (dicts avec id, title et
+# propriétés) et des couples (acteur, film)
+def graph_arrays(actors, films, pairs):
+    n_actors = max(actors, default=-1) + 1
+    n_films = max((film["id"] for film in films), default=-1) + 1
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    arrays = {}
+    arrays["actor_offsets"], arrays["actor_targets"] = _adjacency(pairs[:, 0], pairs[:, 1], n_actors)
+    arrays["film_offsets"], arrays["film_targets"] = _adjacency(pairs[:, 1], pairs[:, 0], n_films)
+    arrays["actor_name_offsets"], arrays["actor_name_bytes"], arrays["actor_name_index"] = _names(actors, n_actors)
+    arrays["film_title_offsets"], arrays["film_title_bytes"], arrays["film_title_index"] = _names(
+        {f["id"]: f["title"] for f in films}, n_films
+    )
+    for name, key in _FILM_PROPERTIES.items():
+        arrays[name] = _property(films, key, n_films)
+    return arrays
+
+
+# -------------------------------
+# Écriture et bascule atomique
+# -------------------------------
+
+# Remplace atomiquement le contenu d'un petit fichier texte
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# Écrit une nouvelle version de l'instantané puis la rend active ; renvoie son nom
+def write_snapshot(arrays, root=DEFAULT_SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    os.makedirs(root, exist_ok=True)
+    version = f"v{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}"
+    tmp = os.path.join(root, f".tmp-{version}")
+    os.makedirs(tmp)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp, f"{name}.npy"), arrays[name], allow_pickle=False)
+    manifest = {
+        "format": FORMAT_VERSION, "version": version, "created": time.time(),
+        "actors": int(arrays["actor_name_index"].size),
+        "films": int(arrays["film_title_index"].size),
+        "edges": int(arrays["actor_targets"].size),
+    }
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, version))
+    _write_atomic(os.path.join(root, "CURRENT"), version)
+    prune_snapshots(root, keep)
+    return version
+
+
+# Exporte le graphe actuel de Neo4j en nouvel instantané actif
+@budgeted("neo4j", stale=False)
+def export_snapshot(driver, root=DEFAULT_SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    return write_snapshot(read_graph_arrays(driver), root, keep)
+
+
+# Supprime les versions les plus anciennes (jamais la version active). Une version encore
+# ouverte par un autre processus peut refuser la suppression (Windows) : elle sera retentée.
+def prune_snapshots(root=DEFAULT_SNAPSHOT_DIR, keep=KEEP_VERSIONS):
+    active = current_version(root)
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v") and d != active)
+    for version in versions[:max(len(versions) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+
+# -------------------------------
+# Lecture
+# -------------------------------
+
+# Nom de la version active (None s'il n'y a pas encore d'instantané)
+def current_version(root=DEFAULT_SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# Instantané ouvert en lecture seule (tableaux mappés en mémoire)
+class GraphSnapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"Format d'instantané non pris en charge : {self.manifest['format']}")
+        self.version = self.manifest["version"]
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    # Instantané en mémoire, sans fichiers, sur les tableaux renvoyés par graph_arrays
+    @classmethod
+    def from_arrays(cls, arrays):
+        snapshot = cls.__new__(cls)
+        snapshot.path, snapshot.manifest, snapshot.version = None, None, None
+        for name in ARRAYS:
+            setattr(snapshot, name, arrays[name])
+        return snapshot
+
+    @property
+    def n_actors(self):
+        return self.actor_name_offsets.shape[0] - 1
+
+    @property
+    def n_films(self):
+        return self.film_title_offsets.shape[0] - 1
+
+    # Nom encodé d'un identifiant (octets UTF-8)
+    @staticmethod
+    def _encoded(offsets, blob, i):
+        return blob[offsets[i]:offsets[i + 1]].tobytes()
+
+    # Identifiants portant un nom, par recherche dichotomique dans l'index trié ; seules les
+    # O(log n) pages visitées sont lues
+    def _lookup(self, offsets, blob, index, name):
+        key = name.encode("utf-8")
+        lo, hi = 0, index.shape[0]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._encoded(offsets, blob, index[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < index.shape[0] and self._encoded(offsets, blob, index[end]) == key:
+            end += 1
+        return [int(i) for i in index[lo:end]]
+
+    # Nom d'un acteur et titre d'un film d'après leur identifiant
+    def actor_name(self, actor_id):
+        return self._encoded(self.actor_name_offsets, self.actor_name_bytes, actor_id).decode("utf-8")
+
+    def film_title(self, film_id):
+        return self._encoded(self.film_title_offsets, self.film_title_bytes, film_id).decode("utf-8")
+
+    # Identifiant d'un acteur, avec une erreur explicite s'il est inconnu
+    def actor_id(self, name):
+        actors = self._lookup(self.actor_name_offsets, self.actor_name_bytes, self.actor_name_index, name)
+        if not actors:
+            raise ValueError(f"Acteur inconnu : {name}")
+        return actors[0]
+
+    # Identifiants des films portant un titre (plusieurs films peuvent le partager)
+    def film_ids(self, title):
+        films = self._lookup(self.film_title_offsets, self.film_title_bytes, self.film_title_index, title)
+        if not films:
+            raise ValueError(f"Film inconnu : {title}")
+        return films
+
+    # Identifiant d'un film d'après son titre (le premier si plusieurs films le partagent)
+    def film_id(self, title):
+        return self.film_ids(title)[0]
+
+    # Identifiants des films d'un acteur
+    def films_of(self, actor_id):
+        return self.actor_targets[self.actor_offsets[actor_id]:self.actor_offsets[actor_id + 1]]
+
+    # Identifiants des acteurs d'un film
+    def cast_of(self, film_id):
+        return self.film_targets[self.film_offsets[film_id]:self.film_offsets[film_id + 1]]
+
+    # Couples (acteur, film) de toutes les relations A_JOUE
+    def pairs(self):
+        actors = np.repeat(np.arange(self.n_actors, dtype=np.int64), np.diff(self.actor_offsets))
+        return np.column_stack([actors, np.asarray(self.actor_targets, dtype=np.int64)])
+
+
+# Instantanés déjà ouverts dans ce processus, par répertoire racine
+_OPENED = {}
+
+
+# Instantané actif du répertoire, rouvert si CURRENT désigne une nouvelle version (None s'il
+# n'y en a pas). La vérification ne coûte qu'une lecture du petit fichier CURRENT.
+def current_snapshot(root=DEFAULT_SNAPSHOT_DIR):
+    version = current_version(root)
+    if version is None:
+        return None
+    opened = _OPENED.get(root)
+    if opened is None or opened.version != version:
+        opened = GraphSnapshot(os.path.join(root, version))
+        _OPENED[root] = opened
+    return opened
@@ -0,0 +1,261 @@
+# ================================
+# database/temporal.py
+# Couche temporelle : tranches annuelles du graphe et évolution cumulée (collaborations, genres, concurrence)
+# ================================
+#
+# Le graphe est découpé selon l'année des films. Chaque tranche est un document de la
+# collection MongoDB "temporal_slices" ({_id: année, films, updated, tableaux int32 en octets}) :
+#   - actor_pairs : couples d'acteurs (id1 < id2) ayant joué ensemble cette année-là
+#   - genre_counts : (genre, nombre de films) de l'année
+#   - competition : (réalisateur1, réalisateur2, genre) ayant sorti un film du même genre la même année ;
+#     lue une année à la fois, genre par genre (MAX_COMPETITORS réalisateurs au plus par genre ;
+#     competition_truncated indique qu'un genre de l'année dépassait cette limite)
+# Une tranche se calcule à partir des seuls films de son année (index Neo4j sur Film.year) :
+# importer ou modifier des films ne recalcule que les années touchées (refresh_years).
+#
+# TemporalGraph charge toutes les tranches et en déduit les agrégats cumulés année par année :
+# pour chaque couple d'acteurs, l'année de première collaboration, d'où le nombre de
+# collaborateurs distincts de chaque acteur à n'importe quelle date, sans requête sur le graphe.
+
+import time
+from itertools import combinations
+
+import numpy as np
+from pymongo import UpdateOne
+
+from database.budget import budgeted, budget_session, check_cancelled
+
+# Nombre d'années calculées par série de requêtes lors d'une reconstruction complète
+YEARS_PER_BATCH = 5
+
+# Nombre maximal de réalisateurs d'un même genre et d'une même année mis en concurrence
+# (ceux ayant sorti le plus de films du genre cette année-là) : au plus n(n-1)/2 couples
+MAX_COMPETITORS = 50
+
+# Tableaux d'une tranche et leur nombre de colonnes
+SLICE_ARRAYS = {"actor_pairs": 2, "genre_counts": 2, "competition": 3}
+
+# Requêtes de calcul des tranches d'une liste d'années
+_SLICE_QUERIES = {
+    "films": """
+        MATCH (f:Film) WHERE f.year IN $years
+        RETURN f.year AS year, count(f) AS films
+    """,
+    "actor_pairs": """
+        MATCH (f:Film) WHERE f.year IN $years
+        MATCH (a1:Actor)-[:A_JOUE]->(f)<-[:A_JOUE]-(a2:Actor)
+        WHERE a1.id < a2.id
+        RETURN DISTINCT f.year AS year, a1.id AS a, a2.id AS b
+    """,
+    "genre_counts": """
+        MATCH (f:Film)-[:APPARTIENT_A]->(g:Genre) WHERE f.year IN $years
+        RETURN f.year AS year, g.id AS a, count(f) AS b
+    """,
+    # Une seule année : réalisateurs de chaque genre (les couples sont formés côté client)
+    "competition": """
+        MATCH (d:Director)-[:REALISE]->(f:Film {year: $year})-[:APPARTIENT_A]->(g:Genre)
+        WITH g, d, count(f) AS films
+        ORDER BY films DESC, d.id
+        RETURN g.id AS genre, collect(d.id)[..$limit] AS directors, count(d) AS total
+    """,
+}
+
+
+# Tableau int32 à n colonnes <-> octets stockés dans MongoDB
+def _to_bytes(rows):
+    return np.ascontiguousarray(rows, dtype=np.int32).tobytes()
+
+
+def _from_bytes(data, columns):
+    return np.frombuffer(data, dtype=np.int32).reshape(-1, columns)
+
+
+# -------------------------------
+# Stockage des tranches
+# -------------------------------
+
+# Tranches annuelles stockées dans la collection "temporal_slices"
+class TemporalStore:
+    def __init__(self, db):
+        self.collection = db["temporal_slices"]
+
+    # Écrit des tranches {année: {films, competition_truncated, actor_pairs, genre_counts, competition}} ;
+    # une année sans film est supprimée
+    def write(self, slices):
+        requests, now = [], time.time()
+        for year, data in slices.items():
+            if not data["films"]:
+                self.collection.delete_one({"_id": year})
+                continue
+            document = {"films": data["films"], "competition_truncated": data["competition_truncated"], "updated": now}
+            document.update({name: _to_bytes(data[name]) for name in SLICE_ARRAYS})
+            requests.append(UpdateOne({"_id": year}, {"$set": document}, upsert=True))
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        return len(requests)
+
+    # Toutes les tranches : {année: {films, competition_truncated, actor_pairs, genre_counts, competition}}
+    # (une tranche écrite sans l'indicateur de troncature est considérée comme tronquée)
+    def load(self):
+        return {
+            doc["_id"]: {
+                "films": doc["films"], "competition_truncated": doc.get("competition_truncated", True),
+                **{name: _from_bytes(doc[name], cols) for name, cols in SLICE_ARRAYS.items()},
+            }
+            for doc in self.collection.find().sort("_id", 1)
+        }
+
+    # Version des tranches (nombre et date de la dernière écriture) : change à chaque mise à jour
+    def version(self):
+        last = self.collection.find_one({}, {"updated": 1}, sort=[("updated", -1)])
+        return self.collection.estimated_document_count(), last["updated"] if last else None
+
+    # Supprime toutes les tranches (avant reconstruction complète)
+    def clear(self):
+        self.collection.delete_many({})
+
+
+# -------------------------------
+# Calcul des tranches
+# -------------------------------
+
+# Calcule les tranches d'une liste d'années depuis Neo4j (seuls les films de ces années sont lus)
+@budgeted("neo4j", stale=False)
+def compute_slices(driver, years):
+    years = sorted({year for year in years if isinstance(year, int)})
+    slices = {year: {"films": 0, "competition_truncated": False, **{name: [] for name in SLICE_ARRAYS}} for year in years}
+    if not years:
+        return {}
+    with budget_session(driver) as session:
+        for record in session.run(_SLICE_QUERIES["films"], years=years):
+            slices[record["year"]]["films"] = record["films"]
+        for name in ("actor_pairs", "genre_counts"):
+            for record in session.run(_SLICE_QUERIES[name], years=years):
+                slices[record["year"]][name].append([record[key] for key in "abc"[:SLICE_ARRAYS[name]]])
+        for year in years:
+            check_cancelled()
+            rows = slices[year]["competition"]
+            for record in session.run(_SLICE_QUERIES["competition"], year=year, limit=MAX_COMPETITORS):
+                rows.extend([a, b, record["genre"]] for a, b in combinations(sorted(record["directors"]), 2))
+                if record["total"] > MAX_COMPETITORS:
+                    slices[year]["competition_truncated"] = True
+    for data in slices.values():
+        for name, columns in SLICE_ARRAYS.items():
+            data[name] = np.asarray(data[name], dtype=np.int32).reshape(-1, columns)
+    return slices
+
+
+# Recalcule et enregistre les tranches des années touchées ; renvoie le nombre de tranches écrites
+@budgeted("neo4j", stale=False)
+def refresh_years(driver, store, years):
+    return store.write(compute_slices(driver, years))
+
+
+# Années des films (identifiants entiers) actuellement dans le graphe, à lire avant de les
+# modifier ou supprimer (leur ancienne année doit aussi être recalculée)
+@budgeted("neo4j", stale=False)
+def film_years(driver, film_ids):
+    with budget_session(driver) as session:
+        result = session.run("UNWIND $ids AS id MATCH (f:Film {id: id}) RETURN DISTINCT f.year AS year", ids=list(film_ids))
+        return {record["year"] for record in result}
+
+
+# Reconstruit toutes les tranches, YEARS_PER_BATCH années à la fois
+@budgeted("neo4j", stale=False)
+def rebuild_temporal(driver, store):
+    with budget_session(driver) as session:
+        years = sorted(r["year"] for r in session.run("MATCH (f:Film) RETURN DISTINCT f.year AS year")
+                       if isinstance(r["year"], int))
+    store.clear()
+    for i in range(0, len(years), YEARS_PER_BATCH):
+        check_cancelled()
+        refresh_years(driver, store, years[i:i + YEARS_PER_BATCH])
+    return f"{len(years)} tranche(s) annuelle(s) reconstruite(s)."
+
+
+# -------------------------------
+# Analyses cumulées
+# -------------------------------
+
+# Évolution du graphe année par année, calculée à partir des tranches
+class TemporalGraph:
+    def __init__(self, slices, names):
+        # slices : {année: tranche} (TemporalStore.load) ; names : {"actor" | "director" | "genre": {id: nom}}
+        self.years = sorted(slices)
+        self.slices = slices
+        self.names = names
+        self.actor_ids = {name: i for i, name in names["actor"].items()}
+
+        # Année de première collaboration de chaque couple d'acteurs : les couples sont triés
+        # par année, np.unique garde la première occurrence
+        years = [np.full(len(slices[y]["actor_pairs"]), y, dtype=np.int32) for y in self.years]
+        pairs = [slices[y]["actor_pairs"] for y in self.years]
+        pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int32)
+        years = np.concatenate(years) if years else np.zeros(0, dtype=np.int32)
+        self.pairs, first = np.unique(pairs, axis=0, return_index=True)
+        self.first_year = years[first]
+
+    # Nom d'une entité (identifiant entre parenthèses si inconnu du dictionnaire)
+    def name(self, kind, entity_id):
+        return self.names[kind].get(int(entity_id), f"({kind} {int(entity_id)})")
+
+    # Années couvertes jusqu'à `year` inclus
+    def _until(self, year):
+        return [y for y in self.years if y <= year]
+
+    # Acteurs ayant le plus de collaborateurs distincts cumulés jusqu'à `year`
+    def collaborator_counts(self, year, limit=10):
+        pairs = self.pairs[self.first_year <= year]
+        counts = np.bincount(pairs.ravel(), minlength=1) if pairs.size else np.zeros(0, dtype=np.int64)
+        top = np.argsort(-counts, kind="stable")[:limit]
+        return [{"actor": self.name("actor", a), "collaborators": int(counts[a])} for a in top if counts[a] > 0]
+
+    # Croissance du réseau d'un acteur : nouveaux collaborateurs et total cumulé par année
+    def collaborator_growth(self, actor_name):
+        if actor_name not in self.actor_ids:
+            raise ValueError(f"Acteur inconnu : {actor_name}")
+        actor = self.actor_ids[actor_name]
+        mine = (self.pairs == actor).any(axis=1)
+        new = np.bincount(np.searchsorted(self.years, self.first_year[mine]), minlength=len(self.years))
+        total = np.cumsum(new)
+        return [{"year": y, "new": int(n), "total": int(t)} for y, n, t in zip(self.years, new, total)]
+
+    # Répartition des films par genre pour l'année `year` (ou cumulée jusqu'à elle)
+    def genre_mix(self, year, cumulative=True):
+        years = self._until(year) if cumulative else [y for y in self.years if y == year]
+        mix = {}
+        for y in years:
+            for genre, films in self.slices[y]["genre_counts"]:
+                name = self.name("genre", genre)
+                mix[name] = mix.get(name, 0) + int(films)
+        return dict(sorted(mix.items(), key=lambda item: -item[1]))
+
+    # Réalisateurs en concurrence l'année `year` (films du même genre), avec les genres concernés
+    def competition(self, year):
+        if year not in self.slices:
+            return []
+        rivals = {}
+        for d1, d2, genre in self.slices[year]["competition"]:
+            rivals.setdefault((int(d1), int(d2)), []).append(self.name("genre", genre))
+        return [
+            {"director1": self.name("director", d1), "director2": self.name("director", d2), "genres": sorted(genres)}
+            for (d1, d2), genres in sorted(rivals.items(), key=lambda item: -len(item[1]))
+        ]
+
+    # Couples de réalisateurs en concurrence, toutes années confondues (identifiants)
+    def competition_pairs(self):
+        edges = [self.slices[y]["competition"][:, :2] for y in self.years]
+        edges = np.concatenate(edges) if edges else np.zeros((0, 2), dtype=np.int32)
+        return np.unique(edges, axis=0)
+
+
+# Charge toutes les tranches et les noms correspondants (dictionnaire partagé)
+def load_temporal_graph(store, dictionary):
+    slices = store.load()
+    ids = {"actor": set(), "director": set(), "genre": set()}
+    for data in slices.values():
+        ids["actor"].update(data["actor_pairs"].ravel().tolist())
+        ids["genre"].update(data["genre_counts"][:, 0].tolist())
+        ids["director"].update(data["competition"][:, :2].ravel().tolist())
+        ids["genre"].update(data["competition"][:, 2].tolist())
+    return TemporalGraph(slices, {kind: dictionary.decode(kind, sorted(values)) for kind, values in ids.items()})
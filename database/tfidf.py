@@ -0,0 +1,307 @@
+# ================================
+# database/tfidf.py
+# Recommandation par le contenu ("more like this") : TF-IDF sur le titre et la description
+# ================================
+#
+# Chaque film devient un vecteur creux TF-IDF (tf sous-linéaire 1 + log(n), idf lissé,
+# lignes normalisées L2) construit à partir de son titre et de son champ Description.
+# La matrice est stockée au format CSR (indptr, indices, data) avec sa transposée
+# (listes inversées terme -> films) : la similarité cosinus d'un vecteur requête avec tous
+# les films est un produit creux calculé en une passe NumPy (np.bincount sur les listes
+# des seuls termes de la requête). Le vocabulaire, la matrice et les éventuels voisins
+# précalculés sont enregistrés dans un fichier .npz.
+
+import os
+import re
+
+import numpy as np
+
+from database.budget import budgeted
+
+# Fichier par défaut du modèle enregistré
+DEFAULT_MODEL_PATH = os.path.join("models", "tfidf.npz")
+
+# Poids des mots du titre (répétés) par rapport à ceux de la description
+TITLE_WEIGHT = 2
+
+# Nombre maximal de films traités par bloc lors du précalcul des plus proches voisins, et
+# nombre maximal de produits terme à terme accumulés par bloc (borne la mémoire quel que
+# soit le nombre de films)
+NEIGHBOUR_BLOCK_SIZE = 256
+NEIGHBOUR_BLOCK_PRODUCTS = 2_000_000
+
+_WORD_RE = re.compile(r"[a-z0-9à-ÿ]+")
+
+# Mots vides anglais (les descriptions du jeu de données sont en anglais)
+STOP_WORDS = frozenset("""
+a an and are as at be been but by for from has have he her his in into is it its of on or
+she that the their them they this to was were which while who whom with after before
+about over under up out his him who's it's than then there these those not no so such
+""".split())
+
+
+# Découpe un texte en mots (minuscules, sans mots vides ni mots d'une lettre)
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 and w not in STOP_WORDS]
+
+
+# Mots d'un document film : titre (pondéré) puis description
+def film_tokens(film):
+    return tokenize(film.get("title")) * TITLE_WEIGHT + tokenize(film.get("Description"))
+
+
+# Regroupe des triplets (ligne, colonne, valeur) triés par ligne en matrice CSR
+def _to_csr(rows, cols, values, n_rows):
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32), values[order]
+
+
+# Indices à plat des tranches [starts[i], ends[i]) d'un tableau, sans boucle Python
+def _gather_ranges(starts, ends):
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64), lengths
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return np.arange(total, dtype=np.int64) + offsets, lengths
+
+
+# Modèle TF-IDF : vocabulaire, idf, matrice CSR des films et sa transposée
+class TfidfModel:
+    def __init__(self, keys, titles, vocabulary, idf, indptr, indices, data, neighbours=None):
+        self.keys = list(keys)                 # clé de chaque ligne (_id MongoDB en texte)
+        self.titles = list(titles)
+        self.vocabulary = list(vocabulary)     # terme de chaque colonne
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+        self.title_rows = {}
+        for i, title in enumerate(self.titles):
+            self.title_rows.setdefault(title, []).append(i)
+        self.neighbours = neighbours           # (indices, scores) des plus proches voisins, ou None
+
+        # Transposée (CSC) : pour chaque terme, les films qui le contiennent et leur poids
+        n_rows = len(self.keys)
+        row_of = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(self.indptr))
+        self.t_indptr, self.t_rows, self.t_data = _to_csr(
+            self.indices.astype(np.int64), row_of, self.data, len(self.vocabulary)
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Lignes correspondant à une clé ou à un titre
+    def rows_for(self, film):
+        if film in self.rows:
+            return [self.rows[film]]
+        if film in self.title_rows:
+            return self.title_rows[film]
+        raise ValueError(f"Film inconnu : {film}")
+
+    # Vecteur creux (colonnes, valeurs) somme des lignes demandées
+    def _row_vector(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        positions, _ = _gather_ranges(self.indptr[rows], self.indptr[rows + 1])
+        return self.indices[positions].astype(np.int64), self.data[positions]
+
+    # Vecteur creux normalisé d'un texte libre (termes hors vocabulaire ignorés)
+    def text_vector(self, text):
+        terms, counts = np.unique([self.term_ids[w] for w in tokenize(text) if w in self.term_ids],
+                                  return_counts=True)
+        if terms.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        values = (1 + np.log(counts)) * self.idf[terms]
+        return terms.astype(np.int64), values / np.linalg.norm(values)
+
+    # Produit scalaire d'un vecteur creux avec tous les films (listes inversées de ses termes)
+    def scores(self, cols, values):
+        positions, lengths = _gather_ranges(self.t_indptr[cols], self.t_indptr[cols + 1])
+        weights = np.repeat(values, lengths) * self.t_data[positions]
+        return np.bincount(self.t_rows[positions], weights=weights, minlength=len(self.keys))
+
+    # Similarité de chaque film avec un ensemble de films (somme de leurs vecteurs)
+    def scores_for(self, films):
+        rows = sorted({row for film in films for row in self.rows_for(film)})
+        if not rows:
+            return np.zeros(len(self.keys))
+        return self.scores(*self._row_vector(rows))
+
+    # Similarité de chaque candidat (clé ou titre) avec les films appréciés ; 0 pour un film
+    # absent du modèle (ajouté depuis la dernière construction)
+    def similarity_to(self, candidates, liked):
+        known = lambda film: film in self.rows or film in self.title_rows
+        scores = self.scores_for([film for film in liked if known(film)])
+        return [
+            float(max(scores[row] for row in self.rows_for(film))) if known(film) else 0.0
+            for film in candidates
+        ]
+
+    # Meilleurs résultats d'un vecteur de scores, hors lignes exclues
+    def _top(self, scores, limit, exclude=()):
+        scores = scores.astype(np.float64)  # Copie en flottants (scores entiers pour une requête vide)
+        scores[list(exclude)] = -np.inf
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            {"key": self.keys[i], "title": self.titles[i], "score": float(scores[i])}
+            for i in best if scores[i] > 0
+        ]
+
+    # Films les plus proches d'un film (clé ou titre) au sens du cosinus
+    def more_like_this(self, film, limit=10):
+        rows = self.rows_for(film)
+        if self.neighbours is not None and len(rows) == 1 and limit <= self.neighbours[0].shape[1]:
+            indices, scores = self.neighbours
+            return [
+                {"key": self.keys[j], "title": self.titles[j], "score": float(s)}
+                for j, s in zip(indices[rows[0]][:limit], scores[rows[0]][:limit]) if s > 0
+            ]
+        return self._top(self.scores(*self._row_vector(rows)), limit, exclude=rows)
+
+    # Films les plus proches d'un texte libre
+    def search(self, text, limit=10):
+        return self._top(self.scores(*self.text_vector(text)), limit)
+
+    # Précalcule les `limit` plus proches voisins de tous les films, par blocs de lignes.
+    # Seuls les produits non nuls d'un bloc sont calculés (listes inversées de ses termes) puis
+    # sommés par couple (film, voisin) ; chaque ligne garde ses `limit` meilleurs voisins. La
+    # taille des blocs est choisie pour ne pas dépasser max_products produits à la fois.
+    def compute_neighbours(self, limit=10, block_size=NEIGHBOUR_BLOCK_SIZE, max_products=NEIGHBOUR_BLOCK_PRODUCTS):
+        n = len(self.keys)
+        limit = min(limit, max(n - 1, 0))
+        indices = np.zeros((n, limit), dtype=np.int32)
+        scores = np.zeros((n, limit), dtype=np.float32)
+        # Nombre de produits de chaque ligne : somme des fréquences documentaires de ses termes
+        df = np.diff(self.t_indptr)
+        row_of = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        cost = np.cumsum(np.bincount(row_of, weights=df[self.indices], minlength=n))
+        start = 0
+        while limit and start < n:
+            done = cost[start - 1] if start else 0.0
+            end = int(np.searchsorted(cost, done + max_products, side="right"))
+            end = min(max(end, start + 1), start + block_size, n)
+            block = np.arange(start, end, dtype=np.int64)
+            start = end
+            positions, lengths = _gather_ranges(self.indptr[block], self.indptr[block + 1])
+            local = np.repeat(np.arange(block.size), lengths)
+            cols = self.indices[positions].astype(np.int64)
+            t_positions, t_lengths = _gather_ranges(self.t_indptr[cols], self.t_indptr[cols + 1])
+            cells = np.repeat(local, t_lengths) * n + self.t_rows[t_positions]
+            weights = np.repeat(self.data[positions], t_lengths) * self.t_data[t_positions]
+            cells, inverse = np.unique(cells, return_inverse=True)
+            sums = np.bincount(inverse.ravel(), weights=weights, minlength=cells.size)
+            rows, others = cells // n, cells % n
+            kept = others != block[rows]  # Un film n'est pas son propre voisin
+            rows, others, sums = rows[kept], others[kept], sums[kept]
+            order = np.lexsort((others, -sums, rows))
+            rows, others, sums = rows[order], others[order], sums[order]
+            rank = np.arange(rows.size) - np.searchsorted(rows, rows)
+            top = rank < limit
+            indices[block[rows[top]], rank[top]] = others[top]
+            scores[block[rows[top]], rank[top]] = sums[top]
+        self.neighbours = (indices, scores)
+        return self.neighbours
+
+
+# Construit le modèle TF-IDF à partir des documents de la collection films (lecture en flux)
+@budgeted("mongo", stale=False)
+def build_tfidf(collection, min_df=1):
+    keys, titles, rows, terms, counts = [], [], [], [], []
+    vocabulary = {}
+    for i, film in enumerate(collection.find({}, {"title": 1, "Description": 1})):
+        keys.append(str(film["_id"]))
+        titles.append(film.get("title"))
+        ids, n = np.unique([vocabulary.setdefault(w, len(vocabulary)) for w in film_tokens(film)],
+                           return_counts=True)
+        rows.append(np.full(ids.size, i, dtype=np.int64))
+        terms.append(ids.astype(np.int64))
+        counts.append(n)
+    n_docs = len(keys)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    terms = np.concatenate(terms) if terms else np.zeros(0, dtype=np.int64)
+    counts = np.concatenate(counts) if counts else np.zeros(0)
+
+    # Filtre les termes trop rares puis renumérote les colonnes restantes
+    df = np.bincount(terms, minlength=len(vocabulary))
+    kept = df >= min_df
+    new_ids = np.cumsum(kept) - 1
+    mask = kept[terms]
+    rows, terms, counts = rows[mask], new_ids[terms[mask]], counts[mask]
+    words = np.array(list(vocabulary), dtype=object)[kept] if vocabulary else np.zeros(0, dtype=object)
+    idf = np.log((1 + n_docs) / (1 + df[kept])) + 1
+
+    # Poids tf-idf puis normalisation L2 de chaque ligne
+    values = (1 + np.log(counts)) * idf[terms]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n_docs))
+    values = values / np.where(norms > 0, norms, 1)[rows]
+    indptr, indices, data = _to_csr(rows, terms, values, n_docs)
+    return TfidfModel(keys, titles, words, idf, indptr, indices, data)
+
+
+# Enregistre le modèle (vocabulaire, idf, matrice et voisins éventuels) dans un fichier .npz
+# Les titres absents (None) sont enregistrés vides et repérés par le masque "titles_missing".
+def save_tfidf(model, path=DEFAULT_MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {
+        "keys": np.array(model.keys, dtype=str),
+        "titles": np.array(["" if title is None else title for title in model.titles], dtype=str),
+        "titles_missing": np.array([title is None for title in model.titles], dtype=bool),
+        "vocabulary": np.array(model.vocabulary, dtype=str), "idf": model.idf,
+        "indptr": model.indptr, "indices": model.indices, "data": model.data,
+    }
+    if model.neighbours is not None:
+        arrays["neighbour_indices"], arrays["neighbour_scores"] = model.neighbours
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+# Recharge un modèle enregistré par save_tfidf
+def load_tfidf(path=DEFAULT_MODEL_PATH):
+    with np.load(path) as f:
+        neighbours = None
+        if "neighbour_indices" in f:
+            neighbours = (f["neighbour_indices"], f["neighbour_scores"])
+        titles = f["titles"].tolist()
+        if "titles_missing" in f:
+            titles = [None if missing else title for title, missing in zip(titles, f["titles_missing"])]
+        return TfidfModel(
+            f["keys"].tolist(), titles, f["vocabulary"].tolist(), f["idf"],
+            f["indptr"], f["indices"], f["data"], neighbours,
+        )
+
+
+# Supprime le modèle enregistré après une modification du catalogue : le prochain
+# load_or_build_tfidf le reconstruit (et le service, qui surveille le fichier, le recharge)
+def invalidate_tfidf(path=DEFAULT_MODEL_PATH):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+# Version du modèle enregistré (date de modification du fichier), None s'il n'existe pas
+def tfidf_version(path=DEFAULT_MODEL_PATH):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return None
+
+
+# Charge le modèle enregistré, ou le construit (et l'enregistre) s'il n'existe pas encore
+def load_or_build_tfidf(collection, path=DEFAULT_MODEL_PATH, neighbours=10):
+    if os.path.exists(path):
+        return load_tfidf(path)
+    model = build_tfidf(collection)
+    if neighbours:
+        model.compute_neighbours(neighbours)
+    save_tfidf(model, path)
+    return model
@@ -0,0 +1,66 @@
+# scripts/generate_neo4j_import.py
+#
+# Premier chargement hors ligne : écrit les fichiers CSV de `neo4j-admin database import`
+# depuis la collection films (partitions traitées en parallèle), puis affiche la commande
+# d'import. Une fois la base importée et redémarrée, relancer avec --finalize pour créer les
+# index, recalculer les compteurs de classement, les sketches, l'instantané du graphe et les
+# tranches annuelles.
+#
+# Exemple :
+#   python scripts/generate_neo4j_import.py --out imports --partitions 8
+#   (base Neo4j arrêtée) neo4j-admin database import full ... neo4j
+#   python scripts/generate_neo4j_import.py --finalize
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+
+from pymongo import MongoClient
+from neo4j import GraphDatabase
+
+from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database.admin_import import RUN_SIZE, generate_import_files
+from database.leaderboards import create_leaderboard_indexes, rebuild_leaderboards
+from database.sketches import SketchStore, rebuild_sketches
+from database.snapshot import export_snapshot
+from database.temporal import TemporalStore, rebuild_temporal
+
+
+# Index, compteurs, sketches et instantané après un import neo4j-admin
+def finalize():
+    mongo_client = MongoClient(MONGO_URI)
+    neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        create_leaderboard_indexes(neo4j_driver)
+        rebuild_leaderboards(neo4j_driver)
+        sketches = SketchStore(mongo_client["entertainment"])
+        sketches.ensure_indexes()
+        rebuild_sketches(neo4j_driver, sketches)
+        print(f"✅ Instantané du graphe exporté : {export_snapshot(neo4j_driver)}")
+        print(f"✅ {rebuild_temporal(neo4j_driver, TemporalStore(mongo_client['entertainment']))}")
+    finally:
+        neo4j_driver.close()
+        mongo_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fichiers CSV pour neo4j-admin database import")
+    parser.add_argument("--out", default="imports", help="Répertoire de sortie")
+    parser.add_argument("--partitions", type=int, default=4, help="Nombre de partitions de _id")
+    parser.add_argument("--workers", type=int, default=None, help="Processus parallèles (une partition chacun par défaut)")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE, help="Lignes en mémoire par séquence triée")
+    parser.add_argument("--force", action="store_true",
+                        help="Remplacer les fichiers d'une génération précédente dans un répertoire non vide")
+    parser.add_argument("--finalize", action="store_true", help="Recalculs à lancer après l'import")
+    args = parser.parse_args()
+
+    if args.finalize:
+        finalize()
+    else:
+        report = generate_import_files(MONGO_URI, args.out, partitions=args.partitions,
+                                       workers=args.workers, run_size=args.run_size, force=args.force)
+        print(f"✅ {report['films']} films écrits en {report['partitions']} partitions dans {args.out}/")
+        print("Base Neo4j arrêtée et vide, lancer :")
+        print(report["command"])
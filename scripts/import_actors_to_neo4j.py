@@ -6,29 +6,34 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from pymongo import MongoClient
 from neo4j import GraphDatabase
 from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database.dictionary import Dictionary, film_key
 
 # Connexion à MongoDB et Neo4j
 client = MongoClient(MONGO_URI)
 db = client["entertainment"]
 collection = db["films"]
+dictionary = Dictionary(db)
 
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
-# Importation des acteurs et création des relations
+# Importation des acteurs et création des relations (nœuds identifiés par leur identifiant entier)
 def import_actors():
     with driver.session() as session:
         for film in collection.find():
             title = film.get("title")
             actors = film.get("actors", [])
             if title and isinstance(actors, list):
-                session.run("MERGE (f:Film {title: $title})", title=title)
-                for actor in actors:
-                    if isinstance(actor, str) and actor.strip():
-                        session.run("MERGE (a:Actor {name: $name})", name=actor.strip())
-                        session.run("""
-                            MATCH (a:Actor {name: $name}), (f:Film {title: $title})
-                            MERGE (a)-[:A_JOUE]->(f)
-                        """, name=actor.strip(), title=title)
+                film_id = dictionary.encode_one("film", film_key(film))
+                names = [actor.strip() for actor in actors if isinstance(actor, str) and actor.strip()]
+                actor_ids = dictionary.encode("actor", names)
+                session.run("MERGE (f:Film {id: $id}) SET f.title = $title", id=film_id, title=title)
+                session.run("""
+                    MATCH (f:Film {id: $film_id})
+                    UNWIND $actors AS actor
+                    MERGE (a:Actor {id: actor.id})
+                    SET a.name = actor.name
+                    MERGE (a)-[:A_JOUE]->(f)
+                """, film_id=film_id, actors=[{"id": actor_ids[name], "name": name} for name in actor_ids])
 
 if __name__ == "__main__":
     import_actors()
@@ -1,6 +1,7 @@
 import json
 from pymongo import MongoClient
 from config.config import MONGO_URI
+from database.mongo import create_top_k_indexes
 
 # Connexion à MongoDB
 client = MongoClient(MONGO_URI)
@@ -12,4 +13,7 @@ with open("data/movies.json", "r", encoding="utf-8") as f:
     movies = [json.loads(line) for line in f if line.strip()]
 
 collection.insert_many(movies)
+
+# Index facultatifs des classements par groupe (top k par année, réalisateur...)
+create_top_k_indexes(collection)
 print("Importation terminée avec succès.")
@@ -3,75 +3,84 @@
 from pymongo import MongoClient
 from neo4j import GraphDatabase
 from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database.neo4j import import_films, migrate_legacy_ids
+from database.leaderboards import create_leaderboard_indexes, rebuild_leaderboards
+from database.dictionary import Dictionary
+from database.sketches import SketchStore
+from database.snapshot import export_snapshot
+from database.temporal import TemporalStore, rebuild_temporal
 
 # Connexions
 mongo_client = MongoClient(MONGO_URI)
 db = mongo_client["entertainment"]
 collection = db["films"]
 
+# Dictionnaire partagé nom <-> identifiant entier (clés des nœuds du graphe)
+dictionary = Dictionary(db)
+
+# Sketches HyperLogLog du mode approximatif, mis à jour à chaque lot
+sketches = SketchStore(db)
+
 neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
+# Nombre de films écrits par transaction Neo4j
+BATCH_SIZE = 500
+
+# Indique si le graphe contient des nœuds sans identifiant entier (ancienne version de l'import)
+def needs_id_migration():
+    with neo4j_driver.session() as session:
+        record = session.run("""
+            MATCH (n) WHERE (n:Film OR n:Actor OR n:Director OR n:Genre) AND n.id IS NULL
+            RETURN count(n) > 0 AS missing
+        """).single()
+        return record["missing"]
+
+# Indique si le graphe contient des acteurs ou réalisateurs sans compteurs de classement
+def needs_leaderboard_backfill():
+    with neo4j_driver.session() as session:
+        record = session.run("""
+            MATCH (n) WHERE (n:Actor OR n:Director) AND n.film_count IS NULL
+            RETURN count(n) > 0 AS missing
+        """).single()
+        return record["missing"]
+
 # Importation des données de MongoDB vers Neo4j
 def import_data():
-    with neo4j_driver.session() as session:
-        for film in collection.find():
-            title = film.get("title")
-            year = film.get("year")
-            rating = film.get("rating")
-            votes = film.get("Votes")
-            revenue = film.get("Revenue (Millions)")
-            director = film.get("Director")
-            actors_str = film.get("Actors")
-
-            if not title:
-                continue
-
-            # Création du nœud Film
-            query_film = """
-            MERGE (f:Film {title: $title})
-            SET f.year = $year,
-                f.rating = $rating,
-                f.votes = $votes,
-                f.revenue = $revenue
-            """
-            session.run(query_film, {
-                "title": title,
-                "year": year,
-                "rating": rating,
-                "votes": votes,
-                "revenue": revenue
-            })
-
-            # Création du réalisateur et relation REALISE
-            if director:
-                session.run("""
-                    MERGE (d:Director {name: $director})
-                    MERGE (f:Film {title: $title})
-                    MERGE (d)-[:REALISE]->(f)
-                """, {"director": director.strip(), "title": title})
-
-            # Création des acteurs et relation A_JOUE
-            if actors_str:
-                actors = [a.strip() for a in actors_str.split(",")]
-                for actor in actors:
-                    session.run("""
-                        MERGE (a:Actor {name: $actor})
-                        MERGE (f:Film {title: $title})
-                        MERGE (a)-[:A_JOUE]->(f)
-                    """, {"actor": actor, "title": title})
-
-            # Création des genres et relations
-            genre_str = film.get("genre")
-            if genre_str:
-                genres = [g.strip() for g in genre_str.split(",")]
-                for genre in genres:
-                    session.run("""
-                        MERGE (g:Genre {name: $genre})
-                        MERGE (f:Film {title: $title})
-                        MERGE (f)-[:APPARTIENT_A]->(g)
-                    """, {"genre": genre, "title": title})
+    # Index sur les clés de MERGE, sur le dictionnaire et sur les compteurs de classement
+    dictionary.ensure_indexes()
+    sketches.ensure_indexes()
+
+    # Graphe créé par une ancienne version (nœuds fusionnés sur le titre ou le nom) :
+    # identifiants entiers posés sur les nœuds existants avant les MERGE sur `id`
+    if needs_id_migration():
+        report = migrate_legacy_ids(neo4j_driver, collection, dictionary)
+        print(f"✅ Identifiants migrés : {report}")
+    create_leaderboard_indexes(neo4j_driver)
+
+    # Graphe importé avant les compteurs de classement : recalcul complet avant d'appliquer
+    # les deltas, sinon les anciens films ne seraient jamais comptés
+    if needs_leaderboard_backfill():
+        print(f"✅ {rebuild_leaderboards(neo4j_driver)}")
+
+    # Les films sont écrits par lots (nœuds Film, réalisateurs, acteurs, genres),
+    # avec mise à jour incrémentale des compteurs de classement dans la même transaction
+    batch = []
+    for film in collection.find():
+        batch.append(film)
+        if len(batch) >= BATCH_SIZE:
+            import_films(neo4j_driver, batch, dictionary, sketches)
+            batch = []
+    if batch:
+        import_films(neo4j_driver, batch, dictionary, sketches)
 
     print("✅ Importation des acteurs et relations réussie.")
 
+    # Nouvel instantané mappé en mémoire : les processus lecteurs basculent dessus
+    version = export_snapshot(neo4j_driver)
+    print(f"✅ Instantané du graphe exporté : {version}")
+
+    # Tranches annuelles de la couche temporelle (calculées une fois, année par année)
+    print(f"✅ {rebuild_temporal(neo4j_driver, TemporalStore(db))}")
+
 if __name__ == "__main__":
     import_data()
@@ -0,0 +1,484 @@
+# scripts/load_test.py
+#
+# Test de charge : simule des analystes qui cliquent en même temps dans l'application.
+#
+# Chaque utilisateur virtuel rejoue des sessions réalistes calquées sur app.py : il choisit
+# une section (MongoDB, Neo4j, Analyse croisée) puis enchaîne quelques boutons. Comme
+# Streamlit réexécute tout le script à chaque clic, chaque clic rejoue aussi le « prélude »
+# de la section (connexions, listes affichées d'office comme get_all_films ou get_all_actors).
+#
+# La concurrence augmente par paliers ; pour chaque palier on mesure le débit, les latences
+# p50 / p99 (par étape et globales), les erreurs et la saturation des pools de connexions.
+#
+# Exemple (bases locales) :
+#   python scripts/load_test.py --mongo-uri mongodb://localhost:27017 \
+#       --neo4j-uri bolt://localhost:7687 --levels 1,10,25,50 --duration 30
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from pymongo import MongoClient, monitoring
+from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError, ServiceUnavailable, SessionExpired
+
+from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database import mongo as m
+from database import neo4j as n
+from database.budget import set_stale_serving
+
+
+# ==========================
+# Mesure de la saturation des pools MongoDB et Neo4j
+# ==========================
+
+# Écoute les événements du pool pymongo : connexions empruntées, attentes et échecs
+# (les événements arrivent depuis tous les threads : tout l'état est protégé par le verrou)
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.created = 0
+        self.checkout_failures = 0
+        self.wait_times = []
+        self._started = {}
+
+    def connection_check_out_started(self, event):
+        with self.lock:
+            self._started[threading.get_ident()] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            start = self._started.pop(threading.get_ident(), None)
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            if start is not None:
+                self.wait_times.append(time.perf_counter() - start)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self._started.pop(threading.get_ident(), None)
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.created += 1
+
+    # Les autres événements du pool ne sont pas utilisés
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+    # Mesures relevées à la fin d'un palier
+    def stats(self):
+        with self.lock:
+            return {"max_checked_out": self.max_checked_out, "created": self.created,
+                    "checkout_failures": self.checkout_failures, "wait_times": list(self.wait_times)}
+
+
+# Mesure le pool du driver Neo4j : le driver n'émet pas d'événements de pool, on enveloppe donc
+# acquire / release de son pool interne (driver._pool) pour compter les connexions empruntées,
+# les attentes d'acquisition et les échecs (délai connection_acquisition_timeout dépassé)
+class Neo4jPoolMonitor:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkout_failures = 0
+        self.wait_times = []
+
+    # Instrumente le pool d'un nouveau driver et renvoie le driver
+    def watch(self, driver):
+        pool = getattr(driver, "_pool", None)
+        if pool is None:
+            return driver
+        acquire, release, kill_and_release = pool.acquire, pool.release, pool.kill_and_release
+
+        def watched_acquire(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                connection = acquire(*args, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.checkout_failures += 1
+                raise
+            with self.lock:
+                self.checked_out += 1
+                self.max_checked_out = max(self.max_checked_out, self.checked_out)
+                self.wait_times.append(time.perf_counter() - start)
+            return connection
+
+        def released(function):
+            def watched_release(*connections):
+                with self.lock:
+                    self.checked_out -= len(connections)
+                return function(*connections)
+            return watched_release
+
+        pool.acquire = watched_acquire
+        pool.release = released(release)
+        pool.kill_and_release = released(kill_and_release)
+        return driver
+
+    # Mesures relevées à la fin d'un palier
+    def stats(self):
+        with self.lock:
+            return {"max_checked_out": self.max_checked_out, "checkout_failures": self.checkout_failures,
+                    "wait_times": list(self.wait_times)}
+
+
+# Client MongoDB instrumenté par le moniteur de pool
+def new_mongo_client(options, monitor):
+    return MongoClient(options.mongo_uri, maxPoolSize=options.mongo_pool, event_listeners=[monitor])
+
+
+# Driver Neo4j avec la taille de pool et le délai d'acquisition demandés, mesuré par le moniteur
+def new_neo4j_driver(options, neo4j_monitor):
+    return neo4j_monitor.watch(GraphDatabase.driver(
+        options.neo4j_uri,
+        auth=(options.neo4j_user, options.neo4j_password),
+        max_connection_pool_size=options.neo4j_pool,
+        connection_acquisition_timeout=options.acquisition_timeout,
+    ))
+
+
+# ==========================
+# Contexte d'un utilisateur virtuel
+# ==========================
+
+# Connexions et valeurs de sélection (acteurs, réalisateurs) utilisées par les scénarios
+class Context:
+    def __init__(self, options, monitor, neo4j_monitor, samples, shared=None):
+        self.options = options
+        self.monitor = monitor
+        self.neo4j_monitor = neo4j_monitor
+        self.samples = samples
+        self.rng = random.Random()
+        # shared = (client MongoDB, driver Neo4j) communs à tous les utilisateurs du processus
+        self.shared = shared
+        self._mongo, self._driver = shared or (None, None)
+
+    # Client MongoDB : partagé, ou recréé à chaque clic comme le fait app.py
+    def collection(self):
+        if self._mongo is None:
+            self._mongo = new_mongo_client(self.options, self.monitor)
+        return self._mongo["entertainment"]["films"]
+
+    # Driver Neo4j : partagé, ou recréé à chaque clic comme le fait app.py
+    def driver(self):
+        if self._driver is None:
+            self._driver = new_neo4j_driver(self.options, self.neo4j_monitor)
+        return self._driver
+
+    # Fin d'un clic : en mode « un client par clic », les connexions sont refermées
+    # (app.py ne les referme jamais ; on évite ici d'épuiser les sockets de la machine de test)
+    def end_click(self):
+        if self.shared:
+            return
+        self.close()
+        self._mongo, self._driver = None, None
+
+    def close(self):
+        if self.shared:
+            return
+        for client in (self._mongo, self._driver):
+            if client is not None:
+                client.close()
+
+    def actor(self):
+        return self.rng.choice(self.samples["actors"])
+
+    def director(self):
+        return self.rng.choice(self.samples["directors"])
+
+
+# ==========================
+# Scénarios (boutons de app.py)
+# ==========================
+
+# Prélude exécuté à chaque réexécution du script, par section
+PRELUDES = {
+    "MongoDB": [
+        ("mongo.connect", lambda c: c.collection()),
+    ],
+    "Neo4j": [
+        ("neo4j.get_all_films", lambda c: n.get_all_films(c.driver())),
+        ("neo4j.get_all_directors", lambda c: n.get_all_directors(c.driver())),
+        ("neo4j.get_films_by_director", lambda c: n.get_films_by_director(c.driver(), c.director())),
+        ("neo4j.get_all_actors", lambda c: n.get_all_actors(c.driver())),
+    ],
+    "Analyse croisée": [
+        ("neo4j.get_all_actors", lambda c: n.get_all_actors(c.driver())),
+        ("mongo.connect", lambda c: c.collection()),
+    ],
+}
+
+# Boutons en lecture seule de chaque section (les boutons qui écrivent sont exclus)
+BUTTONS = {
+    "MongoDB": [
+        ("mongo.get_most_common_year", lambda c: m.get_most_common_year(c.collection())),
+        ("mongo.count_movies_after_1999", lambda c: m.count_movies_after_1999(c.collection())),
+        ("mongo.average_votes_2007", lambda c: m.average_votes_2007(c.collection())),
+        ("mongo.get_films_per_year", lambda c: m.get_films_per_year(c.collection())),
+        ("mongo.get_genres", lambda c: m.get_genres(c.collection())),
+        ("mongo.get_top_revenue_film", lambda c: m.get_top_revenue_film(c.collection())),
+        ("mongo.get_directors_with_more_than_5_films", lambda c: m.get_directors_with_more_than_5_films(c.collection())),
+        ("mongo.get_best_avg_revenue_by_genre", lambda c: m.get_best_avg_revenue_by_genre(c.collection())),
+        ("mongo.get_top_rated_per_decade", lambda c: m.get_top_rated_per_decade(c.collection())),
+        ("mongo.get_longest_film_per_genre", lambda c: m.get_longest_film_per_genre(c.collection())),
+        ("mongo.get_top_revenue_per_year", lambda c: m.get_top_revenue_per_year(c.collection())),
+        ("mongo.get_top_votes_per_director", lambda c: m.get_top_votes_per_director(c.collection())),
+        ("mongo.compute_runtime_revenue_correlation", lambda c: m.compute_runtime_revenue_correlation(c.collection())),
+        ("mongo.get_avg_runtime_by_decade", lambda c: m.get_avg_runtime_by_decade(c.collection())),
+        ("mongo.get_collection_overview", lambda c: m.get_collection_overview(c.collection())),
+    ],
+    "Neo4j": [
+        ("neo4j.get_most_active_actor", lambda c: n.get_most_active_actor(c.driver())),
+        ("neo4j.get_actors_who_played_with", lambda c: n.get_actors_who_played_with(c.driver(), "Anne Hathaway")),
+        ("neo4j.get_top_grossing_actor", lambda c: n.get_top_grossing_actor(c.driver())),
+        ("neo4j.get_average_votes", lambda c: n.get_average_votes(c.driver())),
+        ("neo4j.get_most_common_genre", lambda c: n.get_most_common_genre(c.driver())),
+        ("neo4j.get_graph_overview", lambda c: n.get_graph_overview(c.driver())),
+        ("neo4j.get_films_played_by_coactors", lambda c: n.get_films_played_by_coactors(c.driver(), c.actor())),
+        ("neo4j.get_director_with_most_actors", lambda c: n.get_director_with_most_actors(c.driver())),
+        ("neo4j.get_most_connected_films", lambda c: n.get_most_connected_films(c.driver())),
+        ("neo4j.get_actors_with_most_directors", lambda c: n.get_actors_with_most_directors(c.driver())),
+        ("neo4j.recommend_film_by_genre", lambda c: n.recommend_film_by_genre(c.driver(), c.actor())),
+        ("neo4j.get_shortest_path_between_actors",
+         lambda c: n.get_shortest_path_between_actors(c.driver(), c.actor(), c.actor())),
+    ],
+    "Analyse croisée": [
+        ("neo4j.get_films_with_common_genres_diff_directors",
+         lambda c: n.get_films_with_common_genres_diff_directors(c.driver())),
+        ("cross.recommendation", lambda c: _cross_recommendation(c)),
+        ("neo4j.get_frequent_collaborations_page", lambda c: n.get_frequent_collaborations_page(c.driver())),
+    ],
+}
+
+# Poids de chaque section dans le mélange de sessions
+SECTION_WEIGHTS = {"MongoDB": 4, "Neo4j": 4, "Analyse croisée": 2}
+
+
+# Recommandation croisée : genres préférés dans Neo4j, puis recherche du film dans MongoDB
+def _cross_recommendation(context):
+    actor = context.actor()
+    genres = n.get_preferred_genres_for_actor(context.driver(), actor)
+    if genres:
+        m.recommend_film_mongo(context.collection(), genres, actor)
+
+
+# Échantillons d'acteurs et de réalisateurs lus une fois avant le test
+def load_samples(options):
+    driver = GraphDatabase.driver(options.neo4j_uri, auth=(options.neo4j_user, options.neo4j_password))
+    try:
+        samples = {"actors": n.get_all_actors(driver), "directors": n.get_all_directors(driver)}
+    finally:
+        driver.close()
+    if not samples["actors"] or not samples["directors"]:
+        raise SystemExit("Le graphe ne contient ni acteurs ni réalisateurs : importez les données d'abord.")
+    return samples
+
+
+# ==========================
+# Exécution d'un palier de concurrence
+# ==========================
+
+# Erreurs révélant une saturation du pool Neo4j ou du serveur
+def _is_neo4j_saturation(error):
+    if isinstance(error, (ServiceUnavailable, SessionExpired)):
+        return True
+    return isinstance(error, ClientError) and "connection from the pool" in str(error)
+
+
+# Boucle d'un utilisateur virtuel jusqu'à l'échéance ; renvoie ses mesures
+def _virtual_user(options, monitor, neo4j_monitor, samples, deadline, seed, shared):
+    context = Context(options, monitor, neo4j_monitor, samples, shared)
+    context.rng.seed(seed)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    neo4j_saturation = 0
+    sessions = 0
+    sections = list(SECTION_WEIGHTS)
+    weights = [SECTION_WEIGHTS[s] for s in sections]
+    try:
+        while time.perf_counter() < deadline:
+            section = context.rng.choices(sections, weights)[0]
+            clicks = context.rng.sample(BUTTONS[section], k=min(len(BUTTONS[section]), context.rng.randint(2, 5)))
+            for button in clicks:
+                for name, step in PRELUDES[section] + [button]:
+                    start = time.perf_counter()
+                    try:
+                        step(context)
+                        latencies[name].append(time.perf_counter() - start)
+                    except Exception as e:  # Une erreur est une mesure, pas un arrêt du test
+                        errors[f"{name}: {type(e).__name__}"] += 1
+                        neo4j_saturation += _is_neo4j_saturation(e)
+                context.end_click()
+                if options.think_time:
+                    time.sleep(context.rng.uniform(0, options.think_time))
+                if time.perf_counter() >= deadline:
+                    break
+            sessions += 1
+    finally:
+        context.close()
+    return {"latencies": dict(latencies), "errors": dict(errors),
+            "neo4j_saturation": neo4j_saturation, "sessions": sessions}
+
+
+# Fusionne les mesures de plusieurs utilisateurs virtuels
+def _merge(results):
+    merged = {"latencies": defaultdict(list), "errors": defaultdict(int), "neo4j_saturation": 0, "sessions": 0}
+    for result in results:
+        for name, values in result["latencies"].items():
+            merged["latencies"][name].extend(values)
+        for name, count in result["errors"].items():
+            merged["errors"][name] += count
+        merged["neo4j_saturation"] += result["neo4j_saturation"]
+        merged["sessions"] += result["sessions"]
+    return merged
+
+
+# Lance `users` utilisateurs virtuels dans des threads d'un même processus
+def _run_threads(options, users, deadline, seed):
+    # Une surcharge doit apparaître dans les mesures, pas être masquée par un résultat périmé
+    set_stale_serving(False)
+    monitor, neo4j_monitor = PoolMonitor(), Neo4jPoolMonitor()
+    shared = None
+    if options.shared_clients:
+        shared = (new_mongo_client(options, monitor), new_neo4j_driver(options, neo4j_monitor))
+    try:
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            futures = [pool.submit(_virtual_user, options, monitor, neo4j_monitor, options.samples, deadline,
+                                   seed + i, shared)
+                       for i in range(users)]
+            result = _merge(f.result() for f in futures)
+    finally:
+        for client in shared or ():
+            client.close()
+    result["pool"] = monitor.stats()
+    result["neo4j_pool"] = neo4j_monitor.stats()
+    return result
+
+
+# Additionne les mesures de pool de plusieurs processus (maxima sommés : pools distincts)
+def _merge_pools(pools):
+    merged = {"wait_times": [w for pool in pools for w in pool["wait_times"]]}
+    for key in pools[0]:
+        if key != "wait_times":
+            merged[key] = sum(pool[key] for pool in pools)
+    return merged
+
+
+# Exécute un palier : threads dans ce processus, ou répartis sur plusieurs processus
+def run_level(options, users):
+    deadline_offset = options.duration
+    start = time.perf_counter()
+    if options.processes <= 1:
+        result = _run_threads(options, users, start + deadline_offset, seed=users * 1000)
+    else:
+        # Chaque processus calcule son échéance à partir de la durée (horloges non partagées)
+        shares = [users // options.processes + (i < users % options.processes) for i in range(options.processes)]
+        with ProcessPoolExecutor(max_workers=options.processes) as pool:
+            futures = [pool.submit(_run_process, options, share, users * 1000 + i * 100)
+                       for i, share in enumerate(shares) if share]
+            parts = [f.result() for f in futures]
+        result = _merge(parts)
+        result["pool"] = _merge_pools([p["pool"] for p in parts])
+        result["neo4j_pool"] = _merge_pools([p["neo4j_pool"] for p in parts])
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+# Point d'entrée d'un processus de charge
+def _run_process(options, users, seed):
+    return _run_threads(options, users, time.perf_counter() + options.duration, seed)
+
+
+# ==========================
+# Rapport
+# ==========================
+
+# Percentile par rang le plus proche (valeurs en secondes)
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+# Formate une durée en millisecondes
+def _ms(value):
+    return "-" if value is None else f"{value * 1000:8.1f}"
+
+
+# Affiche le résumé d'un palier
+def print_level(users, result, options):
+    all_latencies = [v for values in result["latencies"].values() for v in values]
+    calls = len(all_latencies)
+    errors = sum(result["errors"].values())
+    pool, neo4j_pool = result["pool"], result["neo4j_pool"]
+    if options.shared_clients:
+        capacity = f"capacité {options.mongo_pool * max(1, options.processes)}"
+        neo4j_capacity = f"capacité {options.neo4j_pool * max(1, options.processes)}"
+    else:
+        capacity = neo4j_capacity = "un pool par clic"
+    print(f"\n=== {users} utilisateur(s) – {result['elapsed']:.1f} s ===")
+    print(f"Débit : {calls / result['elapsed']:.1f} requêtes/s, {result['sessions'] / result['elapsed']:.2f} sessions/s")
+    print(f"Latence globale : p50 {_ms(percentile(all_latencies, 50))} ms, p99 {_ms(percentile(all_latencies, 99))} ms")
+    print(f"Erreurs : {errors} ({errors / max(1, calls + errors):.1%})")
+    print(f"Pool MongoDB : {pool['max_checked_out']} connexion(s) empruntée(s) au maximum "
+          f"({capacity}), {pool['created']} créée(s), attente p99 {_ms(percentile(pool['wait_times'], 99))} ms, "
+          f"{pool['checkout_failures']} échec(s) d'emprunt")
+    print(f"Pool Neo4j : {neo4j_pool['max_checked_out']} connexion(s) empruntée(s) au maximum "
+          f"({neo4j_capacity}), attente p99 {_ms(percentile(neo4j_pool['wait_times'], 99))} ms, "
+          f"{neo4j_pool['checkout_failures']} échec(s) d'acquisition, "
+          f"{result['neo4j_saturation']} erreur(s) d'acquisition ou d'indisponibilité")
+    print(f"{'étape':<55} {'appels':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, values in sorted(result["latencies"].items()):
+        print(f"{name:<55} {len(values):>7} {_ms(percentile(values, 50))} {_ms(percentile(values, 99))}")
+    for name, count in sorted(result["errors"].items()):
+        print(f"  ! {name} × {count}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Test de charge des fonctions database/ utilisées par app.py")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--neo4j-uri", default=NEO4J_URI)
+    parser.add_argument("--neo4j-user", default=NEO4J_USER)
+    parser.add_argument("--neo4j-password", default=NEO4J_PASSWORD)
+    parser.add_argument("--levels", default="1,5,10,25,50",
+                        help="paliers de concurrence (utilisateurs simultanés), séparés par des virgules")
+    parser.add_argument("--duration", type=float, default=30, help="durée de chaque palier en secondes")
+    parser.add_argument("--processes", type=int, default=1, help="nombre de processus de charge")
+    parser.add_argument("--think-time", type=float, default=0.5, help="pause maximale entre deux clics (s)")
+    parser.add_argument("--shared-clients", action="store_true",
+                        help="partager les clients entre les clics (par défaut : un client par clic comme app.py)")
+    parser.add_argument("--mongo-pool", type=int, default=100, help="maxPoolSize des clients MongoDB")
+    parser.add_argument("--neo4j-pool", type=int, default=100, help="taille maximale du pool Neo4j")
+    parser.add_argument("--acquisition-timeout", type=float, default=60,
+                        help="délai d'acquisition d'une connexion Neo4j (s)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    options = parse_args()
+    options.samples = load_samples(options)
+    for level in [int(x) for x in options.levels.split(",") if x.strip()]:
+        print_level(level, run_level(options, level), options)
@@ -0,0 +1,39 @@
+# scripts/run_service.py
+#
+# Lance le service JSON en lecture seule (database/service.py) : une seule série de connexions
+# et un seul cache pour tous les tableaux de bord. Pour que app.py l'utilise, renseigner
+# SERVICE_URL dans config/config.py.
+#
+# Exemple :
+#   python scripts/run_service.py --port 8888 --ttl 60
+#   curl -i "http://localhost:8888/api/neo4j/get_most_connected_films?limit=3"
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import asyncio
+
+from config.config import MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from database.service import CACHE_TTL, DEFAULT_BUDGET, DEFAULT_PORT, WORKERS, QueryService, make_app
+
+
+async def main(args):
+    service = QueryService(MONGO_URI, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                           ttl=args.ttl, workers=args.workers, budget=args.budget)
+    make_app(service).listen(args.port)
+    print(f"✅ Service à l'écoute sur http://localhost:{args.port}/api")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service JSON en lecture seule")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL, help="Durée de vie des réponses en cache (s)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Fils exécutant les requêtes")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Budget par défaut d'une requête (s)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,10 @@
+# ================================
+# tests/conftest.py
+# Configuration commune des tests (aucune base de données réelle n'est nécessaire)
+# ================================
+
+import os
+import sys
+
+# Racine du dépôt dans le chemin d'import, comme le font les scripts de scripts/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,86 @@
+# ================================
+# tests/test_admin_import.py
+# Import neo4j-admin : séquences triées, fusion sans doublons et répertoire de sortie
+# ================================
+
+import csv
+import os
+import random
+
+import pytest
+
+from database.admin_import import (
+    _number, _prepare_out_dir, _RunWriter, _write_headers, admin_import_command, merge_sorted_runs,
+)
+
+
+# Lignes d'un fichier CSV fusionné
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(int(entity_id), name) for entity_id, name in csv.reader(f)]
+
+
+# Séquences écrites par plusieurs partitions (mêmes entités répétées) puis fusionnées en
+# plusieurs passes : chaque identifiant une seule fois, dans l'ordre, séquences supprimées
+@pytest.mark.parametrize("fan_in", [2, 3, 64])
+def test_runs_merge_without_duplicates(tmp_path, fan_in):
+    rng = random.Random(fan_in)
+    writers = [_RunWriter(str(tmp_path), f"actors.p{i:03d}", run_size=7) for i in range(4)]
+    expected = {}
+    for _ in range(200):
+        entity_id = rng.randint(1, 60)
+        expected[entity_id] = f"Actor {entity_id}, \"jr\""  # Virgule et guillemets échappés
+        rng.choice(writers).add(entity_id, expected[entity_id])
+    for writer in writers:
+        writer.flush()
+    paths = [path for writer in writers for path in writer.paths]
+    assert len(paths) > 3  # Plusieurs passes pour fan_in = 2 ou 3, une seule pour 64
+
+    out_path = str(tmp_path / "actors.csv")
+    merge_sorted_runs(paths, out_path, fan_in=fan_in)
+    assert _rows(out_path) == sorted(expected.items())
+    assert os.listdir(tmp_path) == ["actors.csv"]
+
+
+# Une séquence ne garde qu'une ligne par identifiant et n'est écrite qu'une fois pleine
+def test_run_writer_flush(tmp_path):
+    writer = _RunWriter(str(tmp_path), "genres.p000", run_size=3)
+    for entity_id in (3, 1, 3, 2):
+        writer.add(entity_id, f"G{entity_id}")
+    assert len(writer.paths) == 1 and writer.rows == {}
+    writer.flush()
+    writer.flush()  # Tampon vide : aucun fichier
+    assert [_rows(path) for path in writer.paths] == [[(1, "G1"), (2, "G2"), (3, "G3")]]
+
+
+# Répertoire non vide refusé sans force ; avec force, seuls les fichiers générés sont supprimés
+def test_prepare_out_dir(tmp_path):
+    out_dir = str(tmp_path / "imports")
+    _prepare_out_dir(out_dir)
+    assert os.path.isdir(os.path.join(out_dir, "runs"))
+
+    _write_headers(out_dir)
+    for name in ("films.part-000.csv", "actors.csv", "runs/actors.p000.run-0000.csv", "notes.txt"):
+        open(os.path.join(out_dir, name), "w").close()
+    with pytest.raises(FileExistsError):
+        _prepare_out_dir(out_dir)
+    _prepare_out_dir(out_dir, force=True)
+    assert sorted(os.listdir(out_dir)) == ["notes.txt", "runs"]
+    assert os.listdir(os.path.join(out_dir, "runs")) == []
+
+
+# Commande neo4j-admin : en-tête puis fichiers de données de chaque type
+def test_admin_import_command(tmp_path):
+    out_dir = str(tmp_path)
+    for name in ("films.part-001.csv", "films.part-000.csv", "actors.csv"):
+        open(os.path.join(out_dir, name), "w").close()
+    command = admin_import_command(out_dir)
+    films = [os.path.join(out_dir, f) for f in ("films.header.csv", "films.part-000.csv", "films.part-001.csv")]
+    assert f"--nodes=Film={','.join(films)}" in command
+    assert f"--nodes=Actor={os.path.join(out_dir, 'actors.header.csv')},{os.path.join(out_dir, 'actors.csv')}" in command
+    assert command.startswith("neo4j-admin database import full") and command.endswith("neo4j")
+
+
+# Colonnes typées : nombres conservés, booléens et textes vidés
+def test_number():
+    assert [_number(v) for v in (3, 2.5, True, "12", None)] == [3, 2.5, "", "", ""]
@@ -0,0 +1,159 @@
+# ================================
+# tests/test_batch.py
+# Lectures groupées : les résultats de run_read_batch (Neo4j) et de run_aggregate_batch
+# (MongoDB, $facet) égalent ceux des fonctions individuelles
+# ================================
+
+import pytest
+
+from database import mongo, neo4j
+from database.mongo import FACET_PIPELINES, run_aggregate_batch
+from database.neo4j import BATCH_MODES, BATCH_QUERIES, run_read_batch
+
+mongomock = pytest.importorskip("mongomock")
+
+
+# ---------- Neo4j ----------
+
+# Lignes renvoyées par chaque requête enregistrée (une requête sans résultat compris)
+ROWS = {
+    "most_active_actor": [{"actor": "Ann", "nb_films": 4}],
+    "top_grossing_actor": [{"actor": "Bob", "total_revenue": 812.5}],
+    "average_votes": [{"avg_votes": 6.75}],
+    "most_common_genre": [{"genre": "Drama", "nb_films": 12}],
+    "director_with_most_actors": [],
+}
+
+# Fonction individuelle correspondant à chaque requête enregistrée
+INDIVIDUAL = {
+    "most_active_actor": neo4j.get_most_active_actor,
+    "top_grossing_actor": neo4j.get_top_grossing_actor,
+    "average_votes": neo4j.get_average_votes,
+    "most_common_genre": neo4j.get_most_common_genre,
+    "director_with_most_actors": neo4j.get_director_with_most_actors,
+}
+
+
+# Résultat de requête : lignes préparées, lues par single() ou data()
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def single(self):
+        return self.rows[0] if self.rows else None
+
+    def data(self):
+        return list(self.rows)
+
+
+# Session rejouant les requêtes enregistrées : une requête seule renvoie ses lignes, une
+# requête composée (CALL {}) renvoie une ligne avec les lignes de chaque sous-requête
+class _Session:
+    def __init__(self):
+        self.queries = []
+
+    def run(self, query, parameters=None, **kwargs):
+        query = getattr(query, "text", query)
+        self.queries.append(query)
+        names = [name for name, spec in BATCH_QUERIES.items() if spec["query"] in query]
+        if "CALL {" in query:
+            return _Result([{name: ROWS[name] for name in names}])
+        assert len(names) == 1
+        return _Result(ROWS[names[0]])
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class _Driver:
+    def __init__(self):
+        self.opened = _Session()
+
+    def session(self, **kwargs):
+        return self.opened
+
+
+# Chaque mode renvoie, en un seul appel, les mêmes valeurs que les fonctions individuelles
+@pytest.mark.parametrize("mode", BATCH_MODES)
+def test_read_batch_matches_individual(mode):
+    expected = {name: function(_Driver()) for name, function in INDIVIDUAL.items()}
+    driver = _Driver()
+    assert run_read_batch(driver, list(BATCH_QUERIES), mode=mode) == expected
+    assert expected["director_with_most_actors"] is None
+    if mode == "call":
+        assert len(driver.opened.queries) == 1
+    assert run_read_batch(_Driver(), [], mode=mode) == {}
+
+
+# Requête composée : une sous-requête CALL {} par nom, résultats renvoyés sous leur nom
+def test_compose_batch_query():
+    driver = _Driver()
+    run_read_batch(driver, ["average_votes", "most_common_genre"])
+    (query,) = driver.opened.queries
+    assert query.count("CALL {") == 2
+    assert "batch_0 AS `average_votes`" in query and "batch_1 AS `most_common_genre`" in query
+    assert "WITH batch_0, collect({genre: genre, nb_films: nb_films}) AS batch_1" in query
+
+
+# Noms ou mode inconnus refusés
+def test_read_batch_unknown():
+    with pytest.raises(ValueError):
+        run_read_batch(_Driver(), ["inconnue"])
+    with pytest.raises(ValueError):
+        run_read_batch(_Driver(), ["average_votes"], mode="parallel")
+
+
+# ---------- MongoDB ----------
+
+FILMS = [
+    {"_id": 1, "title": "Alpha", "year": 2007, "Votes": 100, "Revenue (Millions)": 50.0},
+    {"_id": 2, "title": "Beta", "year": 2007, "Votes": 300, "Revenue (Millions)": ""},
+    {"_id": 3, "title": "Gamma", "year": 1998, "Votes": 50, "Revenue (Millions)": 120.0},
+    {"_id": 4, "title": "Delta", "year": 2007, "Revenue (Millions)": 80.0},
+    {"_id": 5, "title": "Epsilon", "year": 2003, "Votes": 20, "Revenue (Millions)": 10.0},
+]
+
+
+@pytest.fixture
+def collection():
+    films = mongomock.MongoClient().db["films"]
+    films.insert_many([dict(film) for film in FILMS])
+    return films
+
+
+# Fonctions individuelles correspondant aux agrégations enregistrées
+def _individual(collection):
+    return {
+        "most_common_year": mongo.get_most_common_year(collection),
+        "movies_after_1999": mongo.count_movies_after_1999(collection),
+        "average_votes_2007": mongo.average_votes_2007(collection),
+        "films_per_year": mongo.get_films_per_year(collection),
+        "top_revenue_film": mongo.get_top_revenue_film(collection),
+    }
+
+
+# Un seul $facet donne les mêmes valeurs que les fonctions individuelles
+def test_aggregate_batch_matches_individual(collection):
+    expected = _individual(collection)
+    aggregate, pipelines = collection.aggregate, []
+    collection.aggregate = lambda pipeline, **kwargs: pipelines.append(pipeline) or aggregate(pipeline, **kwargs)
+    assert run_aggregate_batch(collection, list(FACET_PIPELINES)) == expected
+    assert len(pipelines) == 1 and list(pipelines[0][0]) == ["$facet"]
+    assert expected["most_common_year"] == {"_id": 2007, "count": 3}
+    assert expected["average_votes_2007"] == 200
+    assert expected["top_revenue_film"]["title"] == "Gamma"
+    assert run_aggregate_batch(collection, []) == {}
+    with pytest.raises(ValueError):
+        run_aggregate_batch(collection, ["inconnue"])
+
+
+# Collection vide : valeurs par défaut identiques (None, 0 ou liste vide)
+def test_aggregate_batch_empty():
+    films = mongomock.MongoClient().db["films"]
+    expected = _individual(films)
+    assert run_aggregate_batch(films, list(FACET_PIPELINES)) == expected
+    assert (expected["most_common_year"], expected["movies_after_1999"]) == (None, 0)
+    assert (expected["films_per_year"], expected["top_revenue_film"]) == ([], None)
@@ -0,0 +1,123 @@
+# ================================
+# tests/test_bitsets.py
+# Bitsets des castings : primitives, analyse des expressions et évaluation comparée aux ensembles Python
+# ================================
+
+import random
+
+import numpy as np
+import pytest
+
+from database.bitsets import (
+    CastArrayIndex, CastBitsetIndex, _bitset_from_ids, bitset_bytes, bitset_count, bitset_to_ids,
+    build_cast_index, parse_expression, query_cast_sets,
+)
+
+
+# Index aléatoire : identifiants épars (trous) au-delà d'un mot de 64 bits
+@pytest.fixture
+def cast():
+    rng = random.Random(7)
+    actors = {i: f"Actor {i}" for i in rng.sample(range(150), 40)}
+    films = {i: f"Film {i}" for i in rng.sample(range(200), 60)}
+    films[max(films) + 1] = films[min(films)]  # Titre porté par deux films
+    pairs = {(a, f) for a in actors for f in films if rng.random() < 0.1}
+    return CastBitsetIndex(pairs, actors, films), pairs
+
+
+# Conversion identifiants <-> bitset et comptage, de part et d'autre des frontières de mots
+def test_bitset_round_trip():
+    ids = [0, 1, 63, 64, 65, 127, 128, 199]
+    bitset = _bitset_from_ids(ids, 200)
+    assert bitset.size == 4
+    assert bitset_to_ids(bitset, 200).tolist() == ids
+    assert bitset_count(bitset) == len(ids)
+    assert bitset_count(_bitset_from_ids([], 10)) == 0
+
+
+# Priorités : NON > ET / SAUF > OU ; mots-clés équivalents aux symboles ; erreurs de syntaxe
+def test_parse_expression():
+    assert parse_expression('"A" | "B" & ~"C"') == (
+        "or", ("name", "A"), ("and", ("name", "B"), ("not", ("name", "C")))
+    )
+    assert parse_expression("'A' AND NOT ('B' OR 'C')") == parse_expression('"A" & ~("B" | "C")')
+    assert parse_expression('"A" - "B"') == ("and", ("name", "A"), ("not", ("name", "B")))
+    for text in ("", '"A" &', '("A"', '"A" "B"', "A & B"):
+        with pytest.raises(ValueError):
+            parse_expression(text)
+
+
+# Chaque domaine donne le même résultat que l'algèbre d'ensembles Python
+def test_queries_match_python_sets(cast):
+    index, pairs = cast
+    films_of = lambda a: {f for x, f in pairs if x == a}
+    cast_of = lambda f: {a for a, x in pairs if x == f}
+    costars_of = lambda a: {b for f in films_of(a) for b in cast_of(f)} - {a}
+    all_films, all_actors = set(index.film_titles), set(index.actor_names)
+    titles = lambda ids: sorted(index.film_titles[i] for i in ids)
+    names = lambda ids: sorted(index.actor_names[i] for i in ids)
+
+    a, b, c = sorted(index.actor_names)[:3]
+    na, nb, nc = (index.actor_names[i] for i in (a, b, c))
+    assert query_cast_sets(index, f'"{na}" | "{nb}"') == titles(films_of(a) | films_of(b))
+    assert query_cast_sets(index, f'~"{na}"') == titles(all_films - films_of(a))
+    assert query_cast_sets(index, f'("{na}" | "{nb}") - "{nc}"') == titles((films_of(a) | films_of(b)) - films_of(c))
+    assert query_cast_sets(index, f'"{na}" | "{nb}"', "costars") == names(costars_of(a) | costars_of(b))
+    assert query_cast_sets(index, f'~"{na}"', "costars") == names(all_actors - costars_of(a))
+
+    title = index.film_titles[min(index.film_titles)]
+    assert len(index.film_ids[title]) == 2
+    assert query_cast_sets(index, f'"{title}"', "cast") == names(set().union(*(cast_of(f) for f in index.film_ids[title])))
+
+
+# Un acteur n'est jamais son propre partenaire ; noms ou domaine inconnus refusés
+def test_costars_and_errors(cast):
+    index, _ = cast
+    for name, actor in index.actor_ids.items():
+        assert actor not in bitset_to_ids(index.costars(name), index.n_actors)
+    with pytest.raises(ValueError):
+        query_cast_sets(index, '"Inconnu"')
+    with pytest.raises(ValueError):
+        query_cast_sets(index, '"Film 0"', "inconnu")
+    assert np.array_equal(index.actor_films.shape, (index.n_actors, (index.n_films + 63) // 64))
+
+
+# Session Neo4j renvoyant les acteurs, les films et les relations A_JOUE d'un index
+class _Session:
+    def __init__(self, index, pairs):
+        self.results = {
+            "a.name": [{"id": i, "name": name} for i, name in index.actor_names.items()],
+            "f.title": [{"id": i, "title": title} for i, title in index.film_titles.items()],
+            "A_JOUE": [{"actor": a, "film": f} for a, f in pairs],
+        }
+
+    def run(self, query, parameters=None, **kwargs):
+        return next(rows for key, rows in self.results.items() if key in query)
+
+    def close(self):
+        pass
+
+
+class _Driver:
+    def __init__(self, index, pairs):
+        self.index, self.pairs = index, pairs
+
+    def session(self, **kwargs):
+        return _Session(self.index, self.pairs)
+
+
+# Au-delà de la taille maximale des matrices, l'index est construit sur des listes triées et
+# donne les mêmes résultats que les bitsets
+def test_build_falls_back_to_sorted_arrays(cast):
+    index, pairs = cast
+    assert bitset_bytes(index.n_actors, index.n_films) == index.actor_films.nbytes + index.film_cast.nbytes
+    assert isinstance(build_cast_index(_Driver(index, pairs)), CastBitsetIndex)
+    fallback = build_cast_index(_Driver(index, pairs), max_bytes=bitset_bytes(index.n_actors, index.n_films) - 1)
+    assert isinstance(fallback, CastArrayIndex)
+    a, b, c = (index.actor_names[i] for i in sorted(index.actor_names)[:3])
+    title, other = (index.film_titles[i] for i in sorted(index.film_titles)[:2])
+    for expression, domain in [
+        (f'("{a}" | "{b}") - "{c}"', "films"), (f'~"{a}"', "films"),
+        (f'"{a}" & ~"{b}"', "costars"), (f'"{title}" - "{other}"', "cast"),
+    ]:
+        assert query_cast_sets(fallback, expression, domain) == query_cast_sets(index, expression, domain)
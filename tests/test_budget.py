@@ -0,0 +1,209 @@
+# ================================
+# tests/test_budget.py
+# Budgets de requête : disjoncteur, appels imbriqués, délais transmis aux bases, annulation,
+# lectures en flux et résultats périmés
+# ================================
+
+import threading
+import time
+
+import pytest
+from neo4j import GraphDatabase, Query
+from pymongo import _csot
+
+from database import budget as budget_module
+from database.budget import (
+    BREAKERS, CircuitBreaker, CircuitOpenError, QueryCancelled, QueryTimeout,
+    _cache_key, budget_session, budgeted, reset_stale, served_stale, time_budget,
+)
+
+
+# Disjoncteurs neufs (seuil 2, réouverture rapide), cache des résultats périmés vide
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    for backend in ("mongo", "neo4j"):
+        monkeypatch.setitem(BREAKERS, backend, CircuitBreaker(backend, threshold=2, cooldown=0.05))
+    monkeypatch.setattr(budget_module, "_STALE_CACHE", budget_module._StaleCache())
+    monkeypatch.setattr(budget_module, "_stale_serving", True)
+    reset_stale()
+
+
+# Fonction décorée pilotée par le test : lève failure[0] s'il est renseigné, sinon renvoie
+# un résultat modifiable
+def _reader(backend="mongo", stale=True):
+    calls, failure = [], [None]
+
+    @budgeted(backend, stale=stale)
+    def read(key):
+        calls.append(key)
+        if failure[0] is not None:
+            raise failure[0]
+        return {"key": key, "films": ["Alpha"]}
+    return read, calls, failure
+
+
+# Échecs de surcharge consécutifs : ouverture, refus sans appel, puis un seul essai après le
+# délai ; un essai réussi referme le disjoncteur, un essai en échec le rouvre
+def test_breaker_opens_and_recovers():
+    read, calls, failure = _reader(stale=False)
+    failure[0] = QueryTimeout("lent")
+    for _ in range(2):
+        with pytest.raises(QueryTimeout):
+            read(1)
+    assert BREAKERS["mongo"].state == "open"
+    with pytest.raises(CircuitOpenError):
+        read(1)
+    assert len(calls) == 2
+
+    time.sleep(0.06)
+    assert BREAKERS["mongo"].state == "half-open"
+    with pytest.raises(QueryTimeout):
+        read(1)
+    assert BREAKERS["mongo"].state == "open"
+
+    time.sleep(0.06)
+    failure[0] = None
+    assert read(1)["key"] == 1
+    assert BREAKERS["mongo"].state == "closed" and BREAKERS["mongo"].failures == 0
+
+
+# Une erreur de la requête elle-même (hors surcharge) ne compte pas comme un échec
+def test_query_errors_do_not_open_breaker():
+    read, _, failure = _reader(stale=False)
+    failure[0] = ValueError("paramètre invalide")
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            read(1)
+    assert BREAKERS["mongo"].state == "closed"
+
+
+# Appel imbriqué de la même base : pas de passage par le disjoncteur, budget de l'appel extérieur
+def test_nested_call_skips_breaker():
+    breaker = BREAKERS["neo4j"]
+    allowed = []
+    allow = breaker.allow
+    breaker.allow = lambda: allowed.append(1) or allow()
+    deadlines = []
+
+    @budgeted("neo4j")
+    def inner():
+        deadlines.append(budget_module._current.get().deadline)
+        return 1
+
+    @budgeted("neo4j")
+    def outer():
+        deadlines.append(budget_module._current.get().deadline)
+        return inner() + inner()
+
+    assert outer(budget=5) == 2
+    assert len(allowed) == 1
+    assert len(set(deadlines)) == 1
+
+
+# Le temps restant devient le maxTimeMS MongoDB (pymongo.timeout) et le délai des requêtes Neo4j
+def test_budget_becomes_server_timeouts():
+    class Session:
+        def __init__(self):
+            self.queries = []
+
+        def run(self, query, parameters=None, **kwargs):
+            self.queries.append(query)
+
+        def close(self):
+            pass
+
+    class Driver:
+        def __init__(self):
+            self.opened = Session()
+
+        def session(self, **kwargs):
+            return self.opened
+
+    @budgeted("mongo")
+    def mongo_read():
+        return _csot.get_timeout()
+
+    @budgeted("neo4j")
+    def neo4j_read(driver):
+        with budget_session(driver) as session:
+            session.run("RETURN 1")
+
+    assert 0 < mongo_read(budget=2) <= 2
+    assert mongo_read() is None  # Sans budget : pas de maxTimeMS
+
+    driver = Driver()
+    neo4j_read(driver, budget=3)
+    query = driver.opened.queries[0]
+    assert isinstance(query, Query) and 0 < query.timeout <= 3
+    neo4j_read(driver)
+    assert driver.opened.queries[1] == "RETURN 1"
+
+    with time_budget(1):
+        assert mongo_read(budget=10) <= 1  # L'échéance englobante la plus proche l'emporte
+
+
+# Un appel annulé ou dont le budget est épuisé ne part pas
+def test_cancellation_and_exhausted_budget():
+    read, calls, _ = _reader(stale=False)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(QueryCancelled):
+        read(1, cancel=cancel)
+    with pytest.raises(QueryTimeout):
+        read(1, budget=0)
+    assert calls == []
+
+
+# Lectures en flux : budget= accepté et appliqué à toute la lecture, annulation entre deux éléments
+def test_stream_budget_and_cancellation():
+    @budgeted("neo4j")
+    def stream(n, delay=0.0):
+        for i in range(n):
+            time.sleep(delay)
+            yield i
+
+    assert list(stream(3, budget=5)) == [0, 1, 2]
+    with pytest.raises(QueryTimeout):
+        list(stream(10, delay=0.02, budget=0.05))
+
+    cancel = threading.Event()
+    items = stream(5, cancel=cancel)
+    assert next(items) == 0
+    cancel.set()
+    with pytest.raises(QueryCancelled):
+        next(items)
+
+
+# Disjoncteur ouvert : le dernier résultat connu est servi (copie indépendante) et signalé
+def test_stale_result_served_when_open():
+    read, calls, failure = _reader()
+    first = read(1)
+    first["films"].append("modifié par l'appelant")
+    failure[0] = QueryTimeout("lent")
+    for _ in range(2):
+        assert read(1)["films"] == ["Alpha"]  # Résultat périmé servi après chaque échec
+    assert BREAKERS["mongo"].state == "open"
+
+    reset_stale()
+    value = read(1)
+    assert value == {"key": 1, "films": ["Alpha"]}
+    assert served_stale()
+    value["films"].clear()
+    assert read(1)["films"] == ["Alpha"]
+    with pytest.raises(CircuitOpenError):
+        read(2)  # Aucun résultat connu pour ces arguments
+    assert calls == [1, 1, 1]
+
+
+# Deux drivers Neo4j vers des serveurs différents n'ont pas la même clé de cache
+def test_cache_key_distinguishes_drivers():
+    fn = test_cache_key_distinguishes_drivers
+    a = GraphDatabase.driver("neo4j://server-a:7687", auth=("neo4j", "x"))
+    b = GraphDatabase.driver("neo4j://server-b:7687", auth=("neo4j", "x"))
+    c = GraphDatabase.driver("neo4j://server-a:7687", auth=("neo4j", "x"))
+    try:
+        assert _cache_key(fn, (a,), {}) != _cache_key(fn, (b,), {})
+        assert _cache_key(fn, (a,), {}) == _cache_key(fn, (c,), {})
+    finally:
+        for driver in (a, b, c):
+            driver.close()
@@ -0,0 +1,160 @@
+# ================================
+# tests/test_bulk_edit.py
+# Édition en masse : construction des opérations, simulation en une agrégation $facet, rapport
+# du bulk_write et films à resynchroniser quand la propagation au graphe échoue (mongomock)
+# ================================
+
+import pytest
+from pymongo import DeleteMany, DeleteOne, InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import bulk_edit as bulk_edit_module
+from database.bulk_edit import bulk_edit_films, resync_films
+from database.mongo import _build_bulk_request, bulk_write_films
+
+mongomock = pytest.importorskip("mongomock")
+
+FILMS = [
+    {"_id": 1, "title": "Alpha", "year": 2001, "genre": "Drama"},
+    {"_id": 2, "title": "Beta", "year": 2002, "genre": "Drama"},
+    {"_id": 3, "title": "Gamma", "year": 2003, "genre": "Comedy"},
+]
+
+
+# Résultat d'un bulk_write rejoué
+class _Result:
+    def __init__(self, details):
+        self.bulk_api_result = details
+
+
+# bulk_write rejoué requête par requête (mongomock ne prend pas en charge les requêtes de
+# cette version de PyMongo), avec les compteurs et les erreurs renvoyés par MongoDB
+def _bulk_write(collection):
+    def bulk_write(requests, ordered=True):
+        details = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0,
+                   "upserted": [], "writeErrors": []}
+        for i, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                try:
+                    collection.insert_one(dict(request._doc))
+                    details["nInserted"] += 1
+                except mongomock.DuplicateKeyError:
+                    details["writeErrors"].append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+            elif isinstance(request, (UpdateOne, UpdateMany)):
+                update = collection.update_many if isinstance(request, UpdateMany) else collection.update_one
+                result = update(request._filter, request._doc, upsert=request._upsert)
+                details["nMatched"] += result.matched_count
+                details["nModified"] += result.modified_count
+                if result.upserted_id is not None:
+                    details["nUpserted"] += 1
+                    details["upserted"].append({"index": i, "_id": result.upserted_id})
+            else:
+                delete = collection.delete_many if isinstance(request, DeleteMany) else collection.delete_one
+                details["nRemoved"] += delete(request._filter).deleted_count
+        if details["writeErrors"]:
+            raise BulkWriteError(details)
+        return _Result(details)
+    return bulk_write
+
+
+@pytest.fixture
+def collection():
+    films = mongomock.MongoClient().db["films"]
+    films.insert_many([dict(film) for film in FILMS])
+    films.bulk_write = _bulk_write(films)
+    return films
+
+
+OPERATIONS = [
+    {"op": "insert", "document": {"_id": 1, "title": "Doublon"}},                     # _id déjà présent
+    {"op": "insert", "document": {"_id": 4, "title": "Delta", "year": 2004}},
+    {"op": "update", "filter": {"genre": "Drama"}, "update": {"$set": {"rating": "R"}}, "many": True},
+    {"op": "update", "filter": {"genre": "Drama"}, "update": {"$set": {"rating": "PG"}}},
+    {"op": "update", "filter": {"title": "Zeta"}, "update": {"$set": {"year": 2010}}, "upsert": True},
+    {"op": "delete", "filter": {"genre": "Comedy"}, "many": True},
+    {"op": "update", "filter": {}, "update": {"$set": {"rating": "X"}}},               # filtre vide
+    {"op": "rename"},                                                                    # inconnue
+]
+
+
+# Chaque opération donne la requête PyMongo attendue ; les opérations mal formées sont refusées
+def test_build_bulk_request():
+    kinds = [type(_build_bulk_request(operation)) for operation in OPERATIONS[:6]]
+    assert kinds == [InsertOne, InsertOne, UpdateMany, UpdateOne, UpdateOne, DeleteMany]
+    assert _build_bulk_request(OPERATIONS[4])._upsert is True
+    assert isinstance(_build_bulk_request({"op": "delete", "filter": {"_id": 1}}), DeleteOne)
+    for operation in OPERATIONS[6:] + [{"op": "update", "filter": {"_id": 1}, "update": {"rating": "R"}},
+                                       {"op": "insert", "document": {}}]:
+        with pytest.raises(ValueError):
+            _build_bulk_request(operation)
+
+
+# Simulation : une seule agrégation $facet, les mêmes compteurs que l'écriture, rien d'écrit
+def test_dry_run_report(collection):
+    aggregate, pipelines = collection.aggregate, []
+    collection.aggregate = lambda pipeline, **kwargs: pipelines.append(pipeline) or aggregate(pipeline, **kwargs)
+    report = bulk_write_films(collection, OPERATIONS, dry_run=True)
+    assert len(pipelines) == 1 and list(pipelines[0][0]) == ["$facet"]
+    assert set(pipelines[0][0]["$facet"]) == {"op_0", "op_1", "op_2", "op_3", "op_4", "op_5"}
+    assert (report["inserted"], report["matched"], report["upserted"], report["deleted"]) == (1, 3, 1, 1)
+    assert [(error["index"], error["op"]) for error in report["errors"]] == [(0, "insert"), (6, "update"), (7, "rename")]
+    assert sorted(doc["_id"] for doc in collection.find()) == [1, 2, 3]
+    assert collection.count_documents({"rating": {"$exists": True}}) == 0
+    assert bulk_write_films(collection, [{"op": "insert", "document": {"title": "Sans _id"}}], dry_run=True)["inserted"] == 1
+    assert len(pipelines) == 1  # Ajout sans _id : rien à vérifier, aucune agrégation
+
+
+# Écriture : compteurs du serveur, erreurs ramenées à l'indice de l'opération d'origine
+def test_bulk_write_report(collection):
+    report = bulk_write_films(collection, OPERATIONS)
+    assert (report["inserted"], report["matched"], report["modified"], report["upserted"], report["deleted"]) == (1, 3, 3, 1, 1)
+    assert [(error["index"], error["op"]) for error in report["errors"]] == [(0, "insert"), (6, "update"), (7, "rename")]
+    assert "duplicate" in report["errors"][0]["error"]
+    assert len(report["upserted_ids"]) == 1
+    assert sorted(doc["title"] for doc in collection.find()) == ["Alpha", "Beta", "Delta", "Zeta"]
+
+
+# Dictionnaire minimal : identifiants entiers attribués dans l'ordre, prefetch sans effet
+class _Dictionary:
+    def __init__(self):
+        self.ids = {}
+
+    def prefetch(self, keys_by_kind):
+        pass
+
+    def encode(self, kind, keys):
+        return {key: self.ids.setdefault((kind, key), len(self.ids) + 1) for key in keys}
+
+    def lookup(self, kind, keys):
+        return {key: self.ids[kind, key] for key in keys if (kind, key) in self.ids}
+
+
+# Propagation au graphe en échec : MongoDB reste écrit et le rapport liste les films touchés ;
+# resync_films les repropage (présents : réécrits, disparus : supprimés)
+def test_failed_graph_sync_reports_ids(collection, monkeypatch, tmp_path):
+    synced = []
+
+    def failing_sync(*args, **kwargs):
+        raise ConnectionError("Neo4j indisponible")
+    monkeypatch.setattr(bulk_edit_module, "sync_films", failing_sync)
+    dictionary = _Dictionary()
+    dictionary.encode("film", ["1", "2", "3"])
+    operations = [
+        {"op": "update", "filter": {"_id": 1}, "update": {"$set": {"year": 1999}}},
+        {"op": "delete", "filter": {"_id": 3}},
+        {"op": "insert", "document": {"_id": 5, "title": "Epsilon", "year": 2005}},
+    ]
+    report = bulk_edit_films(collection, None, operations, dictionary=dictionary, sketches=object(),
+                             temporal=object(), tfidf_path=str(tmp_path / "tfidf.npz"))
+    assert report["graph"]["failed_ids"] == [1, 3, 5]
+    assert "ConnectionError" in report["graph"]["error"]
+    assert collection.find_one({"_id": 1})["year"] == 1999 and collection.find_one({"_id": 3}) is None
+
+    monkeypatch.setattr(bulk_edit_module, "sync_films", lambda driver, upserts, deletions, dictionary, sketches,
+                        temporal, previous_years: synced.append((upserts, list(deletions), previous_years)) or {})
+    resync_films(collection, None, report["graph"]["failed_ids"], dictionary=dictionary, sketches=object(),
+                 temporal=object())
+    upserts, deletions, previous_years = synced[0]
+    assert sorted(doc["_id"] for doc in upserts) == [1, 5]
+    assert deletions == [dictionary.ids["film", "3"]]
+    assert previous_years is None  # Anciennes années relues dans le graphe
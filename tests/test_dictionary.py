@@ -0,0 +1,104 @@
+# ================================
+# tests/test_dictionary.py
+# Dictionnaire nom <-> identifiant entier : attribution par lot, imports concurrents,
+# préchargement, recherche sans attribution et décodage (mongomock)
+# ================================
+
+import pytest
+
+from database.dictionary import Dictionary, film_key
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    database = mongomock.MongoClient().db
+    Dictionary(database).ensure_indexes()
+    return database
+
+
+# Compte les requêtes find d'un dictionnaire
+def _count_finds(dictionary):
+    find, calls = dictionary.entries.find, []
+    dictionary.entries.find = lambda *args, **kwargs: calls.append(args) or find(*args, **kwargs)
+    return calls
+
+
+# Identifiants consécutifs par type, stables, doublons de la liste ignorés ; le cache évite les relectures
+def test_encode(db):
+    dictionary = Dictionary(db)
+    assert dictionary.encode("actor", ["Ann", "Bob", "Ann"]) == {"Ann": 0, "Bob": 1}
+    assert dictionary.encode("genre", ["Drama"]) == {"Drama": 0}
+    assert dictionary.encode("actor", ["Cid", "Bob"]) == {"Cid": 2, "Bob": 1}
+    calls = _count_finds(dictionary)
+    assert dictionary.encode_one("actor", "Ann") == 0 and calls == []
+    assert Dictionary(db).encode("actor", ["Bob"]) == {"Bob": 1}  # Relu par un autre processus
+    assert film_key({"_id": 42}) == "42"
+    with pytest.raises(ValueError):
+        dictionary.encode("studio", ["X"])
+
+
+# Deux imports attribuent la même clé en même temps : l'insertion en double est ignorée et
+# les deux obtiennent l'identifiant enregistré par le premier
+def test_encode_concurrent_duplicate(db):
+    first, second = Dictionary(db), Dictionary(db)
+    reserve = second._reserve
+
+    # Le premier import écrit "Ann" entre la lecture et l'insertion du second
+    def racing_reserve(kind, n):
+        first.encode(kind, ["Ann"])
+        return reserve(kind, n)
+    second._reserve = racing_reserve
+    ids = second.encode("actor", ["Ann", "Bob"])
+    assert ids["Ann"] == first.encode_one("actor", "Ann")
+    assert db["dictionary"].count_documents({"kind": "actor", "key": "Ann"}) == 1
+    assert Dictionary(db).lookup("actor", ["Ann", "Bob"]) == ids
+
+
+# Une autre erreur d'écriture que la clé en double est propagée
+def test_encode_other_write_error(db, monkeypatch):
+    from pymongo.errors import BulkWriteError
+    dictionary = Dictionary(db)
+
+    def failing_insert(documents, ordered=True):
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]})
+    monkeypatch.setattr(dictionary.entries, "insert_many", failing_insert)
+    with pytest.raises(BulkWriteError):
+        dictionary.encode("actor", ["Ann"])
+
+
+# Préchargement de plusieurs types en une seule requête ; encode et lookup n'interrogent plus la base
+def test_prefetch(db):
+    Dictionary(db).encode("actor", ["Ann", "Bob"])
+    Dictionary(db).encode("film", ["1", "2"])
+    dictionary = Dictionary(db)
+    calls = _count_finds(dictionary)
+    dictionary.prefetch({"actor": ["Ann", "Bob", "Ann"], "film": ["1", "3"], "genre": []})
+    assert len(calls) == 1
+    assert dictionary.encode("actor", ["Bob", "Ann"]) == {"Bob": 1, "Ann": 0}
+    assert dictionary.lookup("film", ["1"]) == {"1": 0}
+    assert len(calls) == 1
+    dictionary.prefetch({"actor": ["Ann"]})  # Déjà en cache : aucune requête
+    assert len(calls) == 1
+
+
+# lookup n'attribue rien : les clés inconnues sont omises et restent inconnues
+def test_lookup(db):
+    Dictionary(db).encode("director", ["Lee"])
+    dictionary = Dictionary(db)
+    assert dictionary.lookup("director", ["Kim", "Lee"]) == {"Lee": 0}
+    assert db["dictionary"].count_documents({"key": "Kim"}) == 0
+    assert dictionary.encode("director", ["Kim"]) == {"Kim": 1}
+
+
+# decode relit les identifiants inconnus du cache ; les identifiants absents sont omis
+def test_decode(db):
+    ids = Dictionary(db).encode("genre", ["Drama", "Comedy"])
+    dictionary = Dictionary(db)
+    assert dictionary.decode("genre", [ids["Comedy"], 99, ids["Drama"], ids["Comedy"]]) == {
+        ids["Comedy"]: "Comedy", ids["Drama"]: "Drama",
+    }
+    calls = _count_finds(dictionary)
+    assert dictionary.decode("genre", [ids["Drama"]]) == {ids["Drama"]: "Drama"} and calls == []
+    assert dictionary.decode("actor", [ids["Drama"]]) == {}  # Identifiants propres à chaque type
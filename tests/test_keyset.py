@@ -0,0 +1,122 @@
+# ================================
+# tests/test_keyset.py
+# Pagination par curseur (keyset) des requêtes listées Neo4j, sans base : la condition Cypher
+# générée est évaluée en Python sur des lignes en mémoire
+# ================================
+
+import random
+import re
+
+import pytest
+
+from database.neo4j import PAGINATED_QUERIES, _keyset_condition, _paginated_query, get_list_page
+
+
+# Traduit la condition Cypher de _keyset_condition en expression Python
+def _python_condition(condition):
+    condition = condition.replace("$after IS NULL", "after is None")
+    condition = re.sub(r"\$after\.(\w+)", r"after['\1']", condition)
+    return condition.replace(" = ", " == ").replace(" AND ", " and ").replace(" OR ", " or ")
+
+
+# Trie des lignes selon une clé composite (colonne, sens), tri stable en plusieurs passes
+def _sorted(rows, keys):
+    rows = list(rows)
+    for column, direction in reversed(keys):
+        rows.sort(key=lambda row: row[column], reverse=direction == "DESC")
+    return rows
+
+
+# Session exécutant une requête listée sur des lignes en mémoire : condition, tri et limite
+class _Session:
+    def __init__(self, rows, keys):
+        self.rows, self.keys, self.queries = rows, keys, []
+
+    def run(self, query, parameters=None, **kwargs):
+        self.queries.append(query)
+        condition = _python_condition(re.search(r"WITH \* WHERE (.*)", query).group(1))
+        after = parameters["after"]
+        rows = [row for row in self.rows if eval(condition, {}, {**row, "after": after})]
+        rows = _sorted(rows, self.keys)
+        if "LIMIT $limit" in query:
+            rows = rows[:parameters["limit"]]
+        return _Result(rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return [dict(row) for row in self.rows]
+
+
+class _Driver:
+    def __init__(self, session):
+        self._session = session
+
+    def session(self, **kwargs):
+        return self._session
+
+
+# Collaborations avec de nombreux ex aequo sur le nombre de films et sur l'acteur
+def _collaborations(n=60, seed=1):
+    rng = random.Random(seed)
+    rows = {}
+    while len(rows) < n:
+        actor, director = f"Actor {rng.randint(1, 8)}", f"Director {rng.randint(1, 8)}"
+        rows[(actor, director)] = {"actor": actor, "director": director, "collaborations": rng.randint(1, 4)}
+    return list(rows.values())
+
+
+# Condition d'une clé composite : égalité sur les colonnes précédentes, comparaison stricte
+def test_keyset_condition_text():
+    condition = _keyset_condition([("collaborations", "DESC"), ("actor", "ASC")])
+    assert condition == (
+        "$after IS NULL OR (collaborations < $after.collaborations) OR "
+        "(collaborations = $after.collaborations AND actor > $after.actor)"
+    )
+
+
+# Requête assemblée : tri sur la clé, limite seulement en mode page, nom inconnu refusé
+def test_paginated_query():
+    query = _paginated_query("actors", paged=True)
+    assert "ORDER BY name ASC" in query
+    assert query.rstrip().endswith("LIMIT $limit")
+    assert "LIMIT" not in _paginated_query("actors", paged=False)
+    with pytest.raises(ValueError):
+        _paginated_query("inconnue", paged=True)
+
+
+# Chaque clé de tri est unique et fait partie des colonnes renvoyées (curseur reconstructible)
+@pytest.mark.parametrize("name", list(PAGINATED_QUERIES))
+def test_keys_are_returned_columns(name):
+    spec = PAGINATED_QUERIES[name]
+    assert {column for column, _ in spec["keys"]} <= set(spec["columns"])
+
+
+# Enchaîner les pages de toutes tailles redonne exactement la liste triée, sans doublon ni
+# ligne manquante, même avec des ex aequo sur les premières colonnes de la clé
+@pytest.mark.parametrize("page_size", [1, 7, 60, 100])
+def test_pages_cover_sorted_rows(page_size):
+    keys = PAGINATED_QUERIES["collaborations"]["keys"]
+    rows = _collaborations()
+    driver = _Driver(_Session(rows, keys))
+    pages, after = [], None
+    while True:
+        page, after = get_list_page(driver, "collaborations", after, page_size, min_collaborations=1)
+        assert len(page) <= page_size
+        pages.extend(page)
+        if after is None:
+            break
+        assert set(after) == {column for column, _ in keys}
+    assert pages == _sorted(rows, keys)
@@ -0,0 +1,212 @@
+# ================================
+# tests/test_leaderboards.py
+# Compteurs des classements : différences appliquées film par film comparées à un recalcul
+# complet, vérification de cohérence et reconstruction (transaction et session factices)
+# ================================
+
+from database.leaderboards import (
+    _RECOMPUTE_PAIR_QUERY, apply_film_deltas, check_leaderboard_consistency, rebuild_leaderboards,
+)
+
+PAIR_FIELDS = ("films", "revenue_sum", "revenue_count", "votes_sum", "votes_count")
+
+
+# Transaction rejouant en Python les trois requêtes de _apply_contributions : compteurs des
+# nœuds, retrait et ajout des binômes (un binôme nouveau est compté à la création du MERGE)
+class _Tx:
+    def __init__(self):
+        self.nodes = {"Actor": {}, "Director": {}}
+        self.pairs = {}
+        self.queries = []
+
+    def _node(self, label, node_id):
+        return self.nodes[label].setdefault(node_id, {})
+
+    def run(self, query, **params):
+        self.queries.append(query)
+        for row in params["rows"]:
+            if "SET n.film_count" in query:
+                label, key = ("Actor", "actors") if "n:Actor" in query else ("Director", "directors")
+                for node_id in row[key]:
+                    node = self._node(label, node_id)
+                    node["film_count"] = node.get("film_count", 0) + row["sign"]
+                    node["total_revenue"] = node.get("total_revenue", 0.0) + row["sign"] * (row["revenue"] or 0.0)
+                    node["votes_sum"] = node.get("votes_sum", 0.0) + row["sign"] * (row["votes"] or 0.0)
+                    node["votes_count"] = node.get("votes_count", 0) + (0 if row["votes"] is None else row["sign"])
+                continue
+            for director in row["directors"]:
+                for actor in row["actors"]:
+                    self._pair(query, row, actor, director)
+
+    def _pair(self, query, row, actor, director):
+        sign = -1 if "c.films - 1" in query else 1
+        pair = self.pairs.get((actor, director))
+        if pair is None:
+            if sign < 0:
+                return  # MATCH sans résultat
+            assert "ON CREATE SET" in query and "WHERE c.films = 1" not in query
+            pair = self.pairs[actor, director] = dict.fromkeys(PAIR_FIELDS, 0)
+            for label, node_id, field in (("Actor", actor, "director_count"), ("Director", director, "actor_count")):
+                node = self._node(label, node_id)
+                node[field] = node.get(field, 0) + 1
+        pair["films"] += sign
+        pair["revenue_sum"] += sign * (row["revenue"] or 0.0)
+        pair["revenue_count"] += 0 if row["revenue"] is None else sign
+        pair["votes_sum"] += sign * (row["votes"] or 0.0)
+        pair["votes_count"] += 0 if row["votes"] is None else sign
+        if pair["films"] <= 0:
+            del self.pairs[actor, director]
+            self.nodes["Actor"][actor]["director_count"] -= 1
+            self.nodes["Director"][director]["actor_count"] -= 1
+
+
+# Agrégats attendus, recalculés depuis l'état courant des films
+def _recompute(films):
+    nodes, pairs = {"Actor": {}, "Director": {}}, {}
+    for film in films.values():
+        for label, key in (("Actor", "actors"), ("Director", "directors")):
+            for node_id in film[key]:
+                node = nodes[label].setdefault(node_id, {"film_count": 0, "total_revenue": 0.0,
+                                                         "votes_sum": 0.0, "votes_count": 0})
+                node["film_count"] += 1
+                node["total_revenue"] += film["revenue"] or 0.0
+                node["votes_sum"] += film["votes"] or 0.0
+                node["votes_count"] += film["votes"] is not None
+        for actor in film["actors"]:
+            for director in film["directors"]:
+                pair = pairs.setdefault((actor, director), dict.fromkeys(PAIR_FIELDS, 0))
+                pair["films"] += 1
+                pair["revenue_sum"] += film["revenue"] or 0.0
+                pair["revenue_count"] += film["revenue"] is not None
+                pair["votes_sum"] += film["votes"] or 0.0
+                pair["votes_count"] += film["votes"] is not None
+    for (actor, director) in pairs:
+        nodes["Actor"][actor]["director_count"] = nodes["Actor"][actor].get("director_count", 0) + 1
+        nodes["Director"][director]["actor_count"] = nodes["Director"][director].get("actor_count", 0) + 1
+    return nodes, pairs
+
+
+def _film(film_id, actors, directors, revenue=None, votes=None):
+    return {"id": film_id, "actors": actors, "directors": directors, "revenue": revenue, "votes": votes}
+
+
+# Ajouts, modification (casting, réalisateur, revenu) et suppression appliqués par différences :
+# les compteurs stockés égalent un recalcul complet à chaque étape
+def test_apply_film_deltas_matches_recompute():
+    tx, films = _Tx(), {}
+    unchanged = _film(3, [2, 3], [10, 11], 50.0, None)
+    steps = [
+        [(None, _film(1, [1, 2], [10], 100.0, 7.0)), (None, _film(2, [1], [10], None, 6.0))],
+        [(None, unchanged)],
+        [(_film(1, [1, 2], [10], 100.0, 7.0), _film(1, [2, 4], [11], 80.0, 7.5))],
+        [(_film(2, [1], [10], None, 6.0), None), (unchanged, unchanged)],
+    ]
+    for changes in steps:
+        apply_film_deltas(tx, changes)
+        for before, after in changes:
+            if after is None:
+                del films[before["id"]]
+            else:
+                films[after["id"]] = after
+        nodes, pairs = _recompute(films)
+        assert tx.pairs == pairs
+        for label in nodes:
+            stored = {node_id: node for node_id, node in tx.nodes[label].items() if node.get("film_count")}
+            assert stored == nodes[label]
+            # Nœuds sans film : tous leurs compteurs sont revenus à zéro
+            for node_id, node in tx.nodes[label].items():
+                if node_id not in nodes[label]:
+                    assert not any(node.values())
+
+
+# Un film inchangé n'envoie aucune requête ; retraits puis ajouts dans une seule série
+def test_apply_film_deltas_queries():
+    tx = _Tx()
+    film = _film(1, [1], [10], 5.0, 6.0)
+    apply_film_deltas(tx, [(film, film)])
+    assert tx.queries == []
+    apply_film_deltas(tx, [(None, film)])
+    assert len(tx.queries) == 3  # Acteurs, réalisateurs, ajouts de binômes
+    tx.queries.clear()
+    apply_film_deltas(tx, [(film, dict(film, votes=8.0))])
+    assert len(tx.queries) == 4 and "c.films - 1" in tx.queries[2] and "MERGE" in tx.queries[3]
+
+
+# Session renvoyant des enregistrements préparés selon la requête ; les requêtes sont gardées
+class _Session:
+    def __init__(self, nodes=(), stored_pairs=(), recomputed_pairs=()):
+        self.nodes, self.stored_pairs, self.recomputed_pairs = list(nodes), list(stored_pairs), list(recomputed_pairs)
+        self.queries = []
+
+    def run(self, query, parameters=None, **kwargs):
+        self.queries.append(query)
+        if "AS stored" in query:
+            label = "Actor" if "MATCH (n:Actor" in query else "Director"
+            return [record for record in self.nodes if record["label"] == label]
+        if "properties(c)" in query:
+            return self.stored_pairs
+        if query.strip() == _RECOMPUTE_PAIR_QUERY.strip():
+            return self.recomputed_pairs
+        return []
+
+    def close(self):
+        pass
+
+
+class _Driver:
+    def __init__(self, session):
+        self.opened = session
+
+    def session(self, **kwargs):
+        return self.opened
+
+
+def _node_record(label, node_id, stored, **expected):
+    values = {"film_count": 1, "total_revenue": 10.0, "votes_sum": 7.0, "votes_count": 1, "partners": 1}
+    values.update(expected)
+    return {"label": label, "id": node_id, "name": f"{label} {node_id}", "stored": stored, **values}
+
+
+def _pair_record(actor, director, **stats):
+    return {"actor_id": actor, "director_id": director, "actor": f"A{actor}", "director": f"D{director}", **stats}
+
+
+# Écarts signalés : compteur faux ou absent, binôme manquant ou en trop ; sommes flottantes
+# comparées avec tolérance
+def test_check_leaderboard_consistency():
+    good = {"film_count": 1, "total_revenue": 10.0 + 1e-9, "votes_sum": 7.0, "votes_count": 1}
+    stats = {"films": 1, "revenue_sum": 10.0, "revenue_count": 1, "votes_sum": 7.0, "votes_count": 1}
+    session = _Session(
+        nodes=[
+            _node_record("Actor", 1, dict(good, director_count=1)),
+            _node_record("Actor", 2, dict(good, director_count=1, film_count=2)),
+            _node_record("Director", 10, dict(good)),                          # actor_count absent
+        ],
+        stored_pairs=[_pair_record(1, 10, stats=stats), _pair_record(3, 10, stats=stats)],
+        recomputed_pairs=[_pair_record(1, 10, **stats), _pair_record(2, 10, **stats)],
+    )
+    mismatches = check_leaderboard_consistency(_Driver(session))
+    found = {(m["kind"], m["id"], m["field"], m["stored"], m["expected"]) for m in mismatches}
+    assert found == {
+        ("Actor", 2, "film_count", 2, 1),
+        ("Director", 10, "actor_count", None, 1),
+        ("COLLABORE_AVEC", (2, 10), "films", None, 1),
+        ("COLLABORE_AVEC", (2, 10), "revenue_sum", None, 10.0),
+        ("COLLABORE_AVEC", (2, 10), "revenue_count", None, 1),
+        ("COLLABORE_AVEC", (2, 10), "votes_sum", None, 7.0),
+        ("COLLABORE_AVEC", (2, 10), "votes_count", None, 1),
+        ("COLLABORE_AVEC", (3, 10), "films", 1, 0),
+    }
+    assert not check_leaderboard_consistency(_Driver(_Session(nodes=[_node_record("Actor", 1, dict(good, director_count=1))])))
+
+
+# Reconstruction : relations :COLLABORE_AVEC supprimées, agrégats de chaque type recalculés,
+# puis binômes recréés depuis le recalcul
+def test_rebuild_leaderboards():
+    session = _Session()
+    rebuild_leaderboards(_Driver(session))
+    delete, actors, directors, pairs = session.queries
+    assert "DELETE c" in delete
+    assert "MATCH (n:Actor" in actors and "n.director_count = partners" in actors
+    assert "MATCH (n:Director" in directors and "n.actor_count = partners" in directors
+    assert _RECOMPUTE_PAIR_QUERY.strip() in pairs and "CREATE (a)-[:COLLABORE_AVEC" in pairs
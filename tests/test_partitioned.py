@@ -0,0 +1,181 @@
+# ================================
+# tests/test_partitioned.py
+# Agrégations découpées en plages : bornes, filtres disjoints et fusion des agrégats partiels
+# ================================
+
+import random
+
+import numpy as np
+import pytest
+
+from database.partitioned import (
+    _merge_value, _partial_stages, is_decomposable, merge_partials, merged_correlation, merged_mean,
+    parallel_aggregate, partition_boundaries, partition_filters,
+)
+
+ACCUMULATORS = {
+    "count": ("count", None),
+    "sum": ("sum", "$rating"),
+    "sumsq": ("sumsq", "$rating"),
+    "min": ("min", "$rating"),
+    "max": ("max", "$rating"),
+    "best": ("top", "$rating", 3),
+    "worst": ("bottom", "$rating", 2),
+}
+
+
+# Collection réduite à aggregate(), renvoyant l'échantillon de valeurs donné
+class _Collection:
+    def __init__(self, values):
+        self.values = values
+
+    def aggregate(self, pipeline):
+        return iter({"value": value} for value in self.values)
+
+
+# Évalue un filtre de partition_filters sur une valeur (None : champ absent)
+def _matches(condition, value):
+    if not condition:
+        return True
+    condition = condition["year"]
+    if "$not" in condition:
+        return not (isinstance(value, int) and value >= condition["$not"]["$gte"])
+    if not isinstance(value, int):
+        return False
+    return value >= condition["$gte"] and ("$lt" not in condition or value < condition["$lt"])
+
+
+# Agrégats partiels d'une plage, calculés comme le ferait le serveur
+def _partial(films):
+    groups = {}
+    for film in films:
+        groups.setdefault(film["genre"], []).append(film)
+    docs = []
+    for genre, members in groups.items():
+        ratings = [f["rating"] for f in members]
+        numeric = [{"title": f["title"], "value": f["rating"]} for f in members if isinstance(f["rating"], float)]
+        docs.append({
+            "_id": genre, "count": len(members),
+            "sum": sum(r for r in ratings if isinstance(r, float)),
+            "sumsq": sum(r * r for r in ratings if isinstance(r, float)),
+            "min": min(r for r in ratings if isinstance(r, float)),
+            "max": max(r for r in ratings if isinstance(r, float)),
+            "best": sorted(numeric, key=lambda d: -d["value"])[:3],
+            "worst": sorted(numeric, key=lambda d: d["value"])[:2],
+        })
+    return docs
+
+
+# Bornes : quantiles de l'échantillon sans doublon ; rien pour une plage ou des types mélangés
+def test_partition_boundaries():
+    assert partition_boundaries(_Collection(list(range(100))), "year", 4) == [25, 50, 75]
+    assert partition_boundaries(_Collection([1, 1, 1, 1, 2]), "year", 4) == [1]
+    assert partition_boundaries(_Collection([1, "a"]), "year", 2) == []
+    assert partition_boundaries(_Collection(list(range(10))), "year", 1) == []
+
+
+# Chaque document, y compris sans valeur comparable, tombe dans exactement une plage
+def test_partition_filters_are_disjoint_and_cover():
+    filters = partition_filters("year", [1990, 2000, 2010])
+    assert len(filters) == 4
+    for value in [None, "inconnue", 1900, 1989, 1990, 1999, 2000, 2009, 2010, 2024]:
+        assert sum(_matches(f, value) for f in filters) == 1
+    assert partition_filters("year", []) == [{}]
+
+
+# Fusionner les agrégats de plages quelconques donne le résultat de l'agrégation globale ;
+# les notes non numériques sont ignorées par top / bottom
+@pytest.mark.parametrize("partitions", [1, 2, 5])
+def test_merge_partials_equals_global(partitions):
+    rng = random.Random(partitions)
+    films = [
+        {"title": f"Film {i}", "genre": rng.choice("ABC"), "rating": round(rng.uniform(1, 10), 1)}
+        for i in range(200)
+    ]
+    films += [{"title": "Sans note", "genre": "A", "rating": "N/A"}]
+    chunks = [films[i::partitions] for i in range(partitions)]
+    merged = {doc["_id"]: doc for doc in merge_partials(ACCUMULATORS, [_partial(c) for c in chunks])}
+    expected = {doc["_id"]: doc for doc in _partial(films)}
+    assert merged.keys() == expected.keys()
+    for genre, doc in expected.items():
+        for name in ("count", "min", "max"):
+            assert merged[genre][name] == doc[name]
+        for name in ("sum", "sumsq"):
+            assert merged[genre][name] == pytest.approx(doc[name])
+        for name in ("best", "worst"):
+            assert [d["value"] for d in merged[genre][name]] == [d["value"] for d in doc[name]]
+
+
+# Valeurs absentes ou non numériques : l'autre plage l'emporte, les non-nombres sont écartés
+def test_merge_value_edge_cases():
+    top = ("top", "$rating", 2)
+    assert _merge_value(("sum", "$x"), None, 3) == 3
+    assert _merge_value(("min", "$x"), 4, None) == 4
+    left = [{"title": "a", "value": 9}, {"title": "b", "value": None}]
+    right = [{"title": "c", "value": "10"}, {"title": "d", "value": True}, {"title": "e", "value": 7.5}]
+    assert _merge_value(top, left, right) == [{"title": "a", "value": 9}, {"title": "e", "value": 7.5}]
+    assert _merge_value(("bottom", "$rating", 5), left, right) == [{"title": "e", "value": 7.5}, {"title": "a", "value": 9}]
+
+
+# top / bottom : valeur calculée avant le $group, non-nombres retirés après
+def test_partial_stages_filter_non_numeric():
+    stages = _partial_stages("$genre", {"best": ("top", "$rating", 3), "n": ("count", None)})
+    assert [next(iter(stage)) for stage in stages] == ["$set", "$group", "$set"]
+    assert stages[0]["$set"]["__best"]["$cond"][2] is None
+    assert stages[1]["$group"]["best"]["$topN"]["n"] == 3
+    assert stages[2]["$set"]["best"]["$filter"]["cond"] == {"$isNumber": "$$this.value"}
+    assert len(_partial_stages(None, {"n": ("count", None)})) == 1
+
+
+# Étapes préalables applicables document par document seulement
+def test_is_decomposable():
+    assert is_decomposable([{"$match": {"year": 2000}}, {"$unwind": "$genre"}])
+    assert not is_decomposable([{"$sort": {"year": 1}}])
+    assert not is_decomposable([{"$match": {}, "$limit": 1}])
+
+
+# Moyenne et corrélation déduites des sommes fusionnées
+def test_merged_mean_and_correlation():
+    assert merged_mean({"sum": 10.0, "count": 4}) == 2.5
+    assert merged_mean({"sum": 0, "count": 0}) is None
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=50)
+    y = 2 * x + rng.normal(size=50)
+    doc = {"n": 50, "sum_x": x.sum(), "sum_y": y.sum(), "sumsq_x": (x * x).sum(),
+           "sumsq_y": (y * y).sum(), "sum_xy": (x * y).sum()}
+    assert merged_correlation(doc) == pytest.approx(np.corrcoef(x, y)[0, 1])
+    assert merged_correlation({"n": 1}) is None
+    assert merged_correlation({**doc, "sumsq_x": x.sum() ** 2 / 50}) is None
+
+
+# Collection exécutant les seules étapes utilisées ici ($sample pour les bornes, $match sur
+# l'année puis $group de l'effectif), sur des documents en mémoire
+class _YearCollection:
+    def __init__(self, years):
+        self.docs = [{"_id": i, "year": year} for i, year in enumerate(years)]
+
+    def aggregate(self, pipeline):
+        if "$sample" in pipeline[0]:
+            return iter({"value": doc["year"]} for doc in self.docs)
+        docs = [doc for doc in self.docs if _matches_year(pipeline[0]["$match"], doc.get("year"))]
+        return iter([{"_id": None, "count": len(docs)}] if docs else [])
+
+
+# Évalue un filtre $match sur l'année : $and, filtres de plage ou de l'appelant
+def _matches_year(condition, value):
+    if "$and" in condition:
+        return all(_matches_year(c, value) for c in condition["$and"])
+    condition = condition["year"]
+    if "$not" in condition:
+        return not (isinstance(value, int) and value >= condition["$not"]["$gte"])
+    if not isinstance(value, int):
+        return False
+    return value >= condition.get("$gte", value) and value < condition.get("$lt", value + 1)
+
+
+# Un filtre de l'appelant sur le champ de découpage s'ajoute à la plage au lieu d'être remplacé
+def test_match_on_partition_field():
+    collection = _YearCollection(list(range(1950, 2020)))
+    match = {"year": {"$gte": 2000}}
+    result = parallel_aggregate(collection, None, {"count": ("count", None)}, match=match, field="year", partitions=4)
+    assert result == [{"_id": None, "count": 20}]
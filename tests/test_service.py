@@ -0,0 +1,178 @@
+# ================================
+# tests/test_service.py
+# Service JSON : ETag / If-None-Match (304), cache, erreurs et client, sur un serveur local
+# servant des fonctions factices (aucune base de données)
+# ================================
+
+import asyncio
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import tornado.httpserver
+import tornado.testing
+
+from database import mongo, neo4j
+from database.service import QueryService, ReadFunctions, ResponseCache, ServiceClient, _from_json, make_app, to_json
+from database.sketches import CountEstimate, Estimate
+
+
+# Service dont les fonctions lisent une liste de films en mémoire (compte les appels)
+class _Service(QueryService):
+    def __init__(self):
+        self.films = ["Alpha", "Beta", "Gamma"]
+        self.calls = 0
+        self.targets = {"mongo": self, "neo4j": self}
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.cache = ResponseCache(ttl=60)
+        self.pending = {}
+        self.budget = 5
+
+    def function(self, backend, name):
+        return {"list_films": _list_films}.get(name) if backend == "mongo" else None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# Fonction exposée factice, de même forme que celles de database/mongo.py
+def _list_films(service, limit=10, budget=None):
+    if limit < 0:
+        raise ValueError("limit doit être positif")
+    service.calls += 1
+    return service.films[:limit]
+
+
+# Serveur du service dans un fil (boucle asyncio propre) : (service, URL de base)
+@pytest.fixture
+def server():
+    service = _Service()
+    sock, port = tornado.testing.bind_unused_port()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        http_server = tornado.httpserver.HTTPServer(make_app(service))
+        http_server.add_sockets([sock])
+        loop.call_soon(started.set)
+        loop.run_forever()
+        http_server.stop()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    started.wait()
+    yield service, f"http://127.0.0.1:{port}"
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    service.close()
+
+
+# GET brut : (code, en-têtes, corps)
+def _get(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.headers, exc.read()
+
+
+# Première réponse avec ETag ; If-None-Match renvoie 304 sans corps ni nouvel appel
+def test_etag_and_not_modified(server):
+    service, base_url = server
+    status, headers, body = _get(f"{base_url}/api/mongo/list_films?limit=2")
+    assert status == 200 and json.loads(body) == ["Alpha", "Beta"]
+    etag = headers["ETag"]
+    assert headers["Cache-Control"] == "max-age=60"
+
+    status, headers, body = _get(f"{base_url}/api/mongo/list_films?limit=2", {"If-None-Match": etag})
+    assert status == 304 and body == b"" and headers["ETag"] == etag
+    assert service.calls == 1
+
+    # Autres paramètres : autre clé de cache, autre ETag
+    status, headers, _ = _get(f"{base_url}/api/mongo/list_films?limit=3", {"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+    assert service.calls == 2
+
+
+# Après DELETE /api/cache, un résultat changé donne un nouvel ETag (l'ancien n'est plus valide)
+def test_cache_invalidation(server):
+    service, base_url = server
+    _, headers, _ = _get(f"{base_url}/api/mongo/list_films")
+    service.films.append("Delta")
+    status, _, _ = _get(f"{base_url}/api/mongo/list_films", {"If-None-Match": headers["ETag"]})
+    assert status == 304  # Toujours en cache
+
+    request = urllib.request.Request(f"{base_url}/api/cache", method="DELETE")
+    urllib.request.urlopen(request, timeout=5).close()
+    status, _, body = _get(f"{base_url}/api/mongo/list_films", {"If-None-Match": headers["ETag"]})
+    assert status == 200 and json.loads(body)[-1] == "Delta"
+
+
+# Fonction inconnue : 404 ; paramètre inconnu, réservé ou invalide : 400
+def test_errors(server):
+    _, base_url = server
+    assert _get(f"{base_url}/api/mongo/inconnue")[0] == 404
+    assert _get(f"{base_url}/api/mongo/list_films?genre=1")[0] == 400
+    assert _get(f"{base_url}/api/mongo/list_films?sketches=1")[0] == 400
+    assert _get(f"{base_url}/api/mongo/list_films?tfidf=%22modele%22")[0] == 400
+    status, _, body = _get(f"{base_url}/api/mongo/list_films?limit=-1")
+    assert status == 400 and json.loads(body)["type"] == "ValueError"
+
+
+# Le client revalide sa dernière réponse (304) et réutilise le corps déjà reçu
+def test_client_revalidates(server):
+    service, base_url = server
+    client = ServiceClient(base_url, timeout=5)
+    assert client.call("mongo", "list_films", limit=1) == ["Alpha"]
+    assert client.call("mongo", "list_films", limit=1) == ["Alpha"]
+    assert service.calls == 1 and len(client.responses) == 1
+    with pytest.raises(ValueError):
+        client.call("mongo", "list_films", limit=-1)
+
+
+# Estimations sérialisées avec leurs bornes puis reconstruites
+def test_estimates_round_trip():
+    value = {"mean": Estimate(6.5, 6.1, 6.9, 400), "count": CountEstimate(1200, 1150, 1250)}
+    decoded = json.loads(json.dumps(to_json(value)), object_hook=_from_json)
+    assert decoded["mean"] == 6.5 and decoded["mean"].high == 6.9 and decoded["mean"].sample_size == 400
+    assert decoded["count"] == 1200 and decoded["count"].low == 1150
+
+
+# Le cache d'ETags du client garde au plus `size` réponses, en évinçant la moins récemment utilisée
+def test_client_responses_bounded(server):
+    _, base_url = server
+    client = ServiceClient(base_url, timeout=5, size=2)
+    for limit in (1, 2, 1, 3):
+        client.call("mongo", "list_films", limit=limit)
+    assert [url.rsplit("=", 1)[1] for url in client.responses] == ["1", "3"]
+
+
+# Fonction distante : premier argument ignoré, use_tfidf transmis comme tfidf=true (jamais un modèle)
+def test_remote_function_tfidf_flag(monkeypatch):
+    client, calls = ServiceClient("http://service"), []
+    monkeypatch.setattr(client, "call", lambda backend, name, **params: calls.append((backend, name, params)))
+    recommend = client.remote_function("neo4j", "recommend_film_by_genre")
+    recommend(None, "Tom Hanks", use_tfidf=True, budget=3)
+    recommend(None, "Tom Hanks")
+    assert calls == [
+        ("neo4j", "recommend_film_by_genre", {"actor_name": "Tom Hanks", "tfidf": True, "budget": 3}),
+        ("neo4j", "recommend_film_by_genre", {"actor_name": "Tom Hanks"}),
+    ]
+
+
+# Sans client, les fonctions de lecture sont les fonctions locales et le modèle TF-IDF est passé
+# tel quel ; avec un client, ce sont les fonctions distantes et l'indicateur use_tfidf
+def test_read_functions_dispatch():
+    local = ReadFunctions()
+    assert local.get_all_films is neo4j.get_all_films and local.get_genres is mongo.get_genres
+    assert local.tfidf_params(lambda: "modèle") == {"tfidf": "modèle"}
+    with pytest.raises(AttributeError):
+        local.create_high_score_view
+    remote = ReadFunctions(ServiceClient("http://service"))
+    assert remote.get_all_films.__name__ == "get_all_films" and remote.get_all_films is not neo4j.get_all_films
+    assert remote.tfidf_params(lambda: pytest.fail("modèle local chargé")) == {"use_tfidf": True}
@@ -0,0 +1,88 @@
+# ================================
+# tests/test_similarity.py
+# Index MinHash / LSH : signatures, seaux, paires candidates et filtres des paires proches
+# ================================
+
+from database.similarity import (
+    BANDS, SimilarityIndex, film_features, get_similar_films_diff_directors, jaccard,
+    minhash_signature,
+)
+
+
+# Film au format de add_film à partir de listes d'identifiants (noms dérivés)
+def _add(index, film_id, genres=(), actors=(), directors=()):
+    entities = lambda prefix, ids: [{"id": i, "name": f"{prefix}{i}"} for i in ids]
+    index.add_film(film_id, f"Film {film_id}", entities("G", genres), entities("A", actors), entities("D", directors))
+
+
+# Le Jaccard estimé par MinHash approche le Jaccard exact
+def test_minhash_estimates_jaccard():
+    a = film_features([1, 2], range(100, 140), [7])
+    b = film_features([1, 3], range(110, 150), [8])
+    index = SimilarityIndex()
+    _add(index, 1, [1, 2], range(100, 140), [7])
+    _add(index, 2, [1, 3], range(110, 150), [8])
+    assert abs(index.estimated_jaccard(1, 2) - jaccard(a, b)) < 0.15
+
+
+# Les types d'éléments ne se confondent pas : l'acteur 1 n'est pas le genre 1
+def test_feature_namespaces():
+    assert not film_features([1], [], []) & film_features([], [1], [])
+    assert (minhash_signature(film_features([1], [], [])) != minhash_signature(film_features([], [1], []))).any()
+
+
+# Deux films identiques partagent tous leurs seaux ; un film sans éléments n'en occupe aucun
+def test_identical_films_are_candidates():
+    index = SimilarityIndex()
+    _add(index, 1, [1], [10, 11, 12], [5])
+    _add(index, 2, [1], [10, 11, 12], [6])
+    _add(index, 3)
+    assert index.candidates(1) == {2}
+    assert index.candidates(3) == set()
+    assert sum(1 in bucket[key] for bucket in index.buckets for key in bucket) == BANDS
+
+
+# Retirer un film vide ses seaux et ses correspondances de titre
+def test_remove_film():
+    index = SimilarityIndex()
+    _add(index, 1, [1], [10, 11], [5])
+    _add(index, 2, [1], [10, 11], [6])
+    index.remove_film(2)
+    assert index.candidates(1) == set()
+    assert "Film 2" not in index.film_ids
+    assert len(index) == 1
+
+
+# Les seaux de plus de max_bucket_size films sont ignorés par candidate_pairs
+def test_candidate_pairs_skip_large_buckets():
+    index = SimilarityIndex()
+    for film_id in range(1, 6):
+        _add(index, film_id, [1], [10, 11, 12], [5])  # Mêmes éléments : mêmes seaux
+    _add(index, 6, [2], [20, 21, 22], [8])
+    _add(index, 7, [2], [20, 21, 22], [8])
+    assert len(index.candidate_pairs()) == 10 + 1
+    assert index.candidate_pairs(max_bucket_size=4) == {(6, 7)}
+    assert index.candidate_pairs(max_bucket_size=1) == set()
+
+
+# top_pairs écarte les films d'un même réalisateur et, sur demande, ceux sans genre commun
+def test_top_pairs_filters():
+    index = SimilarityIndex()
+    _add(index, 1, [1], [10, 11, 12], [5])
+    _add(index, 2, [2], [10, 11, 12], [6])   # Même casting, aucun genre commun
+    _add(index, 3, [1], [10, 11, 12], [5])   # Même réalisateur que le film 1
+    _add(index, 4, [1], [10, 11, 12], [7])
+    pairs = {(a, b) for _, a, b in index.top_pairs(limit=10)}
+    assert (1, 3) not in pairs and (1, 2) in pairs
+    pairs = {(a, b) for _, a, b in index.top_pairs(limit=10, common_genre=True)}
+    assert pairs == {(1, 4), (3, 4)}
+
+
+# Lignes affichées : genres communs uniquement, classées par Jaccard décroissant
+def test_similar_films_rows():
+    index = SimilarityIndex()
+    _add(index, 1, [1, 2], [10, 11, 12], [5])
+    _add(index, 2, [1, 3], [10, 11, 12], [6])
+    rows = get_similar_films_diff_directors(index)
+    assert [(r["film1"], r["film2"], r["genre"]) for r in rows] == [("Film 1", "Film 2", "G1")]
+    assert rows[0]["jaccard"] == jaccard(index.features[1], index.features[2])
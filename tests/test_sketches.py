@@ -0,0 +1,103 @@
+# ================================
+# tests/test_sketches.py
+# HyperLogLog : estimation, fusion, sérialisation et fusion concurrente dans le SketchStore
+# ================================
+
+import numpy as np
+import pytest
+
+from database.sketches import HyperLogLog, SketchStore, estimate_mean
+
+
+# L'estimation d'un grand ensemble reste dans quelques erreurs types de la vraie valeur
+@pytest.mark.parametrize("n", [100, 5000, 50000])
+def test_estimate_close_to_true_count(n):
+    sketch = HyperLogLog()
+    sketch.add_many(range(n))
+    estimate = sketch.count()
+    assert abs(estimate - n) <= 4 * sketch.relative_error * n
+    assert estimate.low <= estimate <= estimate.high
+
+
+# Ajouter deux fois les mêmes éléments ne change pas le sketch
+def test_add_is_idempotent():
+    sketch = HyperLogLog()
+    sketch.add_many(range(1000))
+    registers = sketch.registers.copy()
+    sketch.add_many(range(1000))
+    assert np.array_equal(sketch.registers, registers)
+
+
+# La fusion de deux sketches est le sketch de l'union
+def test_merge_equals_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    left.add_many(range(0, 3000))
+    right.add_many(range(2000, 6000))
+    union.add_many(range(0, 6000))
+    left.merge(right)
+    assert np.array_equal(left.registers, union.registers)
+    assert left.count() == union.count()
+
+
+# Sérialisation en octets (stockage MongoDB) sans perte
+def test_bytes_round_trip():
+    sketch = HyperLogLog()
+    sketch.add_many(range(777))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes(), sketch.precision)
+    assert np.array_equal(restored.registers, sketch.registers)
+    assert restored.count() == sketch.count()
+
+
+# Moyenne estimée : intervalle de confiance autour de la moyenne de l'échantillon
+def test_estimate_mean_interval():
+    values = np.arange(1, 101, dtype=float)
+    mean = estimate_mean(values)
+    assert mean == pytest.approx(50.5)
+    assert mean.low < 50.5 < mean.high
+    assert mean.sample_size == 100
+    assert estimate_mean([]) is None
+
+
+# bulk_write rejoué requête par requête (mongomock ne prend pas en charge les UpdateOne de
+# cette version de PyMongo) ; une insertion en double est signalée comme par MongoDB
+def _bulk_write(collection, mongomock):
+    from pymongo.errors import BulkWriteError
+
+    def bulk_write(requests, ordered=True):
+        errors = []
+        for i, request in enumerate(requests):
+            try:
+                collection.update_one(request._filter, request._doc, upsert=request._upsert)
+            except mongomock.DuplicateKeyError:
+                errors.append({"index": i, "code": 11000})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+    return bulk_write
+
+
+# Un sketch modifié par un autre import entre la lecture et l'écriture est relu et fusionné
+# de nouveau : aucun des deux ajouts n'est perdu
+def test_store_add_retries_on_concurrent_update():
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+    store, other = SketchStore(db), SketchStore(db)  # Même collection (partagée par mongomock)
+    store.collection.bulk_write = other.collection.bulk_write = _bulk_write(db["sketches"], mongomock)
+    store.add({("genre", 1): ("Drama", set(range(0, 500)))})
+
+    bulk_write, calls = store.collection.bulk_write, []
+
+    def concurrent_bulk_write(requests, **kwargs):
+        calls.append(len(requests))
+        if len(calls) == 1:
+            other.add({("genre", 1): ("Drama", set(range(500, 1000)))})
+        return bulk_write(requests, **kwargs)
+
+    store.collection.bulk_write = concurrent_bulk_write
+    assert store.add({("genre", 1): ("Drama", set(range(1000, 1500)))}) == 1
+    # Écriture concurrente, puis la nôtre rejetée (version changée), puis la nôtre fusionnée
+    assert len(calls) == 3
+
+    expected = HyperLogLog()
+    expected.add_many(range(1500))
+    doc = db["sketches"].find_one({"_id": "genre:1"})
+    assert np.array_equal(HyperLogLog.from_bytes(doc["registers"]).registers, expected.registers)
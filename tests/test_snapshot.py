@@ -0,0 +1,131 @@
+# ================================
+# tests/test_snapshot.py
+# Instantané du graphe : écriture, bascule atomique de CURRENT, réouverture, purge des
+# anciennes versions et requêtes de castings sur les tableaux mappés
+# ================================
+
+import os
+
+import numpy as np
+import pytest
+
+from database.bitsets import CastBitsetIndex, cast_index_from_snapshot, query_cast_sets
+from database.snapshot import (
+    FORMAT_VERSION, GraphSnapshot, current_snapshot, current_version, graph_arrays, prune_snapshots,
+    write_snapshot,
+)
+
+# Identifiants épars (libres : 1 pour les acteurs, 2 pour les films), noms non ASCII et titre partagé
+ACTORS = {0: "Zoé", 2: "Émile", 3: "Bob", 4: "李"}
+FILMS = [
+    {"id": 0, "title": "Été", "year": 2001, "rating": "7.5", "votes": 10, "revenue": None},
+    {"id": 1, "title": "Alpha", "year": 1999, "rating": None, "votes": None, "revenue": 5.0},
+    {"id": 3, "title": "Alpha", "year": 2010, "rating": "N/A", "votes": 3, "revenue": 1.0},
+]
+PAIRS = [(0, 0), (2, 0), (2, 1), (3, 1), (3, 3), (4, 3), (0, 3)]
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "snapshots")
+
+
+# Écriture : version active, manifest, fichiers .npy mappés en lecture seule, aucun répertoire temporaire
+def test_write_and_open(root):
+    version = write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    assert current_version(root) == version
+    assert not [d for d in os.listdir(root) if d.startswith(".tmp")]
+
+    snapshot = current_snapshot(root)
+    assert snapshot.version == version
+    assert snapshot.manifest["format"] == FORMAT_VERSION
+    assert (snapshot.manifest["actors"], snapshot.manifest["films"], snapshot.manifest["edges"]) == (4, 3, 7)
+    assert isinstance(snapshot.actor_targets, np.memmap) and not snapshot.actor_targets.flags.writeable
+    assert (snapshot.n_actors, snapshot.n_films) == (5, 4)
+
+
+# Noms en octets UTF-8 (sans remplissage) et recherche dichotomique, titres partagés compris
+def test_names_and_lookups(root):
+    write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    snapshot = current_snapshot(root)
+    assert snapshot.actor_name_bytes.size == sum(len(name.encode("utf-8")) for name in ACTORS.values())
+    assert [snapshot.actor_name(i) for i in ACTORS] == list(ACTORS.values())
+    assert snapshot.actor_name(1) == "" and snapshot.film_title(2) == ""
+    assert {name: snapshot.actor_id(name) for name in ACTORS.values()} == {v: k for k, v in ACTORS.items()}
+    assert snapshot.film_ids("Alpha") == [1, 3] and snapshot.film_id("Alpha") == 1
+    assert snapshot.film_id("Été") == 0
+    for unknown in ("Inconnu", "", "Zoé "):
+        with pytest.raises(ValueError):
+            snapshot.actor_id(unknown)
+    with pytest.raises(ValueError):
+        snapshot.film_ids("Beta")
+
+
+# Listes d'adjacence triées dans les deux sens et propriétés numériques (NaN si absente)
+def test_adjacency_and_properties(root):
+    write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    snapshot = current_snapshot(root)
+    assert snapshot.films_of(0).tolist() == [0, 3]
+    assert snapshot.films_of(1).tolist() == []
+    assert snapshot.cast_of(3).tolist() == [0, 3, 4]
+    assert sorted(map(tuple, snapshot.pairs().tolist())) == sorted(PAIRS)
+    assert snapshot.film_rating[0] == 7.5 and np.isnan(snapshot.film_rating[3]) and np.isnan(snapshot.film_rating[2])
+    assert snapshot.film_year.tolist()[:2] == [2001, 1999]
+
+
+# Nouvelle version : CURRENT est remplacé, current_snapshot rouvre la nouvelle version au
+# prochain appel, l'ancienne reste lisible par qui l'a ouverte
+def test_switch_reopens_new_version(root):
+    first = write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    old = current_snapshot(root)
+    assert current_snapshot(root) is old  # Même version : pas de réouverture
+
+    second = write_snapshot(graph_arrays({**ACTORS, 5: "Nouvel acteur"}, FILMS, PAIRS + [(5, 0)]), root)
+    assert second != first and current_version(root) == second
+    new = current_snapshot(root)
+    assert new is not old and new.version == second
+    assert new.actor_id("Nouvel acteur") == 5
+    with pytest.raises(ValueError):
+        old.actor_id("Nouvel acteur")
+    assert sorted(os.listdir(root)) == sorted(["CURRENT", first, second])
+
+
+# Purge : seules les `keep` versions les plus récentes restent, jamais la version active
+def test_prune_keeps_recent_and_active(root):
+    versions = [write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root, keep=10) for _ in range(4)]
+    prune_snapshots(root, keep=2)
+    assert sorted(d for d in os.listdir(root) if d != "CURRENT") == versions[-2:]
+
+    with open(os.path.join(root, "CURRENT"), "w", encoding="utf-8") as f:
+        f.write(versions[-2])  # Retour à une version plus ancienne
+    write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root, keep=1)
+    assert len([d for d in os.listdir(root) if d != "CURRENT"]) == 1
+    assert current_snapshot(root) is not None
+
+
+# Pas d'instantané : None ; format inconnu refusé
+def test_missing_and_unsupported(root):
+    assert current_version(root) is None and current_snapshot(root) is None
+    version = write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    manifest = os.path.join(root, version, "manifest.json")
+    with open(manifest, encoding="utf-8") as f:
+        text = f.read()
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.write(text.replace(f'"format": {FORMAT_VERSION}', '"format": 0'))
+    with pytest.raises(ValueError):
+        GraphSnapshot(os.path.join(root, version))
+
+
+# Les requêtes de castings sur les tableaux mappés donnent les mêmes noms que l'index de bitsets
+def test_cast_queries_on_snapshot(root):
+    write_snapshot(graph_arrays(ACTORS, FILMS, PAIRS), root)
+    mapped = cast_index_from_snapshot(current_snapshot(root))
+    dense = CastBitsetIndex(PAIRS, ACTORS, {f["id"]: f["title"] for f in FILMS})
+    for expression, domain in [
+        ('"Zoé"', "films"), ('"Zoé" | "Bob"', "films"), ('"Émile" & ~"Bob"', "films"), ('~"李"', "films"),
+        ('"Bob"', "costars"), ('"Zoé" - "Émile"', "costars"), ('~"Bob"', "costars"),
+        ('"Alpha"', "cast"), ('"Alpha" & ~"Été"', "cast"),
+    ]:
+        assert query_cast_sets(mapped, expression, domain) == query_cast_sets(dense, expression, domain)
+    with pytest.raises(ValueError):
+        query_cast_sets(mapped, '"Inconnu"')
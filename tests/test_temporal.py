@@ -0,0 +1,190 @@
+# ================================
+# tests/test_temporal.py
+# Couche temporelle : agrégats cumulés des tranches, recalcul des seules années touchées et
+# relations :CONCURRENCE lues dans les tranches
+# ================================
+
+import numpy as np
+import pytest
+
+from database import neo4j as neo4j_module
+from database.neo4j import create_director_concurrence_relationships, sync_films
+from database.temporal import MAX_COMPETITORS, TemporalGraph, compute_slices, refresh_years
+
+NAMES = {
+    "actor": {1: "Ann", 2: "Bob", 3: "Cid", 4: "Dee"},
+    "director": {10: "Lee", 11: "Kim"},
+    "genre": {100: "Drama", 101: "Comedy"},
+}
+
+
+# Tranche annuelle construite à partir de listes Python
+def _slice(pairs=(), genres=(), competition=(), truncated=False):
+    return {
+        "films": 1, "competition_truncated": truncated,
+        "actor_pairs": np.array(pairs, dtype=np.int32).reshape(-1, 2),
+        "genre_counts": np.array(genres, dtype=np.int32).reshape(-1, 2),
+        "competition": np.array(competition, dtype=np.int32).reshape(-1, 3),
+    }
+
+
+@pytest.fixture
+def timeline():
+    slices = {
+        2001: _slice(pairs=[[1, 2]], genres=[[100, 2]]),
+        2002: _slice(pairs=[[1, 2], [1, 3]], genres=[[100, 1], [101, 3]], competition=[[10, 11, 100]]),
+        2004: _slice(pairs=[[1, 3], [2, 4]], genres=[[101, 1]]),
+    }
+    return TemporalGraph(slices, NAMES)
+
+
+# Première collaboration de chaque couple : l'année la plus ancienne où il apparaît
+def test_first_year(timeline):
+    first = {tuple(pair): int(year) for pair, year in zip(timeline.pairs.tolist(), timeline.first_year)}
+    assert first == {(1, 2): 2001, (1, 3): 2002, (2, 4): 2004}
+
+
+# Nouveaux collaborateurs par année et total cumulé (un couple déjà vu ne compte qu'une fois)
+def test_collaborator_growth(timeline):
+    assert timeline.collaborator_growth("Ann") == [
+        {"year": 2001, "new": 1, "total": 1},
+        {"year": 2002, "new": 1, "total": 2},
+        {"year": 2004, "new": 0, "total": 2},
+    ]
+    assert timeline.collaborator_counts(2002) == [
+        {"actor": "Ann", "collaborators": 2}, {"actor": "Bob", "collaborators": 1}, {"actor": "Cid", "collaborators": 1},
+    ]
+    with pytest.raises(ValueError):
+        timeline.collaborator_growth("Inconnu")
+
+
+# Répartition des genres d'une année, ou cumulée jusqu'à elle (années sans tranche comprises)
+def test_genre_mix(timeline):
+    assert timeline.genre_mix(2002, cumulative=False) == {"Comedy": 3, "Drama": 1}
+    assert timeline.genre_mix(2003) == {"Drama": 3, "Comedy": 3}
+    assert timeline.genre_mix(2004) == {"Comedy": 4, "Drama": 3}
+    assert timeline.genre_mix(2000) == {}
+    assert timeline.competition(2002) == [{"director1": "Lee", "director2": "Kim", "genres": ["Drama"]}]
+
+
+# Session Neo4j en mémoire : films {id: (année, réalisateurs, acteurs, genres)} ; chaque requête
+# des tranches est évaluée pour les années demandées, les autres requêtes sont enregistrées
+class _Session:
+    def __init__(self, films):
+        self.films, self.queries = films, []
+
+    def run(self, query, parameters=None, **kwargs):
+        self.queries.append((query, kwargs))
+        years = kwargs.get("years", [kwargs.get("year")])
+        films = [film for film in self.films.values() if film[0] in years]
+        if "collect(d.id)" in query:
+            by_genre = {}
+            for _, directors, _, genres in films:
+                for g in genres:
+                    by_genre.setdefault(g, set()).update(directors)
+            return [
+                {"genre": g, "directors": sorted(ds)[:kwargs["limit"]], "total": len(ds)}
+                for g, ds in by_genre.items()
+            ]
+        if "count(f) AS films" in query:
+            return [{"year": y, "films": sum(film[0] == y for film in films)} for y in years]
+        if "a1.id AS a" in query:
+            rows = {(y, a, b) for y, _, actors, _ in films for a in actors for b in actors if a < b}
+            return [{"year": y, "a": a, "b": b} for y, a, b in rows]
+        if "g.id AS a" in query:
+            counts = {}
+            for y, _, _, genres in films:
+                for g in genres:
+                    counts[y, g] = counts.get((y, g), 0) + 1
+            return [{"year": y, "a": g, "b": n} for (y, g), n in counts.items()]
+        return []
+
+    def execute_write(self, work, *args, **kwargs):
+        return {"deleted": 0, "written": 1}
+
+    def close(self):
+        pass
+
+
+class _Driver:
+    def __init__(self, films=None):
+        self.opened = _Session(films or {})
+
+    def session(self, **kwargs):
+        return self.opened
+
+
+# Magasin de tranches en mémoire (écriture seulement)
+class _Store:
+    def __init__(self, slices=None):
+        self.slices, self.written = slices or {}, []
+
+    def write(self, slices):
+        self.written.append(sorted(slices))
+        return len(slices)
+
+    def load(self):
+        return self.slices
+
+
+FILMS = {
+    1: (2001, [10], [1, 2], [100]),
+    2: (2001, [11], [2, 3], [100]),
+    3: (2005, [10], [1, 4], [101]),
+}
+
+
+# Seules les années demandées sont lues dans le graphe puis écrites
+def test_refresh_years_only_touched():
+    driver, store = _Driver(FILMS), _Store()
+    assert refresh_years(driver, store, [2001, 2003, "inconnue"]) == 2
+    assert store.written == [[2001, 2003]]
+    for query, params in driver.opened.queries:
+        assert params.get("years", [params.get("year")]) in ([2001, 2003], [2001], [2003])
+    slices = compute_slices(driver, [2001])
+    assert slices[2001]["films"] == 2 and not slices[2001]["competition_truncated"]
+    assert sorted(slices[2001]["actor_pairs"].tolist()) == [[1, 2], [2, 3]]
+    assert slices[2001]["competition"].tolist() == [[10, 11, 100]]
+
+
+# Un genre qui dépasse MAX_COMPETITORS réalisateurs marque la tranche comme tronquée
+def test_competition_truncated():
+    films = {i: (2001, [1000 + i], [], [100]) for i in range(MAX_COMPETITORS + 1)}
+    slices = compute_slices(_Driver(films), [2001])
+    assert slices[2001]["competition_truncated"]
+    assert len(slices[2001]["competition"]) == MAX_COMPETITORS * (MAX_COMPETITORS - 1) // 2
+
+
+# Dictionnaire minimal : un identifiant par clé, dans l'ordre d'apparition
+class _Dictionary:
+    def __init__(self):
+        self.ids = {}
+
+    def encode(self, kind, keys):
+        return {key: self.ids.setdefault((kind, key), len(self.ids) + 1) for key in keys}
+
+
+# sync_films recalcule les anciennes années (connues de l'appelant) et les nouvelles, pas les autres
+def test_sync_films_refreshes_touched_years(monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(neo4j_module, "refresh_years", lambda driver, store, years: refreshed.append(set(years)) or len(years))
+    monkeypatch.setattr(neo4j_module, "film_years", lambda driver, ids: pytest.fail("années relues dans le graphe"))
+    film = {"_id": "a", "title": "Alpha", "year": 2003, "Director": "Lee", "Actors": "Ann, Bob", "genre": "Drama"}
+    report = sync_films(_Driver(), [film], [], _Dictionary(), temporal=_Store(), previous_years={2001})
+    assert refreshed == [{2001, 2003}]
+    assert report["years_refreshed"] == 2
+
+
+# Tranches complètes : couples lus dans les tranches (deux sens) ; tranche tronquée : jointure
+# dans le graphe limitée à son année
+def test_concurrence_from_slices():
+    store = _Store({
+        2001: _slice(competition=[[10, 11, 100], [10, 11, 101]]),
+        2002: _slice(truncated=True),
+    })
+    driver = _Driver()
+    create_director_concurrence_relationships(driver, store)
+    (unwind, params), (join, join_params) = driver.opened.queries
+    assert params["pairs"] == [[10, 11]]
+    assert "MERGE (d2)-[:CONCURRENCE]->(d1)" in unwind
+    assert "f1.year IN $years" in join and join_params["years"] == [2002]
@@ -0,0 +1,104 @@
+# ================================
+# tests/test_tfidf.py
+# TF-IDF : construction, cosinus, voisins précalculés par blocs, enregistrement et invalidation
+# ================================
+
+import os
+
+import numpy as np
+import pytest
+
+from database.tfidf import build_tfidf, invalidate_tfidf, load_tfidf, save_tfidf, tokenize
+
+FILMS = [
+    {"_id": 1, "title": "Space Voyage", "Description": "Astronauts travel to a distant planet in space"},
+    {"_id": 2, "title": "Space Rescue", "Description": "A crew rescues astronauts stranded in space"},
+    {"_id": 3, "title": "Love in Paris", "Description": "Two strangers fall in love in Paris"},
+    {"_id": 4, "title": "Paris Nights", "Description": "A love story set during Paris nights"},
+    {"_id": 5, "title": "The Heist", "Description": "A crew plans the heist of a bank"},
+    {"_id": 6, "title": "Untitled", "Description": None},
+]
+
+
+# Collection réduite à find(), seule méthode utilisée par build_tfidf
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, *args, **kwargs):
+        return iter(self.docs)
+
+
+@pytest.fixture
+def model():
+    return build_tfidf(_Collection(FILMS))
+
+
+# Matrice dense des lignes normalisées (référence pour les calculs creux)
+def _dense(model):
+    matrix = np.zeros((len(model), len(model.vocabulary)))
+    for i in range(len(model)):
+        matrix[i, model.indices[model.indptr[i]:model.indptr[i + 1]]] = model.data[model.indptr[i]:model.indptr[i + 1]]
+    return matrix
+
+
+# Mots vides, mots d'une lettre et valeurs non textuelles sont ignorés
+def test_tokenize():
+    assert tokenize("The Heist of a Bank") == ["heist", "bank"]
+    assert tokenize(None) == []
+
+
+# Lignes normalisées L2 (sauf film sans mots) et cosinus creux égal au produit dense
+def test_scores_match_dense_product(model):
+    dense = _dense(model)
+    norms = np.linalg.norm(dense, axis=1)
+    assert np.allclose(norms[:5], 1) and norms[5] == pytest.approx(1)  # "untitled" seul
+    for row in range(len(model)):
+        assert np.allclose(model.scores(*model._row_vector([row])), dense @ dense[row])
+
+
+# Films les plus proches et recherche en texte libre
+def test_more_like_this_and_search(model):
+    assert model.more_like_this("1", limit=1)[0]["title"] == "Space Rescue"
+    assert model.more_like_this("Love in Paris", limit=1)[0]["title"] == "Paris Nights"
+    assert model.search("paris love", limit=2)[0]["key"] in {"3", "4"}
+    assert model.search("zzz") == []
+    with pytest.raises(ValueError):
+        model.rows_for("Inconnu")
+
+
+# Voisins précalculés par blocs (quelle que soit la taille des blocs) = tri exhaustif dense
+@pytest.mark.parametrize("block_size, max_products", [(256, 2_000_000), (2, 5), (1, 1)])
+def test_neighbours_match_brute_force(model, block_size, max_products):
+    dense = _dense(model)
+    similarity = dense @ dense.T
+    np.fill_diagonal(similarity, -np.inf)
+    indices, scores = model.compute_neighbours(limit=3, block_size=block_size, max_products=max_products)
+    for row in range(len(model)):
+        expected = np.sort(similarity[row][similarity[row] > 0])[::-1][:3]
+        found = scores[row][scores[row] > 0]
+        assert np.allclose(found, expected, atol=1e-6)
+        assert np.allclose(similarity[row, indices[row][:found.size]], found, atol=1e-6)
+
+
+# Enregistrement puis rechargement à l'identique ; invalidate_tfidf supprime le fichier
+def test_save_load_invalidate(model, tmp_path):
+    path = str(tmp_path / "tfidf.npz")
+    model.compute_neighbours(limit=2)
+    save_tfidf(model, path)
+    loaded = load_tfidf(path)
+    assert loaded.keys == model.keys and loaded.vocabulary == model.vocabulary
+    assert loaded.more_like_this("1", limit=2) == model.more_like_this("1", limit=2)
+    assert invalidate_tfidf(path) is True
+    assert not os.path.exists(path)
+    assert invalidate_tfidf(path) is False
+
+
+# Un titre absent reste None après rechargement (pas la chaîne "None")
+def test_save_load_missing_title(tmp_path):
+    path = str(tmp_path / "tfidf.npz")
+    films = FILMS + [{"_id": 7, "title": None, "Description": "A bank heist in Paris"}]
+    save_tfidf(build_tfidf(_Collection(films)), path)
+    loaded = load_tfidf(path)
+    assert loaded.titles[-1] is None and "None" not in loaded.title_rows
+    assert loaded.titles[:6] == [film["title"] for film in FILMS]
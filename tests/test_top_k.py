@@ -0,0 +1,69 @@
+# ================================
+# tests/test_top_k.py
+# Top k par groupe : pipeline $topN / $bottomN, regroupements prédéfinis identiques aux
+# agrégations d'origine et mise en forme des tableaux de bord
+# ================================
+
+import pytest
+
+from database.mongo import TOP_K_GROUPS, get_longest_film_per_genre, top_k_per_group
+
+mongomock = pytest.importorskip("mongomock")
+
+FILMS = [
+    {"_id": 1, "title": "Alpha", "genre": "Drama,Comedy", "Runtime (Minutes)": 120},
+    {"_id": 2, "title": "Beta", "genre": "Drama", "Runtime (Minutes)": 95},
+    {"_id": 3, "title": "Gamma", "genre": "Comedy, Drama", "Runtime (Minutes)": 140},
+    {"_id": 4, "title": "Delta", "genre": "Action", "Runtime (Minutes)": ""},
+]
+
+
+# Collection enregistrant les pipelines et renvoyant des groupes préparés
+# (mongomock ne connaît pas l'accumulateur $topN)
+class _Collection:
+    def __init__(self, groups=()):
+        self.groups, self.pipelines = list(groups), []
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return iter(self.groups)
+
+
+# Les genres sont regroupés comme dans la version d'origine de get_longest_film_per_genre :
+# découpage par virgule sans retrait des espaces
+def test_genre_grouping_matches_baseline():
+    films = mongomock.MongoClient().db["films"]
+    films.insert_many([dict(film) for film in FILMS])
+    baseline = [
+        {"$project": {"title": 1, "genre": {"$split": ["$genre", ","]}}},
+        {"$unwind": "$genre"},
+        {"$group": {"_id": "$genre", "films": {"$push": "$title"}}},
+    ]
+    grouped = [*TOP_K_GROUPS["genre"]["prepare"], {"$group": {"_id": "$genre", "films": {"$push": "$title"}}}]
+    expected = {g["_id"]: sorted(g["films"]) for g in films.aggregate(baseline)}
+    assert {g["_id"]: sorted(g["films"]) for g in films.aggregate(grouped)} == expected
+    assert expected["Drama"] == ["Alpha", "Beta"] and expected[" Drama"] == ["Gamma"]
+
+
+# Pipeline : filtre sur la mesure, étapes du regroupement, $topN (ou $bottomN) limité à k
+def test_top_k_pipeline():
+    collection = _Collection()
+    top_k_per_group(collection, "genre", "Runtime (Minutes)", k=2)
+    top_k_per_group(collection, "$Director", "Votes", k=1, largest=False, fields=("title", "year"), match={"year": 2010})
+    genre, director = collection.pipelines
+    assert genre[0] == {"$match": {"Runtime (Minutes)": {"$exists": True, "$ne": ""}}}
+    assert genre[1:3] == TOP_K_GROUPS["genre"]["prepare"]
+    assert genre[3]["$group"]["top"]["$topN"]["n"] == 2
+    assert director[0]["$match"]["year"] == 2010
+    assert director[1]["$group"]["_id"] == "$Director"
+    assert director[1]["$group"]["top"]["$bottomN"]["output"] == {"title": "$title", "year": "$year", "value": "$Votes"}
+    with pytest.raises(ValueError):
+        top_k_per_group(collection, "studio", "Votes")
+    with pytest.raises(ValueError):
+        top_k_per_group(collection, "year", "Votes", k=0)
+
+
+# Le film le plus long par genre garde la forme de résultat d'origine
+def test_longest_film_per_genre_shape():
+    collection = _Collection([{"_id": "Drama", "top": [{"title": "Alpha", "value": 120}]}])
+    assert get_longest_film_per_genre(collection) == [{"_id": "Drama", "title": "Alpha", "runtime": 120}]